@@ -16,6 +16,8 @@ from django.db import models
 from django.db.models.fields.related_descriptors import ManyToManyDescriptor
 from django.db.models.signals import m2m_changed, post_save, pre_delete
 
+from resolwe.flow.utils.delete import is_bulk_delete
+
 from .indices import BaseIndex
 from .utils import prepare_connection
 
@@ -60,6 +62,10 @@ class ElasticSignal(object):
 
     def __call__(self, sender, instance, **kwargs):
         """Process signal."""
+        if is_bulk_delete():
+            # Indexes are updated for all deleted objects at once.
+            return
+
         method = getattr(self.index, self.method_name)
         if self.pass_kwargs:
             method(obj=instance, **kwargs)
@@ -247,6 +253,11 @@ class IndexBuilder(object):
         for index in self.indexes:
             index.remove_object(obj)
 
+    def remove_objects(self, objects):
+        """Delete given objects from all indexes with one request per index."""
+        for index in self.indexes:
+            index.remove_objects(objects)
+
     def destroy(self):
         """Delete all indexes from Elasticsearch and index builder."""
         self.unregister_signals()
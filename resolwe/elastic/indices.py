@@ -28,11 +28,12 @@ from six import add_metaclass
 
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
 
 from guardian.conf.settings import ANONYMOUS_USER_NAME
-from guardian.models import GroupObjectPermission, UserObjectPermission
 
 from resolwe.flow.utils import dict_dot
+from resolwe.permissions.models import PERMISSION_BITS, AccessControl
 
 __all__ = ('BaseDocument', 'BaseIndex')
 
@@ -265,19 +266,26 @@ class BaseIndex(object):
         contain list of ids of users/groups with ``view`` permission.
         """
         # TODO: Optimize this for bulk running
-        filters = {
-            'object_pk': obj.id,
-            'content_type': ContentType.objects.get_for_model(obj),
-            'permission__codename__startswith': 'view',
-        }
+        acl = AccessControl.objects.annotate(
+            view_permission=F('permissions').bitand(PERMISSION_BITS['view'])
+        ).filter(
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=obj.id,
+            view_permission__gt=0,
+        ).values_list('user_id', 'user__username', 'group_id')
+
+        users, groups, public = [], [], False
+        for user_id, username, group_id in acl:
+            if user_id is not None:
+                users.append(user_id)
+                public = public or username == ANONYMOUS_USER_NAME
+            else:
+                groups.append(group_id)
+
         return {
-            'users': list(
-                UserObjectPermission.objects.filter(**filters).distinct('user').values_list('user_id', flat=True)
-            ),
-            'groups': list(
-                GroupObjectPermission.objects.filter(**filters).distinct('group').values_list('group', flat=True)
-            ),
-            'public': UserObjectPermission.objects.filter(user__username=ANONYMOUS_USER_NAME, **filters).exists(),
+            'users': sorted(users),
+            'groups': sorted(groups),
+            'public': public,
         }
 
     def get_dependencies(self):
@@ -293,6 +301,22 @@ class BaseIndex(object):
         except NotFoundError:
             pass  # object doesn't exist in index
 
+    def remove_objects(self, objects):
+        """Remove given objects from the ElasticSearch with a single request."""
+        objects = [obj for obj in objects if isinstance(obj, self.object_type)]
+        if not objects:
+            return
+
+        document = self.document_class()  # pylint: disable=not-callable
+        actions = ({
+            '_op_type': 'delete',
+            '_index': document._get_index(),  # pylint: disable=protected-access
+            '_type': document._doc_type.name,  # pylint: disable=protected-access
+            '_id': self.generate_id(obj),
+        } for obj in objects)
+        # Objects that don't exist in index are ignored.
+        bulk(connections.get_connection(), actions, refresh=True, raise_on_error=False)
+
     def search(self):
         """Return search query of document object."""
         return self.document_class.search()
@@ -7,10 +7,10 @@ Elastic Signal Handlers
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
 
-from guardian.models import GroupObjectPermission, UserObjectPermission
+from resolwe.flow.utils.delete import bulk_deleted
+from resolwe.permissions.signals import permissions_changed
 
 from .builder import index_builder
 from .utils import prepare_connection
@@ -21,37 +21,23 @@ except ImportError:
     celery = None
 
 
-def _process_permission(perm):
-    """Rebuild indexes affected by the given permission."""
-    # XXX: Optimize: rebuild only permissions, not whole document
-    if not perm.permission.codename.startswith('view'):
-        return
+@receiver(permissions_changed)
+def permissions_changed_handler(sender, instances, **kwargs):
+    """Process indexes after permissions were changed.
 
-    index_builder.build(perm.content_object)
+    The signal is sent by the permissions app after access control
+    lists, from which permissions are indexed, are updated.
 
+    """
+    for instance in instances:
+        index_builder.build(instance, push=False)
+    index_builder.push()
 
-@receiver(post_save, sender=UserObjectPermission)
-def add_user_permission(sender, instance, **kwargs):
-    """Process indexes after adding user permission."""
-    _process_permission(instance)
 
-
-@receiver(post_save, sender=GroupObjectPermission)
-def add_group_permission(sender, instance, **kwargs):
-    """Process indexes after adding group permission."""
-    _process_permission(instance)
-
-
-@receiver(pre_delete, sender=UserObjectPermission)
-def remove_user_permission(sender, instance, **kwargs):
-    """Process indexes after removing user permission."""
-    _process_permission(instance)
-
-
-@receiver(pre_delete, sender=GroupObjectPermission)
-def remove_group_permission(sender, instance, **kwargs):
-    """Process indexes after removing group permission."""
-    _process_permission(instance)
+@receiver(bulk_deleted)
+def bulk_objects_deleted(sender, instances, **kwargs):
+    """Remove documents of objects deleted in bulk."""
+    index_builder.remove_objects(instances)
 
 
 if celery is not None:
@@ -18,7 +18,7 @@ from guardian.shortcuts import assign_perm, remove_perm
 # Import signals manually because we ignore them in App ready for tests
 from resolwe.elastic import signals  # pylint: disable=unused-import
 from resolwe.elastic.builder import index_builder
-from resolwe.test import ElasticSearchTestCase
+from resolwe.test import ElasticSearchTestCase, TransactionElasticSearchTestCase
 
 CUSTOM_SETTINGS = {
     'INSTALLED_APPS': settings.INSTALLED_APPS + ('resolwe.elastic.tests.test_app',),
@@ -169,43 +169,6 @@ class IndexTest(ElasticSearchTestCase):
         call_command('elastic_purge', exclude=['InvalidIndex'], interactive=False, verbosity=0, stderr=output)
         self.assertIn("Unknown index: InvalidIndex", output.getvalue())
 
-    def test_permissions(self):
-        from .test_app.models import TestModel
-        from .test_app.elastic_indexes import TestSearchDocument
-
-        # Prepare users and groups
-        user_model = get_user_model()
-        user_1 = user_model.objects.create(username='user_one')
-        user_2 = user_model.objects.create(username='user_two')
-        user_3 = user_model.objects.create(username='user_three')
-        group = Group.objects.create(name='group')
-
-        # Create test object
-        test_obj = TestModel.objects.create(name='Object name', number=43)
-        assign_perm('view_testmodel', user_1, test_obj)
-        assign_perm('view_testmodel', user_2, test_obj)
-        assign_perm('view_testmodel', group, test_obj)
-
-        es_objects = TestSearchDocument.search().execute()
-        self.assertEqual(es_objects[0].users_with_permissions, [user_1.pk, user_2.pk])
-        self.assertEqual(es_objects[0].groups_with_permissions, [group.pk])
-        self.assertEqual(es_objects[0].public_permission, False)
-
-        # Change permissions
-        remove_perm('view_testmodel', user_2, test_obj)
-        assign_perm('view_testmodel', user_3, test_obj)
-
-        es_objects = TestSearchDocument.search().execute()
-        self.assertEqual(es_objects[0].users_with_permissions, [user_1.pk, user_3.pk])
-        self.assertEqual(es_objects[0].groups_with_permissions, [group.pk])
-        self.assertEqual(es_objects[0].public_permission, False)
-
-        # Change permissions
-        assign_perm('view_testmodel', AnonymousUser(), test_obj)
-
-        es_objects = TestSearchDocument.search().execute()
-        self.assertEqual(es_objects[0].public_permission, True)
-
     def test_field_name(self):
         from .test_app.models import TestModel
         from .test_app.elastic_indexes import TestSearchDocument
@@ -327,3 +290,60 @@ class IndexTest(ElasticSearchTestCase):
         # It is correct that even non-dependencies are contained in the name as dependencies are
         # only used to determine when to trigger updates.
         self.assertEqual(es_objects[0].name, 'Deps: one, two, four, hello, hello')
+
+
+@override_settings(**CUSTOM_SETTINGS)
+class IndexPermissionsTest(TransactionElasticSearchTestCase):
+    # Permissions are indexed when transactions are committed.
+
+    def setUp(self):
+        from .test_app.elastic_indexes import TestSearchIndex
+
+        super(IndexPermissionsTest, self).setUp()
+
+        apps.clear_cache()
+        call_command('migrate', verbosity=0, interactive=False, load_initial_data=False)
+
+        index_builder.indexes = [TestSearchIndex()]
+        index_builder.register_signals()
+
+    def tearDown(self):
+        index_builder.destroy()
+        super(IndexPermissionsTest, self).tearDown()
+
+    def test_permissions(self):
+        from .test_app.models import TestModel
+        from .test_app.elastic_indexes import TestSearchDocument
+
+        # Prepare users and groups
+        user_model = get_user_model()
+        user_1 = user_model.objects.create(username='user_one')
+        user_2 = user_model.objects.create(username='user_two')
+        user_3 = user_model.objects.create(username='user_three')
+        group = Group.objects.create(name='group')
+
+        # Create test object
+        test_obj = TestModel.objects.create(name='Object name', number=43)
+        assign_perm('view_testmodel', user_1, test_obj)
+        assign_perm('view_testmodel', user_2, test_obj)
+        assign_perm('view_testmodel', group, test_obj)
+
+        es_objects = TestSearchDocument.search().execute()
+        self.assertEqual(es_objects[0].users_with_permissions, [user_1.pk, user_2.pk])
+        self.assertEqual(es_objects[0].groups_with_permissions, [group.pk])
+        self.assertEqual(es_objects[0].public_permission, False)
+
+        # Change permissions
+        remove_perm('view_testmodel', user_2, test_obj)
+        assign_perm('view_testmodel', user_3, test_obj)
+
+        es_objects = TestSearchDocument.search().execute()
+        self.assertEqual(es_objects[0].users_with_permissions, [user_1.pk, user_3.pk])
+        self.assertEqual(es_objects[0].groups_with_permissions, [group.pk])
+        self.assertEqual(es_objects[0].public_permission, False)
+
+        # Change permissions
+        assign_perm('view_testmodel', AnonymousUser(), test_obj)
+
+        es_objects = TestSearchDocument.search().execute()
+        self.assertEqual(es_objects[0].public_permission, True)
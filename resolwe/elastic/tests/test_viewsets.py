@@ -9,10 +9,10 @@ from django.core.management import call_command
 from django.test import override_settings
 
 from guardian.shortcuts import assign_perm
-from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.test import APIRequestFactory, APITransactionTestCase, force_authenticate
 
 from resolwe.elastic.builder import index_builder
-from resolwe.test import ElasticSearchTestCase
+from resolwe.test import TransactionElasticSearchTestCase
 
 factory = APIRequestFactory()  # pylint: disable=invalid-name
 
@@ -23,7 +23,8 @@ CUSTOM_SETTINGS = {
 
 
 @override_settings(**CUSTOM_SETTINGS)
-class IndexViewsetTest(APITestCase, ElasticSearchTestCase):
+class IndexViewsetTest(APITransactionTestCase, TransactionElasticSearchTestCase):
+    # Permissions are indexed when transactions are committed.
 
     def setUp(self):
         from .test_app.models import TestModel
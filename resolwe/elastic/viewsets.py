@@ -12,14 +12,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from elasticsearch_dsl.query import Q
 
-from django.conf import settings
-from django.contrib.auth import get_user_model
 from django.db.models import Case, IntegerField, Value, When
 
 from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from resolwe.permissions.mixins import ResolwePrincipalMixin
+from resolwe.permissions.principal import get_principal
+
 from .pagination import LimitOffsetPostPagination
 
 __all__ = (
@@ -110,16 +111,13 @@ class ElasticSearchMixin(object):
         :param search: ElasticSearch query object
 
         """
-        user = self.request.user
-        if user.is_superuser:
+        principal = get_principal(self.request.user)
+        if principal.is_superuser:
             return search
-        if user.is_anonymous():
-            user_model = get_user_model()
-            user = user_model.objects.get(**{user_model.USERNAME_FIELD: settings.ANONYMOUS_USER_NAME})
 
-        filters = [Q('match', users_with_permissions=user.pk)]
+        filters = [Q('match', users_with_permissions=principal.user_id)]
         filters.extend([
-            Q('match', groups_with_permissions=group.pk) for group in user.groups.all()
+            Q('match', groups_with_permissions=group_id) for group_id in sorted(principal.group_ids)
         ])
         filters.append(Q('match', public_permission=True))
 
@@ -146,7 +144,7 @@ class PaginationMixin(object):
         return Response(serializer.data)
 
 
-class ElasticSearchBaseViewSet(PaginationMixin, ElasticSearchMixin, GenericViewSet):
+class ElasticSearchBaseViewSet(ResolwePrincipalMixin, PaginationMixin, ElasticSearchMixin, GenericViewSet):
     """Base ViewSet for ElasticSearch based views.
 
     This ViewSet creates search based on ``document_class`` parameter, specified
@@ -0,0 +1,319 @@
+""".. Ignore pydocstyle D400.
+
+============
+Change Feeds
+============
+
+Changes of :class:`~resolwe.flow.models.Data` objects (i.e. status and
+progress updates reported by executors) are published to a broker, from
+which they are delivered to clients waiting on the ``changes`` endpoint.
+
+The broker is selected with the ``BROKER`` key of the ``FLOW_CHANGES``
+setting:
+
+* ``resolwe.flow.changes.PostgresBroker`` (default) delivers changes
+  between all processes connected to the same database with Postgres
+  ``LISTEN``/``NOTIFY``.
+* ``resolwe.flow.changes.LocalBroker`` delivers changes only within a
+  single process. Changes made by other processes (i.e. executors or
+  other web server workers) are never delivered by it, so it must only
+  be used for development and tests with a single process.
+
+Clients pass the cursor of the last change they received and get all
+later changes. With :class:`PostgresBroker` cursors are sequence
+numbers shared by all processes, so a client can reconnect to any web
+server worker. If a broker can't tell which changes a client missed
+(i.e. the cursor is older than the buffered changes or the worker
+started listening after it was issued), it returns ``None`` instead of
+the list of changes. Such clients must resynchronize their state and
+continue with the returned cursor.
+
+Other keys of the setting are ``BUFFER_SIZE`` (number of the latest
+changes kept by the broker), ``MAX_TIMEOUT`` (maximal time a client can
+wait for changes in a single request) and ``CHANNEL`` (name of the
+Postgres notification channel). The setting is read when the broker is
+created, which happens again after the setting is changed (i.e. with
+``override_settings`` in tests).
+
+Each change is a dictionary with ``id``, ``status``, ``progress`` and
+``modified`` of the data object and ``fields`` listing updated fields
+(``None`` if all fields were saved).
+
+.. autoclass:: resolwe.flow.changes.LocalBroker
+    :members:
+
+.. autoclass:: resolwe.flow.changes.PostgresBroker
+    :members:
+
+.. autofunction:: resolwe.flow.changes.get_broker
+
+.. autofunction:: resolwe.flow.changes.publish_data_change
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import collections
+import json
+import logging
+import select
+import threading
+import time
+
+import six
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from resolwe.utils import BraceMessage as __
+
+__all__ = ('LocalBroker', 'PostgresBroker', 'get_broker', 'publish_data_change')
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _get_setting(key, default):
+    """Return value of ``key`` in ``FLOW_CHANGES`` setting."""
+    return getattr(settings, 'FLOW_CHANGES', {}).get(key, default)
+
+
+class LocalBroker(object):
+    """In-process broker of changes.
+
+    Only changes published by the same process are delivered, so it is
+    only suitable for development and tests.
+
+    The latest changes are kept in a buffer, each with a sequence
+    number, which is used as the cursor. Clients that fall behind by
+    more than the buffer size and cursors issued by another process (or
+    before restart) can't be served, so resynchronization is requested
+    for them.
+
+    """
+
+    def __init__(self, buffer_size=None):
+        """Initialize empty buffer."""
+        self.buffer_size = buffer_size or _get_setting('BUFFER_SIZE', 1000)
+        #: maximal time a client can wait for changes in a single request
+        self.max_timeout = _get_setting('MAX_TIMEOUT', 60)
+        self._condition = threading.Condition()
+        self._changes = collections.deque(maxlen=self.buffer_size)
+        #: sequence number of the latest change
+        self._sequence = 0
+        #: sequence number after which all changes are known
+        self._start = 0
+
+    def _add(self, sequence, change):
+        """Add change to the buffer and wake up waiting clients."""
+        with self._condition:
+            if sequence <= self._sequence:
+                # Change is older than the start of the buffer.
+                return
+
+            if len(self._changes) == self._changes.maxlen:
+                self._start = self._changes[0][0]
+            self._changes.append((sequence, change))
+            self._sequence = sequence
+            self._condition.notify_all()
+
+    def _reset(self, sequence):
+        """Clear the buffer and start it after ``sequence``."""
+        with self._condition:
+            self._changes.clear()
+            self._sequence = self._start = sequence
+            self._condition.notify_all()
+
+    def _is_valid(self, sequence):
+        """Return ``True`` if changes after ``sequence`` are known."""
+        return self._start <= sequence <= self._sequence
+
+    @staticmethod
+    def _parse_cursor(cursor):
+        """Return sequence number of the cursor or ``None`` if it is invalid."""
+        try:
+            return int(cursor)
+        except ValueError:
+            return None
+
+    def publish(self, change):
+        """Publish the change."""
+        with self._condition:
+            self._add(self._sequence + 1, change)
+
+    def wait(self, cursor=None, timeout=0):
+        """Return new cursor and changes after ``cursor``.
+
+        If there are no such changes, wait for them for at most
+        ``timeout`` seconds. If ``cursor`` is not given, only the cursor
+        of the latest change is returned. If changes after ``cursor``
+        are not known, ``None`` is returned instead of the changes.
+
+        """
+        deadline = time.time() + timeout
+
+        with self._condition:
+            if not cursor:
+                return six.text_type(self._sequence), []
+
+            sequence = self._parse_cursor(cursor)
+            if sequence is None or not self._is_valid(sequence):
+                return six.text_type(self._sequence), None
+
+            while self._sequence <= sequence:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            if sequence < self._start:
+                # Changes after the cursor were dropped while waiting.
+                return six.text_type(self._sequence), None
+
+            changes = [change for number, change in self._changes if number > sequence]
+            return six.text_type(max(self._sequence, sequence)), changes
+
+
+class PostgresBroker(LocalBroker):
+    """Broker of changes using Postgres ``LISTEN``/``NOTIFY``.
+
+    Changes are sent as notifications to the channel given by the
+    ``CHANNEL`` key of ``FLOW_CHANGES`` setting (``resolwe_changes`` by
+    default) together with a sequence number from a database sequence,
+    so cursors are the same in all processes. Notifications are sent
+    under an advisory lock, so they are delivered in the order of their
+    sequence numbers.
+
+    Each process listens to the channel on a dedicated database
+    connection in a background thread, which is started when a client
+    waits for changes for the first time, and buffers received changes
+    as :class:`LocalBroker`. Changes published before the process
+    started listening (or while it was reconnecting) are not known to
+    it, so resynchronization is requested for older cursors.
+
+    """
+
+    #: time between checks of the listening connection
+    poll_interval = 5
+
+    #: maximal time to wait for the listener to start (in seconds)
+    listen_timeout = 5
+
+    #: key of the advisory lock held while publishing a change
+    lock_id = 0x7265736f  # 'reso'
+
+    def __init__(self, *args, **kwargs):
+        """Initialize attributes."""
+        super(PostgresBroker, self).__init__(*args, **kwargs)
+        self.channel = _get_setting('CHANNEL', 'resolwe_changes')
+        self._listener = None
+        self._listener_lock = threading.Lock()
+        self._listening = threading.Event()
+
+    def publish(self, change):
+        """Send the change as notification with the next sequence number."""
+        with transaction.atomic(using='default'), connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [self.lock_id])
+            cursor.execute(
+                "SELECT pg_notify(%s, json_build_object("
+                "'sequence', nextval('resolwe_flow_change_seq'), 'change', %s::json)::text)",
+                [self.channel, json.dumps(change)]
+            )
+
+    def _is_valid(self, sequence):
+        """Return ``True`` if changes after ``sequence`` are known.
+
+        Cursors after the latest received change are valid, as the
+        change may have been received by another process first.
+
+        """
+        return self._start <= sequence
+
+    def _listen(self):
+        """Receive notifications and add them to the buffer."""
+        wrapper = connections['default']
+        while True:
+            connection = None
+            try:
+                connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute('LISTEN {}'.format(wrapper.ops.quote_name(self.channel)))
+                    # All changes with a greater sequence number are
+                    # committed after listening started.
+                    cursor.execute(
+                        'SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM resolwe_flow_change_seq'
+                    )
+                    self._reset(max(cursor.fetchone()[0], self._sequence))
+                self._listening.set()
+
+                while True:
+                    if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                        continue
+
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        payload = json.loads(notify.payload)
+                        self._add(payload['sequence'], payload['change'])
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(__("Listening to changes on channel '{}' failed.", self.channel))
+                self._listening.clear()
+                if connection is not None:
+                    connection.close()
+                time.sleep(self.poll_interval)
+
+    def wait(self, cursor=None, timeout=0):
+        """Start listening and return changes after ``cursor``.
+
+        If the process doesn't start listening to changes within
+        ``listen_timeout``, ``cursor`` is returned without changes.
+
+        """
+        deadline = time.time() + timeout
+        with self._listener_lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='resolwe-changes-listener')
+                self._listener.daemon = True
+                self._listener.start()
+
+        if not self._listening.wait(max(timeout, self.listen_timeout)):
+            return cursor, []
+
+        return super(PostgresBroker, self).wait(cursor, max(deadline - time.time(), 0))
+
+
+_broker = None  # pylint: disable=invalid-name
+_broker_lock = threading.Lock()  # pylint: disable=invalid-name
+
+
+def get_broker():
+    """Return broker configured in ``FLOW_CHANGES`` setting."""
+    global _broker  # pylint: disable=global-statement,invalid-name
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(_get_setting('BROKER', 'resolwe.flow.changes.PostgresBroker'))()
+
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    """Create a new broker after ``FLOW_CHANGES`` setting is changed."""
+    global _broker  # pylint: disable=global-statement,invalid-name
+    if setting == 'FLOW_CHANGES':
+        with _broker_lock:
+            _broker = None
+
+
+def publish_data_change(data, update_fields=None):
+    """Publish change of the ``data`` object when the transaction commits."""
+    change = {
+        'id': data.pk,
+        'status': data.status,
+        'progress': data.process_progress,
+        'modified': data.modified.isoformat() if data.modified else None,
+        'fields': sorted(update_fields) if update_fields is not None else None,
+    }
+    transaction.on_commit(lambda: get_broker().publish(change))
@@ -26,7 +26,8 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 
 from resolwe.flow.engine import BaseEngine
-from resolwe.flow.models import Data, Process
+from resolwe.flow.models import Data
+from resolwe.flow.registry import process_registry
 from resolwe.flow.utils import dict_dot, iterate_fields
 from resolwe.flow.utils.purge import data_purge
 from resolwe.utils import BraceMessage as __
@@ -282,7 +283,7 @@ class BaseFlowExecutor(BaseEngine):
                 # Spawn processors
                 for d in spawn_processors:
                     d['contributor'] = parent_data.contributor
-                    d['process'] = Process.objects.filter(slug=d['process']).latest()
+                    d['process'] = process_registry.get_latest(d['process'])
 
                     for field_schema, fields in iterate_fields(d.get('input', {}), d['process'].input_schema):
                         type_ = field_schema['type']
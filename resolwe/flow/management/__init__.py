@@ -4,6 +4,9 @@
 Flow Management
 ===============
 
+.. automodule:: resolwe.flow.management.commands.dedup_report
+    :members:
+
 .. automodule:: resolwe.flow.management.commands.purge
     :members:
 
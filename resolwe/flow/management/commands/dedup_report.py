@@ -0,0 +1,110 @@
+""".. Ignore pydocstyle D400.
+
+=========================
+Report Duplicated Results
+=========================
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+
+from resolwe.flow.models import Data
+from resolwe.flow.utils import iterate_fields
+
+#: number of checksums processed in a single query
+CHECKSUM_BATCH_SIZE = 1000
+
+
+def _get_size(obj):
+    """Return size of a file or directory output, ignoring malformed values."""
+    return obj.get('size', 0) if isinstance(obj, dict) else 0
+
+
+def get_output_size(data):
+    """Return total size of files and directories in outputs of ``data``."""
+    size = 0
+    for field_schema, fields in iterate_fields(data.output, data.process.output_schema):
+        value = fields[field_schema['name']]
+        type_ = field_schema.get('type', '')
+        if type_.startswith('basic:file:') or type_.startswith('basic:dir:'):
+            size += _get_size(value)
+        elif type_.startswith('list:basic:file:') or type_.startswith('list:basic:dir:'):
+            if isinstance(value, list):
+                size += sum(_get_size(obj) for obj in value)
+
+    return size
+
+
+class Command(BaseCommand):
+    """Report data objects that were computed multiple times."""
+
+    help = "Report data objects with the same checksum and the resources wasted on them."
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('-p', '--process', type=str, help="limit report to process with given slug")
+        parser.add_argument('-m', '--min-count', type=int, default=2,
+                            help="minimal number of data objects with the same checksum")
+        parser.add_argument('-l', '--limit', type=int, default=20, help="number of checksums listed")
+
+    def get_duplicates(self, process=None, min_count=2):
+        """Return checksums of successfully computed data objects with duplicates."""
+        queryset = Data.objects.filter(status=Data.STATUS_DONE)
+        if process:
+            queryset = queryset.filter(process__slug=process)
+
+        return list(queryset.values('checksum', 'process__slug').annotate(
+            count=Count('id'),
+            time=Sum(ExpressionWrapper(F('finished') - F('started'), output_field=DurationField())),
+        ).filter(count__gte=min_count).order_by('-count', 'checksum'))
+
+    def get_sizes(self, checksums):
+        """Return total output sizes of data objects with given checksums."""
+        sizes = dict.fromkeys(checksums, 0)
+        for start in range(0, len(checksums), CHECKSUM_BATCH_SIZE):
+            queryset = Data.objects.filter(
+                status=Data.STATUS_DONE,
+                checksum__in=checksums[start:start + CHECKSUM_BATCH_SIZE],
+            ).select_related('process').only('checksum', 'output', 'process__output_schema')
+
+            for data in queryset.iterator():
+                sizes[data.checksum] += get_output_size(data)
+
+        return sizes
+
+    def handle(self, *args, **options):
+        """Print the report."""
+        duplicates = self.get_duplicates(options['process'], options['min_count'])
+        sizes = self.get_sizes([duplicate['checksum'] for duplicate in duplicates])
+
+        total_count, total_time, total_size = 0, datetime.timedelta(), 0
+        for index, duplicate in enumerate(duplicates):
+            # All data objects with the same checksum hold the same
+            # results, so only one of them was really needed.
+            wasted = duplicate['count'] - 1
+            time = (duplicate['time'] or datetime.timedelta()) * wasted // duplicate['count']
+            size = sizes[duplicate['checksum']] * wasted // duplicate['count']
+
+            total_count += wasted
+            total_time += time
+            total_size += size
+
+            if index < options['limit']:
+                self.stdout.write(
+                    "{checksum} {process} count: {count}, wasted time: {time}, wasted size: {size}".format(
+                        checksum=duplicate['checksum'],
+                        process=duplicate['process__slug'],
+                        count=duplicate['count'],
+                        time=time,
+                        size=size,
+                    )
+                )
+
+        self.stdout.write("Duplicated checksums: {}".format(len(duplicates)))
+        self.stdout.write("Redundant data objects: {}".format(total_count))
+        self.stdout.write("Wasted time: {}".format(total_time))
+        self.stdout.write("Wasted size: {}".format(total_size))
@@ -0,0 +1,51 @@
+""".. Ignore pydocstyle D400.
+
+================
+Bulk Delete Data
+================
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from resolwe.flow.models import Collection, Data
+from resolwe.flow.utils.delete import delete_data
+from resolwe.flow.utils.purge import remove_data_dirs
+
+
+class Command(BaseCommand):
+    """Delete data objects in bulk."""
+
+    help = "Delete data objects with given ids, optionally with their descendants or whole collections."
+
+    def add_arguments(self, parser):
+        """Command arguments."""
+        parser.add_argument('ids', type=int, nargs='*', help="ids of data objects")
+        parser.add_argument('-d', '--descendants', action='store_true', help="delete descendants of data objects")
+        parser.add_argument('-c', '--collection', type=int, nargs='+', default=[],
+                            help="delete collections with given ids together with their data objects")
+
+    def handle(self, *args, **options):
+        """Call :func:`~resolwe.flow.utils.delete.delete_data`.
+
+        Directories of deleted data objects are removed before the
+        command exits (and not by the manager, which may remove them in
+        a background thread).
+
+        """
+        data_ids = set(options['ids'])
+        with transaction.atomic():
+            collections = Collection.objects.filter(pk__in=options['collection'])
+            data_ids.update(Data.objects.filter(collection__in=collections).values_list('pk', flat=True))
+
+            deleted = delete_data(data_ids, descendants=options['descendants'], remove_dirs=False)
+            collections_count = collections.count()
+            collections.delete()
+
+        remove_data_dirs(deleted)
+
+        self.stdout.write("Deleted data objects: {}".format(len(deleted)))
+        if options['collection']:
+            self.stdout.write("Deleted collections: {}".format(collections_count))
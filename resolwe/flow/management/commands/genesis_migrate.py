@@ -347,16 +347,15 @@ class Command(BaseCommand):
         data_path = self.storage_index[str(storage[u'_id'])]['path']
         data = Data.objects.get(pk=data_id)
 
-        new = Storage()
-        new.name = 'data_{}_storage'.format(data_id)
-        new.data = data
-        new.json = storage[u'json']
-        new.contributor = self.get_contributor(storage[u'author_id'])
-        # XXX: Django will change this on create
-        new.created = storage[u'date_created']
-        # XXX: Django will change this on save
-        new.modified = storage[u'date_modified']
-        new.save()
+        # XXX: Django will change `created` on create and `modified` on save
+        new = Storage.objects.get_or_create_json(
+            storage[u'json'],
+            name='data_{}_storage'.format(data_id),
+            contributor=self.get_contributor(storage[u'author_id']),
+            created=storage[u'date_created'],
+            modified=storage[u'date_modified'],
+        )
+        new.data.add(data)
 
         dict_dot(data.output, data_path, new.pk)
         data.save()
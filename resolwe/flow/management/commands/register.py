@@ -17,6 +17,7 @@ from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand
 from django.db.models import Max
 from django.utils.text import slugify
+from django.utils.timezone import now
 
 from resolwe.flow.engine import InvalidEngineError
 from resolwe.flow.finders import get_finders
@@ -24,6 +25,7 @@ from resolwe.flow.managers import manager
 from resolwe.flow.models import DescriptorSchema, Process
 from resolwe.flow.models.base import VERSION_NUMBER_BITS
 from resolwe.flow.models.utils import validation_schema
+from resolwe.flow.registry import process_registry
 from resolwe.flow.utils import iterate_schema
 from resolwe.permissions.utils import copy_permissions
 
@@ -184,7 +186,10 @@ class Command(BaseCommand):
                         self.stdout.write("Skip processor {}: same version installed".format(slug))
                     continue
 
-                process_query.update(**p)
+                # Modification time is not set by updates, but registries
+                # of processes are invalidated by it.
+                process_query.update(modified=now(), **p)
+                process_registry.invalidate()
                 log_processors.append("Updated {}".format(slug))
             else:
                 process = Process.objects.create(contributor=user, **p)
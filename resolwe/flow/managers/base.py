@@ -9,14 +9,16 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import logging
 import os
+import threading
 
 from django.conf import settings
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 
 from resolwe.flow.engine import InvalidEngineError, load_engines
 from resolwe.flow.execution_engines import ExecutionError
 from resolwe.flow.models import Data, Process
 from resolwe.flow.utils import iterate_fields
+from resolwe.flow.utils.purge import remove_data_dirs
 from resolwe.utils import BraceMessage as __
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -63,6 +65,10 @@ class BaseManager(object):
 
     def __init__(self):
         """Initialize arguments."""
+        self._trigger_lock = threading.Lock()
+        self._trigger_pending = False
+        self._trigger_thread = None
+
         self.discover_engines()
 
     def discover_engines(self):
@@ -91,6 +97,58 @@ class BaseManager(object):
         """Run process."""
         raise NotImplementedError('`run` function not implemented')
 
+    def trigger(self, verbosity=0):
+        """Request the manager to process resolving objects.
+
+        Managers only enqueue the request and return immediately. By
+        default, :meth:`communicate` is called in a separate thread and
+        requests made while it is running are merged into a single
+        additional call. If the ``FLOW_MANAGER_SYNC_TRIGGER`` setting is
+        set, :meth:`communicate` is called synchronously instead.
+
+        """
+        if getattr(settings, 'FLOW_MANAGER_SYNC_TRIGGER', False):
+            self.communicate(verbosity=verbosity)
+            return
+
+        with self._trigger_lock:
+            self._trigger_pending = True
+            if self._trigger_thread is not None:
+                # Running thread will pick up the request.
+                return
+
+            self._trigger_thread = threading.Thread(target=self._communicate_triggered, args=(verbosity,))
+            self._trigger_thread.daemon = True
+            self._trigger_thread.start()
+
+    def _communicate_triggered(self, verbosity):
+        """Call :meth:`communicate` until there are no pending requests."""
+        try:
+            while True:
+                with self._trigger_lock:
+                    if not self._trigger_pending:
+                        self._trigger_thread = None
+                        return
+                    self._trigger_pending = False
+
+                try:
+                    self.communicate(verbosity=verbosity)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Unhandled exception in triggered manager run.")
+        finally:
+            # Thread has its own database connection.
+            connection.close()
+
+    def remove_data_dirs(self, data_ids):
+        """Remove directories of deleted data objects in background.
+
+        By default, directories are removed in a separate thread.
+
+        """
+        thread = threading.Thread(target=remove_data_dirs, args=(list(data_ids),))
+        thread.daemon = True
+        thread.start()
+
     def communicate(self, run_sync=False, verbosity=1):
         """Resolve task dependencies and run the task."""
         queue = []
@@ -9,7 +9,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import sys
 
-from ..tasks import celery_run
+from ..tasks import celery_communicate, celery_remove_data_dirs, celery_run
 from .base import BaseManager
 
 try:
@@ -22,6 +22,14 @@ except ImportError:
 class Manager(BaseManager):
     """Celey-based manager for job execution."""
 
+    def trigger(self, verbosity=0):
+        """Enqueue processing of resolving objects to a Celery worker."""
+        celery_communicate.apply_async((verbosity,), queue='hipri')
+
+    def remove_data_dirs(self, data_ids):
+        """Enqueue removal of directories of deleted data objects to a Celery worker."""
+        celery_remove_data_dirs.apply_async((list(data_ids),), queue='ordinary')
+
     def run(self, data_id, script, priority='normal', run_sync=False, verbosity=1):
         """Run process."""
         queue = 'ordinary'
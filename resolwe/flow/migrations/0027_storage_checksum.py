@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+def get_json_checksum(value):
+    """Compute checksum of a JSON serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def link_data(apps, schema_editor):
+    Storage = apps.get_model('flow', 'Storage')
+    Through = Storage._meta.get_field('data_m2m').remote_field.through
+
+    links = []
+    for storage in Storage.objects.all().iterator():
+        storage.checksum = get_json_checksum(storage.json)
+        storage.save(update_fields=['checksum'])
+
+        links.append(Through(storage_id=storage.pk, data_id=storage.data_id))
+        if len(links) >= 1000:
+            Through.objects.bulk_create(links)
+            links = []
+
+    Through.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0026_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storage',
+            name='checksum',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='storage',
+            name='data_m2m',
+            field=models.ManyToManyField(related_name='+', to='flow.Data'),
+        ),
+        migrations.RunPython(link_data),
+        migrations.RemoveField(
+            model_name='storage',
+            name='data',
+        ),
+        migrations.RenameField(
+            model_name='storage',
+            old_name='data_m2m',
+            new_name='data',
+        ),
+        migrations.AlterField(
+            model_name='storage',
+            name='data',
+            field=models.ManyToManyField(to='flow.Data'),
+        ),
+        migrations.AlterField(
+            model_name='storage',
+            name='checksum',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+    ]
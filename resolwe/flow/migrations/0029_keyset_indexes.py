@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Composite indexes used by keyset pagination.
+INDEXES = [
+    ('flow_data', 'created'),
+    ('flow_data', 'modified'),
+    ('flow_collection', 'created'),
+    ('flow_collection', 'modified'),
+    ('flow_entity', 'created'),
+    ('flow_entity', 'modified'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0028_data_checksum_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX {table}_{column}_id_idx ON {table} ({column}, id);'.format(table=table, column=column),
+            reverse_sql='DROP INDEX {table}_{column}_id_idx;'.format(table=table, column=column),
+        )
+        for table, column in INDEXES
+    ]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+SIZE_TYPES = ('basic:file:', 'list:basic:file:', 'basic:dir:', 'list:basic:dir:')
+
+
+def iterate_fields(fields, schema):
+    """Iterate over field schemas and values of all (sub)fields."""
+    schema_dict = {val['name']: val for val in schema}
+    for field_id, properties in fields.items():
+        if field_id not in schema_dict:
+            raise KeyError("Field definition ({}) missing in schema".format(field_id))
+        if 'group' in schema_dict[field_id]:
+            for rvals in iterate_fields(properties, schema_dict[field_id]['group']):
+                yield rvals
+        else:
+            yield schema_dict[field_id], fields
+
+
+def get_size(data):
+    size = 0
+    try:
+        for field_schema, fields in iterate_fields(data.output, data.process.output_schema):
+            if not field_schema.get('type', '').startswith(SIZE_TYPES):
+                continue
+
+            value = fields[field_schema['name']]
+            for obj in value if isinstance(value, list) else [value]:
+                if isinstance(obj, dict):
+                    size += obj.get('size', 0)
+    except (KeyError, TypeError, AttributeError):
+        # Output doesn't match the schema of the process.
+        pass
+
+    return size
+
+
+def calculate_size(apps, schema_editor):
+    Data = apps.get_model('flow', 'Data')
+    for data in Data.objects.select_related('process').only('output', 'process__output_schema').iterator():
+        size = get_size(data)
+        if size:
+            Data.objects.filter(pk=data.pk).update(size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0029_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='data',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(calculate_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0030_data_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='storage',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        # Storages, which were created before deduplication and have the
+        # same content as an older storage, are not deduplicated.
+        migrations.RunSQL(
+            'UPDATE flow_storage SET checksum = NULL WHERE id NOT IN ('
+            'SELECT MIN(id) FROM flow_storage GROUP BY checksum);',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX flow_storage_checksum_uniq ON flow_storage (checksum) WHERE checksum IS NOT NULL;',
+            reverse_sql='DROP INDEX flow_storage_checksum_uniq;',
+        ),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations
+
+
+class ChecksumWriter(object):
+    """File-like object, which calculates checksum of data written to it."""
+
+    def __init__(self):
+        self.checksum = hashlib.sha256()
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.checksum.update(data)
+
+
+def get_query_checksum(cursor, sql, params=None):
+    """Compute checksum of the result of query streamed with ``COPY``."""
+    query = cursor.mogrify(sql, params)
+    if isinstance(query, bytes):
+        query = query.decode('utf-8')
+
+    writer = ChecksumWriter()
+    cursor.copy_expert('COPY ({}) TO STDOUT'.format(query), writer)
+    return writer.checksum.hexdigest()
+
+
+def calculate_checksums(apps, schema_editor):
+    """Calculate checksums of storages from text representation of ``jsonb``."""
+    Storage = apps.get_model('flow', 'Storage')
+
+    checksums = {}
+    with schema_editor.connection.cursor() as cursor:
+        for pk in Storage.objects.order_by('pk').values_list('pk', flat=True).iterator():
+            checksum = get_query_checksum(cursor, 'SELECT json::text FROM flow_storage WHERE id = %s', [pk])
+            checksums.setdefault(checksum, pk)
+
+    # Only the oldest storage with the same content is deduplicated.
+    Storage.objects.update(checksum=None)
+    for checksum, pk in checksums.items():
+        Storage.objects.filter(pk=pk).update(checksum=checksum)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0031_storage_checksum_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(calculate_checksums, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flow', '0032_storage_jsonb_checksum'),
+    ]
+
+    operations = [
+        # Sequence numbers of published changes of data objects, which
+        # are used as cursors of the change feed.
+        migrations.RunSQL(
+            'CREATE SEQUENCE resolwe_flow_change_seq;',
+            reverse_sql='DROP SEQUENCE resolwe_flow_change_seq;',
+        ),
+    ]
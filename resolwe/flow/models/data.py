@@ -2,7 +2,6 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import copy
-import json
 import os
 
 import six
@@ -11,7 +10,8 @@ from django.conf import settings
 from django.contrib.postgres.fields import ArrayField, JSONField
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models, transaction
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
 
 from guardian.shortcuts import assign_perm
 
@@ -28,6 +28,96 @@ from .utils import (
 )
 
 
+class DataQuerySet(models.QuerySet):
+    """Query set for :class:`Data` objects.
+
+    Adds lineage queries, which follow the ``parents`` relation
+    transitively in a single recursive SQL query instead of walking
+    it one level at a time.
+
+    """
+
+    #: template of the recursive query used to traverse the lineage
+    LINEAGE_SQL = """
+        WITH RECURSIVE lineage(id, depth) AS (
+            SELECT edge.{target}, 1
+            FROM {table} edge
+            WHERE edge.{source} = ANY(%s)
+          UNION
+            SELECT edge.{target}, lineage.depth + 1
+            FROM {table} edge
+            JOIN lineage ON edge.{source} = lineage.id
+            WHERE %s IS NULL OR lineage.depth < %s
+        )
+        SELECT {columns} FROM lineage
+    """
+
+    def _lineage_sql(self, data, direction, max_depth, columns):
+        """Return SQL and params of the lineage query.
+
+        ``direction`` is either ``ancestors`` or ``descendants``.
+
+        """
+        if isinstance(data, (models.Model, six.integer_types)):
+            data = [data]
+        data_ids = [getattr(item, 'pk', item) for item in data]
+
+        through = self.model.parents.through
+        child = through._meta.get_field('from_data').column  # pylint: disable=protected-access
+        parent = through._meta.get_field('to_data').column  # pylint: disable=protected-access
+        if direction == 'ancestors':
+            source, target = child, parent
+        elif direction == 'descendants':
+            source, target = parent, child
+        else:
+            raise ValueError("Unknown lineage direction: {}".format(direction))
+
+        quote_name = connections[self.db].ops.quote_name
+        sql = self.LINEAGE_SQL.format(
+            table=quote_name(through._meta.db_table),  # pylint: disable=protected-access
+            source=quote_name(source),
+            target=quote_name(target),
+            columns=columns,
+        )
+        return sql, (data_ids, max_depth, max_depth)
+
+    def _lineage(self, data, direction, max_depth):
+        """Filter query set to the lineage of given objects."""
+        sql, params = self._lineage_sql(data, direction, max_depth, 'id')
+        return self.filter(pk__in=RawSQL(sql, params))
+
+    def ancestors(self, data, max_depth=None):
+        """Filter query set to all ancestors of given objects.
+
+        ``data`` is a :class:`Data` object, an id or an iterable of
+        them. If ``max_depth`` is given, only ancestors up to that
+        many levels above the given objects are included.
+
+        """
+        return self._lineage(data, 'ancestors', max_depth)
+
+    def descendants(self, data, max_depth=None):
+        """Filter query set to all descendants of given objects.
+
+        Arguments are the same as in :meth:`ancestors`.
+
+        """
+        return self._lineage(data, 'descendants', max_depth)
+
+    def lineage_depths(self, data, direction, max_depth=None):
+        """Return a dict mapping ids in the lineage to their depth.
+
+        ``direction`` is either ``ancestors`` or ``descendants``. Depth
+        is the length of the shortest path from any of the given
+        objects, so direct parents and children have depth 1.
+
+        """
+        sql, params = self._lineage_sql(data, direction, max_depth, 'id, MIN(depth)')
+        with connections[self.db].cursor() as cursor:
+            cursor.execute('{} GROUP BY id'.format(sql), params)
+            return dict(cursor.fetchall())
+
+
 class Data(BaseModel):
     """Postgres model for storing data."""
 
@@ -75,7 +165,7 @@ class Data(BaseModel):
     finished = models.DateTimeField(blank=True, null=True, db_index=True)
 
     #: checksum field calculated on inputs
-    checksum = models.CharField(max_length=64, validators=[
+    checksum = models.CharField(max_length=64, db_index=True, validators=[
         RegexValidator(
             regex=r'^[0-9a-f]{64}$',
             message='Checksum is exactly 40 alphanumerics',
@@ -145,11 +235,34 @@ class Data(BaseModel):
     #: tags for categorizing objects
     tags = ArrayField(models.CharField(max_length=255), default=list)
 
+    #: total size of output files and directories in bytes (set by
+    #: :func:`~resolwe.flow.models.utils.hydrate_size`)
+    size = models.BigIntegerField(default=0)
+
+    objects = DataQuerySet.as_manager()
+
     def __init__(self, *args, **kwargs):
         """Initialize attributes."""
         super(Data, self).__init__(*args, **kwargs)
         self._original_name = self.name
 
+    def _save_json_file(self, file_path):
+        """Save JSON file to a Storage object and return it.
+
+        File is not parsed in Python, but streamed to the database,
+        where it is validated and converted by Postgres. Files larger
+        than ``FLOW_STORAGE_MAX_SIZE`` bytes are rejected.
+
+        """
+        max_size = getattr(settings, 'FLOW_STORAGE_MAX_SIZE', None)
+        if max_size is not None and os.path.getsize(file_path) > max_size:
+            raise ValidationError(
+                'JSON file "{}" exceeds the maximum size of {} bytes'.format(file_path, max_size))
+
+        storage = Storage.objects.get_or_create_file(file_path, contributor=self.contributor)
+        storage.data.add(self)
+        return storage
+
     def save_storage(self, instance, schema):
         """Save basic:json values to a Storage collection."""
         for field_schema, fields in iterate_fields(instance, schema):
@@ -167,15 +280,13 @@ class Data(BaseModel):
                 if isinstance(value, six.string_types):
                     file_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(self.pk), value)
                     if os.path.isfile(file_path):
-                        with open(file_path) as file_handler:
-                            value = json.load(file_handler)
+                        # `value` is copied by value, so `fields[name]` must be changed
+                        fields[name] = self._save_json_file(file_path).pk
+                        continue
 
-                storage = Storage.objects.create(
-                    name='Storage for data id {}'.format(self.pk),
-                    contributor=self.contributor,
-                    data_id=self.pk,
-                    json=value,
-                )
+                # Reuse an existing storage with the same content.
+                storage = Storage.objects.get_or_create_json(value, contributor=self.contributor)
+                storage.data.add(self)
 
                 # `value` is copied by value, so `fields[name]` must be changed
                 fields[name] = storage.pk
@@ -265,6 +376,16 @@ class Data(BaseModel):
 
         if self.status != Data.STATUS_ERROR:
             hydrate_size(self)
+            # Total size is computed from output.
+            update_fields = kwargs.get('update_fields', None)
+            if update_fields is not None and 'output' in update_fields and 'size' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['size']
+
+        update_fields = kwargs.get('update_fields', None)
+        if update_fields and 'modified' not in update_fields:
+            # Modification time must be updated, as it is used to
+            # validate cached responses (i.e. ETag).
+            kwargs['update_fields'] = list(update_fields) + ['modified']
 
         if create:
             validate_schema(self.input, self.process.input_schema)  # pylint: disable=no-member
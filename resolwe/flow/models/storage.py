@@ -1,41 +1,268 @@
 """Resolwe storage model."""
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import codecs
+import io
+
+import six
+
 from django.contrib.postgres.fields import JSONField
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import DataError, connection, models, transaction
+from django.db.models.expressions import RawSQL
+
+from resolwe.flow.utils import get_json_checksum, get_query_checksum
 
 from .base import BaseModel
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+#: size of chunks in which JSON files are copied to the database
+STORAGE_CHUNK_SIZE = 1024 * 1024
+
+
+def get_storage_checksum(value):
+    """Compute checksum of JSON ``value``.
+
+    Checksum is calculated from the text representation of ``jsonb``
+    value in the database, so JSON saved from Python and from a file
+    (see :meth:`StorageQuerySet.get_or_create_file`) has the same
+    checksum. The representation is reproduced in Python, so the value
+    is not sent to the database to calculate it.
+
+    """
+    return get_json_checksum(value)
+
+
+class _CopyFile(object):
+    """Wrap file as an input of ``COPY ... FROM STDIN`` in text format.
+
+    Characters with a special meaning in the text format are escaped,
+    so each line of the file is copied to a row unchanged. The file is
+    checked to be UTF-8 encoded and not to contain NUL characters (which
+    can't be stored in Postgres text). Reading stops at the first
+    invalid byte, which is reported in ``error``.
+
+    """
+
+    def __init__(self, file_handler):
+        """Initialize attributes."""
+        self.file_handler = file_handler
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.error = None
+
+    def read(self, size=-1):
+        """Read escaped chunk of the file."""
+        if self.error is not None:
+            return b''
+
+        chunk = self.file_handler.read(size)
+        try:
+            self.decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as error:
+            self.error = 'is not UTF-8 encoded: {}'.format(error)
+            return b''
+
+        if b'\0' in chunk:
+            self.error = 'contains NUL characters'
+            return b''
+
+        return chunk.replace(b'\\', b'\\\\').replace(b'\t', b'\\t').replace(b'\r', b'\\r')
+
+
+class StorageQuerySet(models.QuerySet):
+    """Query set for ``Storage`` objects."""
+
+    def get_or_create_json(self, value, checksum=None, **defaults):
+        """Return storage with JSON ``value`` and create it if it doesn't exist.
+
+        ``checksum`` of the value is calculated if it is not given.
+        ``defaults`` are used as field values of the created storage,
+        which is named after the checksum by default.
+
+        """
+        if checksum is None:
+            checksum = get_storage_checksum(value)
+
+        defaults.setdefault('name', 'Storage {}'.format(checksum))
+        defaults['json'] = value
+
+        storage, _ = self.get_or_create(checksum=checksum, defaults=defaults)
+        return storage
+
+    def get_or_create_file(self, file_path, **defaults):
+        """Return storage with JSON from file and create it if it doesn't exist.
+
+        The file is streamed to the database with ``COPY`` and parsed by
+        Postgres, so it is never loaded into memory as a whole.
+        ``ValidationError`` is raised if the file is not UTF-8 encoded,
+        if it contains NUL characters or if it is not a valid JSON.
+
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE storage_file_lines (id serial, line text)')
+            with io.open(file_path, 'rb') as file_handler:
+                copy_file = _CopyFile(file_handler)
+                cursor.copy_expert('COPY storage_file_lines (line) FROM STDIN', copy_file, size=STORAGE_CHUNK_SIZE)
+            if copy_file.error is not None:
+                raise ValidationError('File "{}" {}'.format(file_path, copy_file.error))
+
+            try:
+                with transaction.atomic():
+                    cursor.execute(
+                        "CREATE TEMPORARY TABLE storage_file_json AS "
+                        "SELECT string_agg(line, E'\\n' ORDER BY id)::jsonb AS value FROM storage_file_lines"
+                    )
+            except DataError:
+                raise ValidationError('File "{}" is not a valid JSON'.format(file_path))
+
+            cursor.execute('SELECT value IS NULL FROM storage_file_json')
+            if cursor.fetchone()[0]:
+                raise ValidationError('File "{}" is not a valid JSON'.format(file_path))
+
+            checksum = get_query_checksum(cursor, 'SELECT value::text FROM storage_file_json')
+            storage = self.get_or_create_json(
+                RawSQL('SELECT value FROM storage_file_json', []), checksum=checksum, **defaults
+            )
+
+            cursor.execute('DROP TABLE storage_file_lines, storage_file_json')
+
+        if isinstance(storage.json, RawSQL):
+            # JSON of the created storage is not loaded from the database.
+            storage = self.defer('json').get(pk=storage.pk)
+
+        return storage
+
 
 class Storage(BaseModel):
-    """Postgres model for storing storages."""
+    """Postgres model for storing storages.
 
-    #: corresponding data object
-    data = models.ForeignKey('Data')
+    Storages are content addressed - identical JSON documents saved by
+    different data objects are stored only once and shared between
+    them. Checksums are unique (enforced by a partial unique index in
+    the database), so storages should be created with
+    :meth:`~StorageQuerySet.get_or_create_json`. Name and contributor
+    of a shared storage are set by the data object which created it.
+
+    """
+
+    #: corresponding data objects
+    data = models.ManyToManyField('Data')
+
+    #: checksum of the stored JSON (``None`` if the same JSON is stored
+    #: in another storage)
+    checksum = models.CharField(max_length=64, blank=True, null=True)
 
     #: actual JSON stored
     json = JSONField()
 
+    objects = StorageQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        """Calculate the checksum of the JSON and save the storage.
+
+        The checksum is calculated on every save, unless JSON is given
+        as an SQL expression, when the checksum must be set by the
+        caller. If JSON of an existing storage is changed to JSON of
+        another storage, its checksum is cleared.
+
+        """
+        if not hasattr(self.json, 'resolve_expression'):
+            self.checksum = get_storage_checksum(self.json)
+            if self.pk is not None and Storage.objects.filter(checksum=self.checksum).exclude(pk=self.pk).exists():
+                self.checksum = None
+
+        super(Storage, self).save(*args, **kwargs)
 
-class LazyStorageJSON(object):
-    """Lazy load `json` attribute of `Storage` object."""
 
-    def __init__(self, **kwargs):
+class LazyStorageJSON(Mapping):
+    """Lazy load `json` attribute of `Storage` object.
+
+    Access by key is resolved in the database with jsonb path operators
+    and results are cached per path, so only the requested value is
+    transferred. Nested objects are returned as lazy nodes sharing the
+    cache of the root object, while other values (lists, strings,
+    numbers, ...) are returned as plain JSON values. The whole document
+    at the node's path is loaded when the node is iterated, compared or
+    printed.
+
+    """
+
+    def __init__(self, _path=(), _cache=None, **kwargs):
         """Initialize private attributes."""
         self._kwargs = kwargs
-        self._json = None
+        self._path = _path
+        self._cache = _cache if _cache is not None else {}
+
+    def _query(self, path, **expressions):
+        """Evaluate SQL expressions on `json` field at the given path."""
+        quote_name = connection.ops.quote_name
+        column = '{}.{}'.format(
+            quote_name(Storage._meta.db_table),  # pylint: disable=protected-access
+            quote_name(Storage._meta.get_field('json').column),  # pylint: disable=protected-access
+        )
+        path = [six.text_type(key) for key in path]
+        annotations = {
+            name: RawSQL(sql.format(value='{} #> %s'.format(column)), [path] * sql.count('{value}'), output_field)
+            for name, (sql, output_field) in expressions.items()
+        }
+        return Storage.objects.filter(**self._kwargs).annotate(**annotations).values(*annotations).get()
 
     def _get_storage(self):
-        """Load `json` field from `Storage` object."""
-        if self._json is None:
-            self._json = Storage.objects.get(**self._kwargs).json
+        """Load JSON at the node's path from `Storage` object."""
+        key = ('json', self._path)
+        if key not in self._cache:
+            self._cache[key] = self._query(self._path, json_value=('{value}', JSONField()))['json_value']
+
+        return self._cache[key]
 
     def __getitem__(self, key):
         """Access by key."""
-        self._get_storage()
-        return self._json[key]
+        json_value = self._cache.get(('json', self._path))
+        if json_value is not None:
+            return json_value[key]
+
+        path = self._path + (key,)
+        if path not in self._cache:
+            # Objects are not transferred, they are resolved lazily.
+            result = self._query(
+                path,
+                json_type=('jsonb_typeof({value})', models.CharField()),
+                json_value=("CASE WHEN jsonb_typeof({value}) = 'object' THEN NULL ELSE {value} END", JSONField()),
+            )
+            if result['json_type'] is None:
+                raise KeyError(key)
+
+            if result['json_type'] == 'object':
+                self._cache[path] = LazyStorageJSON(_path=path, _cache=self._cache, **self._kwargs)
+            else:
+                self._cache[path] = result['json_value']
+
+        return self._cache[path]
+
+    def __iter__(self):
+        """Iterate over the loaded JSON."""
+        return iter(self._get_storage())
+
+    def __len__(self):
+        """Return length of the loaded JSON."""
+        return len(self._get_storage())
+
+    def __eq__(self, other):
+        """Compare the loaded JSON."""
+        if isinstance(other, LazyStorageJSON):
+            other = other._get_storage()  # pylint: disable=protected-access
+        return self._get_storage() == other
+
+    def __ne__(self, other):
+        """Compare the loaded JSON."""
+        return not self == other
+
+    __hash__ = None
 
     def __repr__(self):
         """Format the object representation."""
-        self._get_storage()
-        return self._json.__repr__()
+        return self._get_storage().__repr__()
@@ -340,7 +340,8 @@ def hydrate_size(data):
     """Add file and dir sizes.
 
     Add sizes to ``basic:file:``, ``list:basic:file``, ``basic:dir:``
-    and ``list:basic:dir:`` fields.
+    and ``list:basic:dir:`` fields and set their total to ``size`` of
+    the data object.
 
     """
     from .data import Data  # prevent circular import
@@ -348,13 +349,14 @@ def hydrate_size(data):
     def add_file_size(obj):
         """Add file size to the basic:file field."""
         if data.status in [Data.STATUS_DONE, Data.STATUS_ERROR] and 'size' in obj:
-            return
+            return obj['size']
 
         path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk), obj['file'])
         if not os.path.isfile(path):
             raise ValidationError("Referenced file does not exist ({})".format(path))
 
         obj['size'] = os.path.getsize(path)
+        return obj['size']
 
     def get_dir_size(path):
         """Get directory size."""
@@ -368,28 +370,32 @@ def hydrate_size(data):
     def add_dir_size(obj):
         """Add directory size to the basic:dir field."""
         if data.status in [Data.STATUS_DONE, Data.STATUS_ERROR] and 'size' in obj:
-            return
+            return obj['size']
 
         path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk), obj['dir'])
         if not os.path.isdir(path):
             raise ValidationError("Referenced dir does not exist ({})".format(path))
 
         obj['size'] = get_dir_size(path)
+        return obj['size']
 
+    total_size = 0
     for field_schema, fields in iterate_fields(data.output, data.process.output_schema):
         name = field_schema['name']
         value = fields[name]
         if 'type' in field_schema:
             if field_schema['type'].startswith('basic:file:'):
-                add_file_size(value)
+                total_size += add_file_size(value)
             elif field_schema['type'].startswith('list:basic:file:'):
                 for obj in value:
-                    add_file_size(obj)
+                    total_size += add_file_size(obj)
             elif field_schema['type'].startswith('basic:dir:'):
-                add_dir_size(value)
+                total_size += add_dir_size(value)
             elif field_schema['type'].startswith('list:basic:dir:'):
                 for obj in value:
-                    add_dir_size(obj)
+                    total_size += add_dir_size(obj)
+
+    data.size = total_size
 
 
 def render_descriptor(data):
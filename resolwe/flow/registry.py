@@ -0,0 +1,146 @@
+""".. Ignore pydocstyle D400.
+
+================
+Process Registry
+================
+
+In-process cache of :class:`~resolwe.flow.models.Process` objects.
+
+Processes only change when they are registered, so they are cached in
+memory of each process. The registry is cleared when the generation of
+processes in the database (number of processes and the time of the
+latest modification) changes, so changes are seen by all processes
+without a shared cache backend. The generation is checked at most once
+in ``FLOW_PROCESS_REGISTRY_TIMEOUT`` seconds (1 second by default) and
+changes of processes in the current process clear its registry
+immediately.
+
+.. autoclass:: resolwe.flow.registry.ProcessRegistry
+    :members:
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from resolwe.flow.models import Process
+
+__all__ = ('ProcessRegistry', 'process_registry')
+
+#: default number of seconds between checks of the generation
+DEFAULT_TIMEOUT = 1
+
+
+class ProcessRegistry(object):
+    """Versioned cache of :class:`~resolwe.flow.models.Process` objects.
+
+    Cached objects are shared by all callers, so they must not be
+    modified. Callers that need to modify a process should work on a
+    copy.
+
+    """
+
+    def __init__(self):
+        """Initialize empty registry."""
+        self._lock = threading.Lock()
+        self._generation = None
+        self._checked = None
+        self._latest = {}
+        self._versions = {}
+
+        #: number of lookups served from the registry
+        self.hits = 0
+        #: number of lookups served from the database
+        self.misses = 0
+
+    def _check_generation(self):
+        """Clear the registry if generation of processes has changed."""
+        timeout = getattr(settings, 'FLOW_PROCESS_REGISTRY_TIMEOUT', DEFAULT_TIMEOUT)
+        checked = time.time()
+        if self._checked is not None and checked - self._checked < timeout:
+            return
+
+        generation = Process.objects.aggregate(count=Count('id'), modified=Max('modified'))
+        generation = (generation['count'], generation['modified'])
+        if generation != self._generation:
+            self.clear()
+            self._generation = generation
+        self._checked = checked
+
+    def _add(self, process, latest=False):
+        """Add process to the registry."""
+        with self._lock:
+            self._versions[(process.slug, str(process.version))] = process
+            if latest:
+                self._latest[process.slug] = process
+
+    def clear(self):
+        """Clear the registry."""
+        with self._lock:
+            self._latest = {}
+            self._versions = {}
+
+    def invalidate(self):
+        """Clear the registry and check the generation on the next lookup.
+
+        Registries of other processes see the change on their next
+        check of the generation.
+
+        """
+        self._checked = None
+        self.clear()
+
+    def get_latest(self, slug):
+        """Return the latest version of the process with given slug.
+
+        :raises ~resolwe.flow.models.Process.DoesNotExist: if process
+            doesn't exist
+
+        """
+        self._check_generation()
+
+        process = self._latest.get(slug, None)
+        if process is not None:
+            self.hits += 1
+            return process
+
+        self.misses += 1
+        process = Process.objects.filter(slug=slug).latest()
+        self._add(process, latest=True)
+        return process
+
+    def get(self, slug, version):
+        """Return the process with given slug and version.
+
+        :raises ~resolwe.flow.models.Process.DoesNotExist: if process
+            doesn't exist
+
+        """
+        self._check_generation()
+
+        process = self._versions.get((slug, str(version)), None)
+        if process is not None:
+            self.hits += 1
+            return process
+
+        self.misses += 1
+        process = Process.objects.get(slug=slug, version=version)
+        self._add(process)
+        return process
+
+    def stats(self):
+        """Return lookup statistics of the registry."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'size': len(self._versions),
+        }
+
+
+process_registry = ProcessRegistry()  # pylint: disable=invalid-name
@@ -17,6 +17,7 @@ from rest_framework.fields import empty
 
 from resolwe.flow.models import Collection, Data, DescriptorSchema, Entity, Process, Relation, RelationType, Storage
 from resolwe.flow.models.entity import PositionInRelation
+from resolwe.flow.utils import parse_boolean
 from resolwe.permissions.shortcuts import get_objects_for_user
 from resolwe.rest.fields import ProjectableJSONField
 from resolwe.rest.serializers import SelectiveFieldMixin
@@ -116,6 +117,19 @@ class ProcessSerializer(ResolweBaseSerializer):
                   'requirements', 'run') + update_protected_fields + read_only_fields
 
 
+class ProcessSchemaSerializer(serializers.ModelSerializer):
+    """Serializer for schemas of Process objects."""
+
+    input_schema = serializers.JSONField(read_only=True)
+    output_schema = serializers.JSONField(read_only=True)
+
+    class Meta:
+        """ProcessSchemaSerializer Meta options."""
+
+        model = Process
+        fields = ('id', 'input_schema', 'output_schema')
+
+
 class DescriptorSchemaSerializer(ResolweBaseSerializer):
     """Serializer for DescriptorSchema objects."""
 
@@ -153,7 +167,7 @@ class DataSerializer(ResolweBaseSerializer):
                             'status', 'process_progress', 'process_rc', 'process_info',
                             'process_warning', 'process_error', 'process_type',
                             'process_input_schema', 'process_output_schema',
-                            'process_name', 'descriptor_dirty')
+                            'process_name', 'descriptor_dirty', 'size')
         fields = ('slug', 'name', 'contributor', 'input', 'output', 'descriptor_schema',
                   'descriptor', 'tags') + update_protected_fields + read_only_fields
 
@@ -161,6 +175,11 @@ class DataSerializer(ResolweBaseSerializer):
         """Dynamically adapt fields based on the current request."""
         fields = super(DataSerializer, self).get_fields()
 
+        if self.request.method == "GET" and parse_boolean(self.request.query_params.get('sideload_processes', False)):
+            # Schemas are listed once for each process instead.
+            fields.pop('process_input_schema')
+            fields.pop('process_output_schema')
+
         if self.request.method == "GET":
             fields['descriptor_schema'] = DescriptorSchemaSerializer(required=False)
         else:
@@ -187,12 +206,43 @@ class CollectionSerializer(ResolweBaseSerializer):
         fields = ('slug', 'name', 'description', 'settings', 'descriptor_schema', 'descriptor',
                   'data') + update_protected_fields + read_only_fields
 
+    def _get_instances(self):
+        """Return all objects serialized together with the current one."""
+        if isinstance(self.parent, serializers.ListSerializer):
+            return self.parent.instance
+        return [self.instance]
+
+    def _get_visible_data(self):
+        """Return data objects of serialized objects that user has `view` permission on.
+
+        Permissions are checked only once for data objects of all
+        objects serialized in the request. Result is a dict mapping
+        ids of data objects to prefetched objects.
+
+        """
+        if 'visible_data' not in self.context:
+            data = {d.pk: d for instance in self._get_instances() for d in instance.data.all()}
+
+            visible_ids = set()
+            if data:
+                queryset = self._filter_queryset('view_data', Data.objects.filter(pk__in=data.keys()))
+                visible_ids = set(queryset.values_list('pk', flat=True))
+
+            self.context['visible_data'] = {pk: d for pk, d in data.items() if pk in visible_ids}
+
+        return self.context['visible_data']
+
     def _serialize_data(self, data):
         """Return serialized data or list of ids, depending on `hydrate_data` query param."""
         if self.request and self.request.query_params.get('hydrate_data', False):
-            serializer = DataSerializer(data, many=True, read_only=True)
-            serializer.bind('data', self)
-            return serializer.data
+            if 'hydrated_data' not in self.context:
+                # Serialize data objects of all serialized objects at once.
+                visible_data = sorted(self._get_visible_data().values(), key=lambda d: d.pk)
+                serializer = DataSerializer(visible_data, many=True, read_only=True)
+                serializer.bind('data', self)
+                self.context['hydrated_data'] = {d.pk: item for d, item in zip(visible_data, serializer.data)}
+
+            return [self.context['hydrated_data'][d.pk] for d in data]
         else:
             return [d.id for d in data]
 
@@ -203,7 +253,8 @@ class CollectionSerializer(ResolweBaseSerializer):
 
     def get_data(self, collection):
         """Return serialized list of data objects on collection that user has `view` permission on."""
-        data = self._filter_queryset('view_data', collection.data.all())
+        visible_data = self._get_visible_data()
+        data = [d for d in collection.data.all() if d.pk in visible_data]
 
         return self._serialize_data(data)
 
@@ -237,12 +288,6 @@ class EntitySerializer(CollectionSerializer):
         model = Entity
         fields = CollectionSerializer.Meta.fields + ('collections', 'descriptor_completed', 'tags')
 
-    def get_data(self, entity):
-        """Return serialized list of data objects on entity that user has `view` permission on."""
-        data = self._filter_queryset('view_data', entity.data.all())
-
-        return self._serialize_data(data)
-
 
 class StorageSerializer(ResolweBaseSerializer):
     """Serializer for Storage objects."""
@@ -5,12 +5,45 @@ Signal Handlers
 ===============
 
 """
+import threading
+import weakref
+
 from django.db import transaction
-from django.db.models.signals import post_save, pre_delete
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
+from resolwe.flow.changes import publish_data_change
 from resolwe.flow.managers import manager
-from resolwe.flow.models import Data, Entity
+from resolwe.flow.models import Collection, Data, Entity, Process, Storage
+from resolwe.flow.registry import process_registry
+from resolwe.flow.utils.delete import is_bulk_delete
+from resolwe.flow.utils.membership import touch_objects
+
+#: state of manager triggering in the current thread
+_trigger_state = threading.local()  # pylint: disable=invalid-name
+
+
+def _trigger_on_commit():
+    """Trigger manager on commit, unless it is already queued.
+
+    Weak reference to the queued callback is kept, which is cleared
+    when the callback is run or when it is discarded, because the
+    transaction (or savepoint) is rolled back. So exactly one trigger is
+    queued per commit.
+
+    """
+    queued = getattr(_trigger_state, 'queued', None)
+    if queued is not None and queued() is not None:
+        return
+
+    def run_manager():
+        """Trigger manager."""
+        _trigger_state.queued = None
+        manager.trigger(verbosity=0)
+
+    _trigger_state.queued = weakref.ref(run_manager)
+    transaction.on_commit(run_manager)
 
 
 @receiver(post_save, sender=Data)
@@ -20,12 +53,22 @@ def manager_post_save_handler(sender, instance, created, **kwargs):
         # Run manager at the end of the potential transaction. Otherwise
         # tasks are send to workers before transaction ends and therefore
         # workers cannot access objects created inside transaction.
-        transaction.on_commit(lambda: manager.communicate(verbosity=0))
+        _trigger_on_commit()
+
+
+@receiver(post_save, sender=Data)
+def changes_post_save_handler(sender, instance, update_fields=None, **kwargs):
+    """Publish change of the data object to clients waiting for changes."""
+    publish_data_change(instance, update_fields)
 
 
 @receiver(pre_delete, sender=Data)
 def delete_entity(sender, instance, **kwargs):
     """Delete Entity when last Data object is deleted."""
+    if is_bulk_delete():
+        # Entities are deleted together with all data objects.
+        return
+
     try:
         entity = Entity.objects.get(data=instance.pk)
     except Entity.DoesNotExist:  # pylint: disable=no-member
@@ -33,3 +76,43 @@ def delete_entity(sender, instance, **kwargs):
 
     if entity.data.count() == 1:  # last Data object will be just deleted
         entity.delete()
+
+
+@receiver(pre_delete, sender=Data)
+def delete_storage(sender, instance, **kwargs):
+    """Delete Storage objects referenced only by the deleted Data object."""
+    if is_bulk_delete():
+        # Storages are deleted together with all data objects.
+        return
+
+    Storage.objects.annotate(
+        data_count=Count('data')
+    ).filter(
+        pk__in=Storage.objects.filter(data=instance.pk).values('pk'),
+        data_count=1,
+    ).delete()
+
+
+@receiver(m2m_changed, sender=Collection.data.through)
+@receiver(m2m_changed, sender=Entity.data.through)
+def touch_collections(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Update modification time of collections whose data changed."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # Collections were added to or removed from data object.
+        if pk_set:
+            touch_objects(model, pk_set)
+    else:
+        touch_objects(type(instance), [instance.pk])
+
+
+@receiver(post_save, sender=Process)
+@receiver(post_delete, sender=Process)
+def invalidate_process_registry(sender, instance, **kwargs):
+    """Invalidate process registry when a process is changed."""
+    process_registry.invalidate()
+    # Invalidate again after commit, as other processes could cache the
+    # old version of the process before the transaction ends.
+    transaction.on_commit(process_registry.invalidate)
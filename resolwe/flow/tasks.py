@@ -15,3 +15,17 @@ def celery_run(data_id, script, verbosity):
     """Run process executor."""
     from .managers import manager
     manager.get_executor().run(data_id, script, verbosity)
+
+
+@shared_task
+def celery_communicate(verbosity):
+    """Resolve dependencies of data objects and run them."""
+    from .managers import manager
+    manager.communicate(verbosity=verbosity)
+
+
+@shared_task
+def celery_remove_data_dirs(data_ids):
+    """Remove directories of deleted data objects."""
+    from .utils.purge import remove_data_dirs
+    remove_data_dirs(data_ids)
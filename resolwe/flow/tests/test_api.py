@@ -1,19 +1,34 @@
 # pylint: disable=missing-docstring
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import datetime
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+
 import mock
+import six
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
-from django.db import DEFAULT_DB_ALIAS, connections
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import m2m_changed
+from django.test import override_settings
 from django.test.utils import CaptureQueriesContext
 
+from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm, remove_perm
 from rest_framework import exceptions, status
 from rest_framework.test import APIRequestFactory, force_authenticate
 
-from resolwe.flow.models import Collection, Data, DescriptorSchema, Entity, Process
+from resolwe.flow.models import Collection, Data, DescriptorSchema, Entity, Process, Storage
+from resolwe.flow.utils.delete import bulk_deleted, delete_data
+from resolwe.flow.utils.membership import remove_members
 from resolwe.flow.views import CollectionViewSet, DataViewSet, EntityViewSet
-from resolwe.test import TestCase
+from resolwe.permissions.shortcuts import get_object_perms
+from resolwe.test import TestCase, TransactionTestCase
 
 factory = APIRequestFactory()  # pylint: disable=invalid-name
 
@@ -67,6 +82,347 @@ class TestDataViewSetCase(TestCase):
             self.data_viewset(request)
             self.assertLess(len(captured_queries), 62)
 
+    def test_prefetch_permissions(self):
+        request = factory.get('/', '', format='json')
+        force_authenticate(request, self.contributor)
+
+        def count_permissions_queries():
+            conn = connections[DEFAULT_DB_ALIAS]
+            with CaptureQueriesContext(conn) as captured_queries:
+                response = self.data_viewset(request)
+            return len(response.data), len([
+                query for query in captured_queries.captured_queries if 'guardian_' in query['sql']
+            ])
+
+        for _ in range(5):
+            data = Data.objects.create(contributor=self.contributor, process=self.proc)
+            assign_perm('view_data', self.contributor, data)
+            assign_perm('view_data', self.group, data)
+        objects_count, queries_count = count_permissions_queries()
+        self.assertEqual(objects_count, 5)
+
+        for _ in range(15):
+            data = Data.objects.create(contributor=self.contributor, process=self.proc)
+            assign_perm('view_data', self.contributor, data)
+            assign_perm('view_data', self.group, data)
+        # Number of permissions queries doesn't depend on the number
+        # of objects.
+        self.assertEqual(count_permissions_queries(), (20, queries_count))
+
+        for item in self.data_viewset(request).data:
+            self.assertEqual(item['permissions'], get_object_perms(Data.objects.get(pk=item['id']), self.contributor))
+
+    def test_export(self):
+        export_viewset = DataViewSet.as_view(actions={'get': 'export'})
+        for index in range(7):
+            data = Data.objects.create(name='Data {}'.format(index), contributor=self.contributor, process=self.proc)
+            if index != 3:
+                assign_perm('view_data', self.user, data)
+
+        request = factory.get('/', {'fields': 'id,name', 'ordering': '-id'}, format='json')
+        force_authenticate(request, self.user)
+        with mock.patch.object(DataViewSet, 'export_chunk_size', 2):
+            response = export_viewset(request)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+            # Principal of the request is reused while the response is streamed.
+            with mock.patch('resolwe.permissions.principal.Principal') as principal_mock:
+                lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+            self.assertFalse(principal_mock.called)
+
+        items = [json.loads(line) for line in lines]
+        self.assertEqual([item['name'] for item in items], ['Data {}'.format(index) for index in [6, 5, 4, 2, 1, 0]])
+        for item in items:
+            six.assertCountEqual(self, item.keys(), ['id', 'name', 'permissions'])
+            self.assertEqual(item['permissions'], get_object_perms(Data.objects.get(pk=item['id']), self.user))
+
+        # Filters are applied.
+        request = factory.get('/', {'name': 'Data 2'}, format='json')
+        force_authenticate(request, self.user)
+        response = export_viewset(request)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['name'], 'Data 2')
+
+        # Orderings not supported by keyset pagination are rejected.
+        request = factory.get('/', {'ordering': 'started'}, format='json')
+        force_authenticate(request, self.user)
+        self.assertEqual(export_viewset(request).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sideload_processes(self):
+        process_2 = Process.objects.create(slug='test-process-2', contributor=self.contributor,
+                                           input_schema=[{'name': 'foo', 'type': 'basic:string:'}])
+        for process in [self.proc, process_2, self.proc]:
+            Data.objects.create(contributor=self.contributor, process=process)
+
+        request = factory.get('/', {'sideload_processes': '1'}, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+
+        self.assertEqual(len(response.data['results']), 3)
+        for item in response.data['results']:
+            self.assertNotIn('process_input_schema', item)
+            self.assertNotIn('process_output_schema', item)
+        self.assertEqual([item['process'] for item in response.data['results']],
+                         [self.proc.pk, process_2.pk, self.proc.pk])
+        self.assertEqual(response.data['processes'], [
+            {'id': self.proc.pk, 'input_schema': [], 'output_schema': []},
+            {'id': process_2.pk, 'input_schema': [{'name': 'foo', 'type': 'basic:string:'}], 'output_schema': []},
+        ])
+
+        request = factory.get('/', {'sideload_processes': '1', 'cursor': '', 'limit': 1}, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual([process['id'] for process in response.data['processes']], [self.proc.pk])
+
+        request = factory.get('/', {'sideload_processes': 'false'}, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(len(response.data), 3)
+        for item in response.data:
+            self.assertIn('process_input_schema', item)
+            self.assertIn('process_output_schema', item)
+
+    def test_conditional_get(self):
+        data = Data.objects.create(contributor=self.contributor, process=self.proc)
+        assign_perm('view_data', self.user, data)
+
+        def get_list(etag=None):
+            request = factory.get('/', '', format='json', HTTP_IF_NONE_MATCH=etag)
+            force_authenticate(request, self.user)
+            return self.data_viewset(request)
+
+        response = get_list()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with mock.patch.object(DataViewSet, 'get_serializer') as get_serializer_mock:
+            response = get_list(etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertFalse(get_serializer_mock.called)
+
+        # Modified objects.
+        data.name = 'New name'
+        data.save()
+        response = get_list(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        # Changed permissions.
+        data_2 = Data.objects.create(contributor=self.contributor, process=self.proc)
+        self.assertEqual(get_list(etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        assign_perm('view_data', self.user, data_2)
+        response = get_list(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        etag = response['ETag']
+
+        # Deleted objects.
+        data.delete()
+        response = get_list(etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+        # ETag depends on the user.
+        request = factory.get('/', '', format='json', HTTP_IF_NONE_MATCH=response['ETag'])
+        force_authenticate(request, self.contributor)
+        self.assertEqual(self.data_viewset(request).status_code, status.HTTP_200_OK)
+
+    def test_conditional_get_update_fields(self):
+        data = Data.objects.create(contributor=self.contributor, process=self.proc)
+        assign_perm('view_data', self.user, data)
+
+        request = factory.get('/', '', format='json')
+        force_authenticate(request, self.user)
+        etag = self.data_viewset(request)['ETag']
+
+        # Modification time is saved also when only some fields are.
+        data.status = Data.STATUS_PROCESSING
+        data.save(update_fields=['status'])
+        request = factory.get('/', '', format='json', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.user)
+        response = self.data_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['status'], Data.STATUS_PROCESSING)
+
+    def test_download(self):
+        download_viewset = DataViewSet.as_view(actions={'get': 'download'})
+        data = Data.objects.create(contributor=self.contributor, process=self.proc)
+        assign_perm('view_data', self.user, data)
+
+        data_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+        os.makedirs(data_dir)
+        self.addCleanup(shutil.rmtree, data_dir)
+        with open(os.path.join(data_dir, 'out.txt'), 'wb') as handle:
+            handle.write(b'0123456789')
+
+        def download(path, **headers):
+            request = factory.get('/', {'path': path}, **headers)
+            force_authenticate(request, self.user)
+            return download_viewset(request, pk=data.pk)
+
+        self.assertEqual(download('out.txt').status_code, status.HTTP_403_FORBIDDEN)
+        assign_perm('download_data', self.user, data)
+
+        response = download('out.txt')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+        etag = response['ETag']
+
+        response = download('out.txt', HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        response = download('out.txt', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = download('out.txt', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+        # Range of the changed file is not served.
+        response = download('out.txt', HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"foo"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(download('out.txt', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.assertEqual(download('missing.txt').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(download('../out.txt').status_code, status.HTTP_404_NOT_FOUND)
+
+        # Files linked from other data objects require permission on them.
+        other = Data.objects.create(contributor=self.contributor, process=self.proc)
+        other_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(other.pk))
+        os.makedirs(other_dir)
+        self.addCleanup(shutil.rmtree, other_dir)
+        with open(os.path.join(other_dir, 'other.txt'), 'wb') as handle:
+            handle.write(b'other')
+        os.symlink(os.path.join(other_dir, 'other.txt'), os.path.join(data_dir, 'other.txt'))
+
+        self.assertEqual(download('other.txt').status_code, status.HTTP_403_FORBIDDEN)
+        assign_perm('download_data', self.user, other)
+        response = download('other.txt')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'other')
+
+        with override_settings(FLOW_DOWNLOAD={'OFFLOAD': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected/'}):
+            response = download('out.txt')
+            self.assertEqual(response['X-Accel-Redirect'], '/protected/{}/out.txt'.format(data.pk))
+            self.assertEqual(response.content, b'')
+
+    def test_archive(self):
+        archive_viewset = DataViewSet.as_view(actions={'get': 'archive'})
+        data_objects = []
+        for index in range(2):
+            data = Data.objects.create(contributor=self.contributor, process=self.proc)
+            Data.objects.filter(pk=data.pk).update(output={
+                'bam': {'file': 'reads.bam', 'refs': ['reads.bai']},
+                'reports': [{'file': 'report_{}.txt'.format(index)}],
+                'count': 5,
+            })
+            assign_perm('view_data', self.user, data)
+            data_objects.append(data)
+
+            data_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+            os.makedirs(data_dir)
+            self.addCleanup(shutil.rmtree, data_dir)
+            for name in ['reads.bam', 'reads.bai', 'report_{}.txt'.format(index)]:
+                with open(os.path.join(data_dir, name), 'wb') as handle:
+                    handle.write('{} {}'.format(data.pk, name).encode('utf-8'))
+
+        def get_archive(params):
+            params.setdefault('ids', ','.join(str(data.pk) for data in data_objects))
+            request = factory.get('/', params)
+            force_authenticate(request, self.user)
+            return archive_viewset(request)
+
+        response = get_archive({'outputs': 'bam,count'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        for data in data_objects:
+            assign_perm('download_data', self.user, data)
+
+        response = get_archive({'outputs': 'bam,count'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-tar')
+        archive = tarfile.open(fileobj=six.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.getnames(), [
+            '{}/{}'.format(data.pk, name) for data in data_objects for name in ['reads.bam', 'reads.bai']
+        ])
+        member = '{}/reads.bai'.format(data_objects[1].pk)
+        self.assertEqual(archive.extractfile(member).read().decode('utf-8'), member.replace('/', ' '))
+
+        response = get_archive({'outputs': 'reports', 'compress': '1', 'junk': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        archive = tarfile.open(fileobj=six.BytesIO(b''.join(response.streaming_content)), mode='r:gz')
+        self.assertEqual(archive.getnames(), ['report_0.txt', 'report_1.txt'])
+
+        self.assertEqual(get_archive({'outputs': ''}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_archive({'ids': '999999', 'outputs': 'bam'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_archive_symlinks(self):
+        archive_viewset = DataViewSet.as_view(actions={'get': 'archive'})
+        data = Data.objects.create(contributor=self.contributor, process=self.proc)
+        Data.objects.filter(pk=data.pk).update(output={
+            'bam': {'file': 'reads.bam', 'refs': ['reads.bai', 'secret.txt', 'reports', 'outside']},
+        })
+        assign_perm('view_data', self.user, data)
+        assign_perm('download_data', self.user, data)
+
+        outside_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside_dir)
+        with open(os.path.join(outside_dir, 'secret.txt'), 'wb') as handle:
+            handle.write(b'secret')
+
+        other = Data.objects.create(contributor=self.contributor, process=self.proc)
+        data_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+        other_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(other.pk))
+        for directory in [data_dir, other_dir]:
+            os.makedirs(directory)
+            self.addCleanup(shutil.rmtree, directory)
+        os.makedirs(os.path.join(data_dir, 'reports'))
+        with open(os.path.join(data_dir, 'reads.bam'), 'wb') as handle:
+            handle.write(b'reads')
+        with open(os.path.join(other_dir, 'reads.bai'), 'wb') as handle:
+            handle.write(b'index')
+        with open(os.path.join(data_dir, 'reports', 'report.txt'), 'wb') as handle:
+            handle.write(b'report')
+
+        # Links to directories of other downloadable data objects are
+        # followed, links outside of the data root are skipped.
+        os.symlink(os.path.join(other_dir, 'reads.bai'), os.path.join(data_dir, 'reads.bai'))
+        os.symlink(os.path.join(outside_dir, 'secret.txt'), os.path.join(data_dir, 'secret.txt'))
+        os.symlink(os.path.join(outside_dir, 'secret.txt'), os.path.join(data_dir, 'reports', 'secret.txt'))
+        os.symlink(outside_dir, os.path.join(data_dir, 'outside'))
+
+        def get_archive():
+            request = factory.get('/', {'ids': str(data.pk), 'outputs': 'bam'})
+            force_authenticate(request, self.user)
+            response = archive_viewset(request)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return tarfile.open(fileobj=six.BytesIO(b''.join(response.streaming_content)))
+
+        self.assertEqual(get_archive().getnames(), [
+            '{}/reads.bam'.format(data.pk),
+            '{}/reports/report.txt'.format(data.pk),
+        ])
+
+        assign_perm('download_data', self.user, other)
+        archive = get_archive()
+        self.assertEqual(archive.getnames(), [
+            '{}/reads.bam'.format(data.pk),
+            '{}/reads.bai'.format(data.pk),
+            '{}/reports/report.txt'.format(data.pk),
+        ])
+        self.assertEqual(archive.extractfile('{}/reads.bai'.format(data.pk)).read(), b'index')
+
     def test_use_latest_with_perm(self):
         Process.objects.create(
             type='test:process',
@@ -92,6 +448,307 @@ class TestDataViewSetCase(TestCase):
         self.assertEqual(data.process, self.proc)
         self.assertEqual(data.descriptor_schema, self.descriptor_schema)
 
+    def test_lineage(self):
+        process = Process.objects.create(
+            type='test:lineage',
+            slug='test-lineage',
+            contributor=self.contributor,
+            input_schema=[{'name': 'src', 'type': 'data:test:lineage', 'required': False}],
+        )
+        first = Data.objects.create(contributor=self.contributor, process=process)
+        second = Data.objects.create(contributor=self.contributor, process=process, input={'src': first.pk})
+        third = Data.objects.create(contributor=self.contributor, process=process, input={'src': second.pk})
+        for data in (first, second, third):
+            assign_perm('view_data', self.user, data)
+        remove_perm('view_data', self.user, second)
+
+        ancestors_viewset = DataViewSet.as_view(actions={'get': 'ancestors'})
+        descendants_viewset = DataViewSet.as_view(actions={'get': 'descendants'})
+
+        request = factory.get('/', '', format='json')
+        force_authenticate(request, self.contributor)
+        response = ancestors_viewset(request, pk=third.pk)
+        self.assertEqual(
+            [(item['id'], item['depth']) for item in response.data],
+            [(first.pk, 2), (second.pk, 1)]
+        )
+
+        request = factory.get('/', {'depth': 1}, format='json')
+        force_authenticate(request, self.contributor)
+        response = descendants_viewset(request, pk=first.pk)
+        self.assertEqual([(item['id'], item['depth']) for item in response.data], [(second.pk, 1)])
+
+        # Objects without permissions are not returned.
+        request = factory.get('/', '', format='json')
+        force_authenticate(request, self.user)
+        response = descendants_viewset(request, pk=first.pk)
+        self.assertEqual([(item['id'], item['depth']) for item in response.data], [(third.pk, 2)])
+
+        request = factory.get('/', {'depth': 'foo'}, format='json')
+        force_authenticate(request, self.contributor)
+        response = descendants_viewset(request, pk=first.pk)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets(self):
+        facets_viewset = DataViewSet.as_view(actions={'get': 'facets'})
+        collection = Collection.objects.create(contributor=self.contributor)
+        other_proc = Process.objects.create(type='test:other', contributor=self.contributor)
+
+        objects = [
+            Data.objects.create(contributor=self.contributor, process=self.proc, tags=['a', 'b']),
+            Data.objects.create(contributor=self.contributor, process=self.proc, tags=['a']),
+            Data.objects.create(contributor=self.user, process=other_proc),
+            Data.objects.create(contributor=self.user, process=other_proc, tags=['a']),
+        ]
+        for data, size in zip(objects, [10, 20, 30, 40]):
+            Data.objects.filter(pk=data.pk).update(size=size)
+        Data.objects.filter(pk=objects[0].pk).update(status=Data.STATUS_DONE)
+        for data in objects[:3]:
+            assign_perm('view_data', self.user, data)
+            collection.data.add(data)
+
+        def get_facets(params):
+            request = factory.get('/', params, format='json')
+            force_authenticate(request, self.user)
+            return facets_viewset(request)
+
+        response = get_facets({'collection': collection.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['size'], 60)
+
+        facets = response.data['facets']
+        self.assertEqual(list(facets.keys()), ['status', 'process_type', 'contributor', 'tags'])
+        self.assertEqual(
+            [dict(item) for item in facets['status']],
+            [
+                {'value': Data.STATUS_RESOLVING, 'count': 2, 'size': 50},
+                {'value': Data.STATUS_DONE, 'count': 1, 'size': 10},
+            ]
+        )
+        self.assertEqual(
+            [dict(item) for item in facets['process_type']],
+            [{'value': 'test:process', 'count': 2, 'size': 30}, {'value': 'test:other', 'count': 1, 'size': 30}]
+        )
+        self.assertEqual(
+            [dict(item) for item in facets['contributor']],
+            [{'value': self.contributor.pk, 'count': 2, 'size': 30}, {'value': self.user.pk, 'count': 1, 'size': 30}]
+        )
+        self.assertEqual(
+            [dict(item) for item in facets['tags']],
+            [{'value': 'a', 'count': 2, 'size': 30}, {'value': 'b', 'count': 1, 'size': 10}]
+        )
+
+        response = get_facets({'facets': 'tags', 'tags': 'b'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(list(response.data['facets'].keys()), ['tags'])
+
+        response = get_facets({'facets': 'unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        bulk_delete_viewset = DataViewSet.as_view(actions={'post': 'bulk_delete'})
+        process = Process.objects.create(
+            type='test:lineage',
+            contributor=self.contributor,
+            input_schema=[{'name': 'src', 'type': 'data:test:lineage', 'required': False}],
+        )
+        first = Data.objects.create(contributor=self.contributor, process=process)
+        second = Data.objects.create(contributor=self.contributor, process=process, input={'src': first.pk})
+        third = Data.objects.create(contributor=self.contributor, process=process, input={'src': second.pk})
+        other = Data.objects.create(contributor=self.contributor, process=process)
+        for data in (first, second, third, other):
+            assign_perm('view_data', self.user, data)
+        for data in (first, second):
+            assign_perm('edit_data', self.user, data)
+
+        deleted_entity = Entity.objects.create(contributor=self.contributor)
+        deleted_entity.data.add(second, third)
+        kept_entity = Entity.objects.create(contributor=self.contributor)
+        kept_entity.data.add(third, other)
+        deleted_storage = Storage.objects.create(contributor=self.contributor, json={'value': 1})
+        deleted_storage.data.add(first, second)
+        kept_storage = Storage.objects.create(contributor=self.contributor, json={'value': 2})
+        kept_storage.data.add(first, other)
+
+        def bulk_delete(data):
+            request = factory.post('/', data, format='json')
+            force_authenticate(request, self.user)
+            return bulk_delete_viewset(request)
+
+        response = bulk_delete({'ids': [first.pk], 'descendants': True})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Data.objects.count(), 4)
+
+        assign_perm('edit_data', self.user, third)
+        receiver = mock.MagicMock()
+        bulk_deleted.connect(receiver)
+        self.addCleanup(bulk_deleted.disconnect, receiver)
+        with mock.patch('resolwe.flow.utils.delete.transaction.on_commit', side_effect=lambda func: func()), \
+                mock.patch('resolwe.flow.managers.manager.remove_data_dirs') as remove_dirs_mock:
+            response = bulk_delete({'ids': [first.pk], 'descendants': True})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], [first.pk, second.pk, third.pk])
+        self.assertEqual(list(Data.objects.values_list('pk', flat=True)), [other.pk])
+        self.assertEqual(list(Entity.objects.values_list('pk', flat=True)), [kept_entity.pk])
+        self.assertEqual(list(Storage.objects.values_list('pk', flat=True)), [kept_storage.pk])
+        self.assertFalse(
+            UserObjectPermission.objects.filter(object_pk=str(first.pk), content_type__model='data').exists()
+        )
+
+        remove_dirs_mock.assert_called_once_with([first.pk, second.pk, third.pk])
+        deleted = {(call[1]['sender'], obj.pk) for call in receiver.call_args_list for obj in call[1]['instances']}
+        self.assertEqual(deleted, {(Data, first.pk), (Data, second.pk), (Data, third.pk), (Entity, deleted_entity.pk)})
+
+        response = bulk_delete({'ids': [first.pk]})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_delete_queries(self):
+        collection = Collection.objects.create(contributor=self.contributor)
+
+        def create_and_delete(count):
+            data_ids = []
+            parent = None
+            for index in range(count):
+                data = Data.objects.create(contributor=self.contributor, process=self.proc)
+                if parent is not None:
+                    data.parents.add(parent)
+                assign_perm('view_data', self.user, data)
+                collection.data.add(data)
+                entity = Entity.objects.create(contributor=self.contributor)
+                entity.data.add(data)
+                storage = Storage.objects.create(contributor=self.contributor, json={'index': index})
+                storage.data.add(data)
+                data_ids.append(data.pk)
+                parent = data
+
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+                self.assertEqual(delete_data(data_ids), data_ids)
+            return len(captured_queries)
+
+        # Number of queries doesn't depend on the number of objects.
+        self.assertEqual(create_and_delete(2), create_and_delete(10))
+        self.assertFalse(Data.objects.exists())
+        self.assertFalse(Entity.objects.exists())
+        self.assertFalse(Storage.objects.exists())
+        self.assertFalse(collection.data.exists())
+
+    def test_bulk_create(self):
+        bulk_viewset = DataViewSet.as_view(actions={'post': 'bulk'})
+        collection = Collection.objects.create(contributor=self.contributor)
+        assign_perm('add_collection', self.user, collection)
+
+        data = [
+            {'process': 'test-process', 'name': 'First', 'collections': [collection.pk]},
+            {'process': 'test-process', 'name': 'Second', 'descriptor_schema': 'test-schema'},
+        ]
+        request = factory.post('/', data, format='json')
+        force_authenticate(request, self.user)
+        response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual([item['name'] for item in response.data], ['First', 'Second'])
+        first, second = [Data.objects.get(pk=item['id']) for item in response.data]
+        self.assertEqual(list(collection.data.all()), [first])
+        self.assertEqual(second.descriptor_schema, self.descriptor_schema)
+        for data in (first, second):
+            self.assertEqual(data.contributor, self.user)
+            self.assertTrue(self.user.has_perm('flow.owner_data', data))
+
+        # Nothing is created if any of the objects is invalid.
+        data = [
+            {'process': 'test-process'},
+            {'process': 'missing-process'},
+            {'process': 'test-process', 'collections': [collection.pk, 0]},
+        ]
+        request = factory.post('/', data, format='json')
+        force_authenticate(request, self.user)
+        response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [
+            {},
+            {'process': ['Invalid process slug "missing-process" - object does not exist.']},
+            {'collections': ['Invalid pk "0" - object does not exist.']},
+        ])
+        self.assertEqual(Data.objects.count(), 2)
+
+        # Unhashable values are rejected.
+        data = [
+            {'process': ['test-process']},
+            {'process': 'test-process', 'collections': [{'id': collection.pk}]},
+            {'process': 'test-process', 'collections': collection.pk},
+            {'process': 'test-process', 'descriptor_schema': {'slug': 'test-schema'}},
+        ]
+        request = factory.post('/', data, format='json')
+        force_authenticate(request, self.user)
+        response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [
+            {'process': ['Incorrect type. Expected slug value, received list.']},
+            {'collections': ['Incorrect type. Expected pk value, received dict.']},
+            {'collections': ['Expected a list of items but got type "int".']},
+            {'descriptor_schema': ['Incorrect type. Expected slug value, received dict.']},
+        ])
+        self.assertEqual(Data.objects.count(), 2)
+
+        request = factory.post('/', {'process': 'test-process'}, format='json')
+        force_authenticate(request, self.user)
+        response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DataManagerTriggerTestCase(TransactionTestCase):
+    def setUp(self):
+        super(DataManagerTriggerTestCase, self).setUp()
+
+        process = Process.objects.create(slug='test-process', contributor=self.contributor)
+        assign_perm('view_process', self.user, process)
+
+    def test_bulk_create(self):
+        bulk_viewset = DataViewSet.as_view(actions={'post': 'bulk'})
+        data = [{'process': 'test-process'} for _ in range(3)]
+        request = factory.post('/', data, format='json')
+        force_authenticate(request, self.user)
+        with mock.patch('resolwe.flow.signals.manager') as manager_mock:
+            response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Manager is triggered once, after the transaction is committed.
+        self.assertEqual(manager_mock.trigger.call_count, 1)
+        self.assertEqual(manager_mock.communicate.call_count, 0)
+
+        with mock.patch('resolwe.flow.signals.manager') as manager_mock:
+            response = bulk_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(manager_mock.trigger.call_count, 1)
+
+    def test_trigger_once_per_commit(self):
+        process = Process.objects.get(slug='test-process')
+        registered = []
+
+        def on_commit(func):
+            # Callbacks must not be referenced after they are discarded.
+            registered.append(func.__name__)
+            transaction.on_commit(func)
+
+        transaction_patch = mock.patch('resolwe.flow.signals.transaction', mock.Mock(on_commit=on_commit))
+        with mock.patch('resolwe.flow.signals.manager') as manager_mock, transaction_patch:
+            with transaction.atomic():
+                for _ in range(3):
+                    Data.objects.create(contributor=self.contributor, process=process)
+            self.assertEqual(len(registered), 1)
+            self.assertEqual(manager_mock.trigger.call_count, 1)
+
+            # Trigger discarded on rollback doesn't prevent later ones.
+            with self.assertRaises(ValueError), transaction.atomic():
+                Data.objects.create(contributor=self.contributor, process=process)
+                raise ValueError
+            with transaction.atomic():
+                Data.objects.create(contributor=self.contributor, process=process)
+            self.assertEqual(len(registered), 3)
+            self.assertEqual(manager_mock.trigger.call_count, 2)
+
 
 class TestCollectionViewSetCase(TestCase):
     def setUp(self):
@@ -119,6 +776,72 @@ class TestCollectionViewSetCase(TestCase):
 
         self.detail_url = lambda pk: reverse('resolwe-api:collection-detail', kwargs={'pk': pk})
 
+    def test_visible_data(self):
+        process = Process.objects.create(contributor=self.contributor)
+        visible = Data.objects.create(name='Visible', contributor=self.contributor, process=process)
+        hidden = Data.objects.create(name='Hidden', contributor=self.contributor, process=process)
+        assign_perm('view_data', self.user, visible)
+
+        def create_collections(count):
+            for _ in range(count):
+                collection = Collection.objects.create(contributor=self.contributor)
+                collection.data.add(visible, hidden)
+                assign_perm('view_collection', self.user, collection)
+
+        def get_list(params):
+            request = factory.get('/', params, format='json')
+            force_authenticate(request, self.user)
+            conn = connections[DEFAULT_DB_ALIAS]
+            with CaptureQueriesContext(conn) as captured_queries:
+                response = self.collection_list_viewset(request)
+            return response.data, len(captured_queries)
+
+        create_collections(2)
+        response, queries_count = get_list({})
+        self.assertEqual(len(response), 2)
+        for collection in response:
+            self.assertEqual(collection['data'], [visible.pk])
+
+        # Number of queries doesn't depend on the number of collections.
+        create_collections(4)
+        response, queries_count_2 = get_list({})
+        self.assertEqual(len(response), 6)
+        self.assertEqual(queries_count, queries_count_2)
+
+        response, _ = get_list({'hydrate_data': '1'})
+        for collection in response:
+            self.assertEqual([data['name'] for data in collection['data']], ['Visible'])
+
+    def test_conditional_retrieve(self):
+        collection = Collection.objects.create(name='Collection', contributor=self.contributor)
+        assign_perm('view_collection', self.user, collection)
+        process = Process.objects.create(contributor=self.contributor)
+        data = Data.objects.create(contributor=self.contributor, process=process)
+        assign_perm('view_data', self.user, data)
+
+        def retrieve(**headers):
+            request = factory.get(self.detail_url(collection.pk), format='json', **headers)
+            force_authenticate(request, self.user)
+            return self.collection_detail_viewset(request, pk=collection.pk)
+
+        response = retrieve()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(retrieve(HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(retrieve(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Data added to the collection.
+        collection.data.add(data)
+        response = retrieve(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data'], [data.pk])
+        etag = response['ETag']
+
+        # Modified data of the collection.
+        Data.objects.filter(pk=data.pk).update(modified=data.modified + datetime.timedelta(seconds=1))
+        self.assertEqual(retrieve(HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
     def test_set_descriptor_schema(self):
         d_schema = DescriptorSchema.objects.create(slug="new-schema", name="New Schema", contributor=self.contributor)
 
@@ -225,6 +948,67 @@ class TestCollectionViewSetCase(TestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(c.data.count(), 0)
 
+    def test_add_remove_data_queries(self):
+        c = Collection.objects.create(slug="collection1", name="Collection 1", contributor=self.contributor)
+        assign_perm('add_collection', self.contributor, c)
+
+        proc = Process.objects.create(type='test:process', name='Test process', contributor=self.contributor)
+        data_ids = [Data.objects.create(contributor=self.contributor, process=proc).pk for _ in range(5)]
+        c.data.add(data_ids[0])
+
+        def count_queries(viewset, ids):
+            request = factory.post(self.detail_url(c.pk), {'ids': ids}, format='json')
+            force_authenticate(request, self.contributor)
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+                resp = viewset(request, pk=c.pk)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            return len(captured_queries)
+
+        self.assertEqual(count_queries(self.add_data_viewset, data_ids[:2]),
+                         count_queries(self.add_data_viewset, data_ids))
+        self.assertEqual(sorted(c.data.values_list('pk', flat=True)), data_ids)
+
+        self.assertEqual(count_queries(self.remove_data_viewset, data_ids[:2]),
+                         count_queries(self.remove_data_viewset, data_ids))
+        self.assertEqual(c.data.count(), 0)
+
+        request = factory.post(self.detail_url(c.pk), {'ids': [data_ids[0], 'foo']}, format='json')
+        force_authenticate(request, self.contributor)
+        resp = self.add_data_viewset(request, pk=c.pk)
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_remove_members(self):
+        proc = Process.objects.create(type='test:process', name='Test process', contributor=self.contributor)
+        data = [Data.objects.create(contributor=self.contributor, process=proc) for _ in range(3)]
+        collections = [Collection.objects.create(contributor=self.contributor) for _ in range(2)]
+        for collection in collections:
+            collection.data.add(data[0], data[1])
+
+        receiver = mock.MagicMock()
+        m2m_changed.connect(receiver, sender=Collection.data.through)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=Collection.data.through)
+
+        # Signals include only objects that were actually removed.
+        remove_members(Collection.data, [collections[0]], [obj.pk for obj in data])
+        self.assertEqual([(call[1]['action'], call[1]['pk_set']) for call in receiver.call_args_list], [
+            ('pre_remove', {data[0].pk, data[1].pk}),
+            ('post_remove', {data[0].pk, data[1].pk}),
+        ])
+
+        receiver.reset_mock()
+        remove_members(Collection.data, [collections[0]], [obj.pk for obj in data])
+        self.assertFalse(receiver.called)
+
+        # Modification times of collections are updated with a single query.
+        for collection in collections:
+            collection.data.add(*data)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+            remove_members(Data.collection_set, data, [collection.pk for collection in collections])
+        updates = [query for query in captured_queries.captured_queries
+                   if query['sql'].startswith('UPDATE "flow_collection"')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(Collection.data.through.objects.exists())
+
 
 class EntityViewSetTest(TestCase):
     def setUp(self):
@@ -268,6 +1052,41 @@ class EntityViewSetTest(TestCase):
         self.assertEqual(self.collection.data.count(), 0)
         self.assertEqual(self.entity.collections.count(), 0)
 
+    def test_add_to_collections(self):
+        self.entity.data.add(self.data_2)
+        collection_2 = Collection.objects.create(name="Test Collection 2", contributor=self.contributor)
+        assign_perm('add_collection', self.contributor, collection_2)
+        self.entityviewset.get_object = lambda: self.entity
+
+        modified = self.collection.modified
+        request_mock = mock.MagicMock(data={'ids': [self.collection.pk, collection_2.pk]}, user=self.contributor)
+        self.entityviewset.add_to_collection(request_mock)
+
+        for collection in (self.collection, collection_2):
+            self.assertEqual(sorted(collection.data.values_list('pk', flat=True)), [self.data.pk, self.data_2.pk])
+        self.assertEqual(self.entity.collections.count(), 2)
+        self.collection.refresh_from_db()
+        self.assertGreater(self.collection.modified, modified)
+
+        # Number of queries does not depend on the number of collections.
+        request_mock = mock.MagicMock(data={'ids': [self.collection.pk]}, user=self.contributor)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+            self.entityviewset.remove_from_collection(request_mock)
+        self.assertEqual(self.collection.data.count(), 0)
+        self.assertEqual(collection_2.data.count(), 2)
+
+        request_mock = mock.MagicMock(data={'ids': [self.collection.pk, collection_2.pk]}, user=self.contributor)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as removed_queries:
+            self.entityviewset.remove_from_collection(request_mock)
+        self.assertEqual(len(removed_queries), len(captured_queries))
+        self.assertEqual(collection_2.data.count(), 0)
+        self.assertEqual(self.entity.collections.count(), 0)
+
+        request_mock = mock.MagicMock(data={'ids': [self.collection.pk, 999999]}, user=self.contributor)
+        with self.assertRaises(exceptions.ValidationError):
+            self.entityviewset.add_to_collection(request_mock)
+        self.assertEqual(self.entity.collections.count(), 0)
+
     def test_add_remove_permissions(self):
         request_mock = mock.MagicMock(data={'ids': [self.collection.pk]}, user=self.contributor)
         self.entityviewset.get_object = lambda: self.entity
@@ -0,0 +1,123 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import time
+import unittest
+
+from guardian.shortcuts import assign_perm
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from resolwe.flow.managers import manager
+from resolwe.flow.models import Data, Process
+from resolwe.flow.views import DataViewSet
+from resolwe.test import TestCase, TransactionTestCase
+
+factory = APIRequestFactory()  # pylint: disable=invalid-name
+
+#: number of resolving data objects waiting for the manager
+BACKLOG_SIZE = 500
+
+#: number of timed create requests
+REQUESTS = 50
+
+
+@unittest.skipUnless(os.environ.get('RESOLWE_BENCHMARK', False), "Set RESOLWE_BENCHMARK to run benchmarks.")
+class CreateLatencyBenchmark(TransactionTestCase):
+
+    def setUp(self):
+        super(CreateLatencyBenchmark, self).setUp()
+
+        self.data_viewset = DataViewSet.as_view(actions={'post': 'create'})
+
+        self.process = Process.objects.create(
+            name='Benchmark process',
+            slug='benchmark-process',
+            contributor=self.contributor,
+            input_schema=[{'name': 'src', 'type': 'data:', 'required': False}],
+        )
+        assign_perm('view_process', self.user, self.process)
+
+        # Objects depending on an unfinished object stay resolving, so
+        # each run of the manager has to scan all of them.
+        parent = Data.objects.create(contributor=self.contributor, process=self.process)
+        Data.objects.filter(pk=parent.pk).update(status=Data.STATUS_WAITING)
+        for _ in range(BACKLOG_SIZE):
+            Data.objects.create(contributor=self.contributor, process=self.process, input={'src': parent.pk})
+
+    def tearDown(self):
+        # Wait for triggered manager runs before the database is flushed.
+        thread = manager._trigger_thread  # pylint: disable=protected-access
+        if thread is not None:
+            thread.join()
+
+        super(CreateLatencyBenchmark, self).tearDown()
+
+    def test_create_latency(self):
+        # Duration of a single manager run, which used to be part of
+        # each create request.
+        start = time.time()
+        manager.communicate(verbosity=0)
+        communicate_time = time.time() - start
+
+        # Manager is triggered on commit, so requests are not enclosed in
+        # the test's transaction.
+        timings = []
+        for _ in range(REQUESTS):
+            request = factory.post('/', {'process': 'benchmark-process'}, format='json')
+            force_authenticate(request, self.user)
+
+            start = time.time()
+            response = self.data_viewset(request)
+            timings.append(time.time() - start)
+
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        timings.sort()
+        print()
+        print("Create latency with {} resolving objects:".format(BACKLOG_SIZE))
+        print("    mean:   {:.4f} s".format(sum(timings) / len(timings)))
+        print("    median: {:.4f} s".format(timings[len(timings) // 2]))
+        print("    max:    {:.4f} s".format(timings[-1]))
+        print("Single manager run: {:.4f} s".format(communicate_time))
+
+
+@unittest.skipUnless(os.environ.get('RESOLWE_BENCHMARK', False), "Set RESOLWE_BENCHMARK to run benchmarks.")
+class PayloadSizeBenchmark(TestCase):
+
+    def setUp(self):
+        super(PayloadSizeBenchmark, self).setUp()
+
+        self.data_viewset = DataViewSet.as_view(actions={'get': 'list'})
+
+        schema = [
+            {'name': 'field_{}'.format(index), 'label': 'Field {}'.format(index), 'type': 'basic:string:',
+             'description': 'Description of field {}.'.format(index) * 5}
+            for index in range(50)
+        ]
+        processes = [
+            Process.objects.create(slug='benchmark-{}'.format(index), contributor=self.contributor,
+                                   input_schema=schema, output_schema=schema)
+            for index in range(3)
+        ]
+        for index in range(100):
+            Data.objects.create(contributor=self.contributor, process=processes[index % len(processes)])
+
+    def get_payload_size(self, params):
+        request = factory.get('/', params, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(JSONRenderer().render(response.data))
+
+    def test_payload_size(self):
+        embedded = self.get_payload_size({})
+        sideloaded = self.get_payload_size({'sideload_processes': '1'})
+
+        print()
+        print("Payload of 100 data objects of 3 processes:")
+        print("    embedded schemas:   {} B".format(embedded))
+        print("    sideloaded schemas: {} B ({:.1%})".format(sideloaded, float(sideloaded) / embedded))
+        self.assertLess(sideloaded, embedded)
@@ -0,0 +1,202 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import threading
+import time
+
+import mock
+
+from django.test import override_settings
+
+from guardian.shortcuts import assign_perm
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from resolwe.flow.changes import LocalBroker, PostgresBroker, get_broker, publish_data_change
+from resolwe.flow.models import Data, Process
+from resolwe.flow.views import DataViewSet
+from resolwe.test import TestCase
+
+factory = APIRequestFactory()  # pylint: disable=invalid-name
+
+
+class LocalBrokerTest(TestCase):
+
+    def test_wait(self):
+        broker = LocalBroker()
+
+        cursor, changes = broker.wait()
+        self.assertEqual(changes, [])
+
+        broker.publish({'id': 1})
+        broker.publish({'id': 2})
+        cursor, changes = broker.wait(cursor)
+        self.assertEqual(changes, [{'id': 1}, {'id': 2}])
+
+        self.assertEqual(broker.wait(cursor), (cursor, []))
+
+        # Invalid cursors and cursors of other brokers.
+        self.assertEqual(broker.wait('unknown'), (cursor, None))
+        self.assertEqual(LocalBroker().wait(cursor), ('0', None))
+
+    def test_wait_timeout(self):
+        broker = LocalBroker()
+        cursor, _ = broker.wait()
+
+        publisher = threading.Timer(0.1, broker.publish, [{'id': 1}])
+        publisher.start()
+        start = time.time()
+        _, changes = broker.wait(cursor, timeout=5)
+        publisher.join()
+
+        self.assertEqual(changes, [{'id': 1}])
+        self.assertLess(time.time() - start, 5)
+
+    def test_buffer_size(self):
+        broker = LocalBroker(buffer_size=2)
+        cursor, _ = broker.wait()
+        for index in range(3):
+            broker.publish({'id': index})
+
+        self.assertEqual(broker.wait(cursor), ('3', None))
+        self.assertEqual(broker.wait('1')[1], [{'id': 1}, {'id': 2}])
+
+
+class PostgresBrokerTest(TestCase):
+
+    def setUp(self):
+        super(PostgresBrokerTest, self).setUp()
+
+        self.broker = PostgresBroker()
+        # Notifications are not delivered inside test transactions, so
+        # the listener is not started.
+        self.broker._listener = mock.MagicMock()  # pylint: disable=protected-access
+        self.broker._listening.set()  # pylint: disable=protected-access
+
+    def test_global_cursor(self):
+        self.broker._reset(10)  # pylint: disable=protected-access
+        self.assertEqual(self.broker.wait(), ('10', []))
+
+        self.broker._add(11, {'id': 1})  # pylint: disable=protected-access
+        self.broker._add(12, {'id': 2})  # pylint: disable=protected-access
+        self.assertEqual(self.broker.wait('10'), ('12', [{'id': 1}, {'id': 2}]))
+        self.assertEqual(self.broker.wait('11'), ('12', [{'id': 2}]))
+
+        # Change was received by another process first.
+        self.assertEqual(self.broker.wait('13'), ('13', []))
+
+        # Changes were published before listening started.
+        self.assertEqual(self.broker.wait('9'), ('12', None))
+
+    def test_reconnect(self):
+        self.broker._reset(10)  # pylint: disable=protected-access
+        self.broker._add(11, {'id': 1})  # pylint: disable=protected-access
+
+        # Changes published while reconnecting are not known.
+        self.broker._reset(15)  # pylint: disable=protected-access
+        self.assertEqual(self.broker.wait('11'), ('15', None))
+        self.assertEqual(self.broker.wait('15'), ('15', []))
+
+    def test_publish(self):
+        with mock.patch('resolwe.flow.changes.connections') as connections_mock:
+            self.broker.publish({'id': 1})
+
+        execute_mock = connections_mock['default'].cursor.return_value.__enter__.return_value.execute
+        self.assertEqual(len(execute_mock.mock_calls), 2)
+        self.assertIn('nextval', execute_mock.call_args[0][0])
+        self.assertEqual(execute_mock.call_args[0][1], ['resolwe_changes', '{"id": 1}'])
+
+
+class BrokerSettingsTest(TestCase):
+
+    def test_get_broker(self):
+        with override_settings(FLOW_CHANGES={}):
+            self.assertIsInstance(get_broker(), PostgresBroker)
+            self.assertIs(get_broker(), get_broker())
+
+        with override_settings(FLOW_CHANGES={'BROKER': 'resolwe.flow.changes.LocalBroker', 'BUFFER_SIZE': 10}):
+            broker = get_broker()
+            self.assertNotIsInstance(broker, PostgresBroker)
+            self.assertEqual(broker.buffer_size, 10)
+
+        with override_settings(FLOW_CHANGES={'CHANNEL': 'test_changes'}):
+            self.assertEqual(get_broker().channel, 'test_changes')
+
+
+class DataChangesTest(TestCase):
+
+    def setUp(self):
+        super(DataChangesTest, self).setUp()
+
+        self.broker = LocalBroker()
+        patcher = mock.patch('resolwe.flow.changes._broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.changes_viewset = DataViewSet.as_view(actions={'get': 'changes'})
+
+        process = Process.objects.create(contributor=self.contributor)
+        self.data = Data.objects.create(contributor=self.contributor, process=process)
+        self.hidden_data = Data.objects.create(contributor=self.contributor, process=process)
+        assign_perm('view_data', self.user, self.data)
+
+    def get_changes(self, params, **headers):
+        request = factory.get('/', params, **headers)
+        force_authenticate(request, self.user)
+        return self.changes_viewset(request)
+
+    def test_publish_on_commit(self):
+        cursor, _ = self.broker.wait()
+
+        with mock.patch('resolwe.flow.changes.transaction.on_commit') as on_commit_mock:
+            publish_data_change(self.data, update_fields=['status', 'process_progress'])
+            self.assertEqual(self.broker.wait(cursor)[1], [])
+
+            on_commit_mock.call_args[0][0]()
+
+        self.assertEqual(self.broker.wait(cursor)[1], [{
+            'id': self.data.pk,
+            'status': self.data.status,
+            'progress': self.data.process_progress,
+            'modified': self.data.modified.isoformat(),
+            'fields': ['process_progress', 'status'],
+        }])
+
+    def test_long_poll(self):
+        response = self.get_changes({'timeout': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['changes'], [])
+        cursor = response.data['cursor']
+
+        self.broker.publish({'id': self.hidden_data.pk, 'status': Data.STATUS_DONE})
+        self.broker.publish({'id': self.data.pk, 'status': Data.STATUS_DONE})
+
+        response = self.get_changes({'cursor': cursor, 'timeout': 0})
+        self.assertEqual(response.data['changes'], [{'id': self.data.pk, 'status': Data.STATUS_DONE}])
+        self.assertNotEqual(response.data['cursor'], cursor)
+
+        response = self.get_changes({'cursor': 'unknown', 'timeout': 0})
+        self.assertTrue(response.data['resync'])
+        self.assertEqual(response.data['changes'], [])
+
+        response = self.get_changes({'cursor': cursor, 'timeout': 'foo'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_stream(self):
+        cursor, _ = self.broker.wait()
+        self.broker.publish({'id': self.hidden_data.pk})
+        self.broker.publish({'id': self.data.pk})
+
+        response = self.get_changes({'timeout': 0.1}, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=cursor)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = b''.join(response.streaming_content).decode('utf-8').split('\n\n')
+        changes = [event for event in events if 'event: change' in event]
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(json.loads(changes[0].split('data: ', 1)[1]), {'id': self.data.pk})
+
+        response = self.get_changes({'timeout': 0.1}, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID='unknown')
+        events = b''.join(response.streaming_content).decode('utf-8').split('\n\n')
+        self.assertIn('event: resync', events[1])
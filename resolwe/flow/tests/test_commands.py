@@ -1,16 +1,20 @@
 # pylint: disable=missing-docstring
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import datetime
 import os
 
+from django.conf import settings
 from django.core.management import call_command
 from django.test import TestCase as DjangoTestCase
+from django.utils import timezone
 from django.utils.six import StringIO
 
 from guardian.models import UserObjectPermission
 from guardian.shortcuts import assign_perm
 
-from resolwe.flow.models import Process
+from resolwe.flow.management.commands.dedup_report import get_output_size
+from resolwe.flow.models import Collection, Data, Process
 from resolwe.test import TestCase
 
 PROCESSES_DIR = os.path.join(os.path.dirname(__file__), 'processes')
@@ -82,3 +86,71 @@ class ProcessRegisterTestNoAdmin(DjangoTestCase):
         err = StringIO()
         self.assertRaises(SystemExit, call_command, 'register', path=[PROCESSES_DIR], stderr=err)
         self.assertEqual('Admin does not exist: create a superuser\n', err.getvalue())
+
+
+class DedupReportTest(TestCase):
+
+    def test_dedup_report(self):
+        process = Process.objects.create(
+            slug='test-dedup',
+            contributor=self.contributor,
+            input_schema=[{'name': 'value', 'type': 'basic:integer:'}],
+            output_schema=[{'name': 'result', 'type': 'basic:file:'}],
+        )
+        started = timezone.now()
+        for value in [1, 1, 1, 2]:
+            data = Data.objects.create(contributor=self.contributor, process=process, input={'value': value})
+            Data.objects.filter(pk=data.pk).update(
+                status=Data.STATUS_DONE,
+                started=started,
+                finished=started + datetime.timedelta(minutes=10),
+                output={'result': {'file': 'result.txt', 'size': 30}},
+            )
+
+        out = StringIO()
+        call_command('dedup_report', stdout=out)
+        output = out.getvalue()
+
+        checksum = Data.objects.filter(input={'value': 1}).first().checksum
+        self.assertIn('{} test-dedup count: 3, wasted time: 0:20:00, wasted size: 60'.format(checksum), output)
+        self.assertIn('Duplicated checksums: 1', output)
+        self.assertIn('Redundant data objects: 2', output)
+
+        out = StringIO()
+        call_command('dedup_report', process='other-process', stdout=out)
+        self.assertIn('Duplicated checksums: 0', out.getvalue())
+
+    def test_output_size_malformed(self):
+        process = Process(output_schema=[
+            {'name': 'file', 'type': 'basic:file:'},
+            {'name': 'files', 'type': 'list:basic:file:'},
+            {'name': 'dirs', 'type': 'list:basic:dir:'},
+        ])
+        data = Data(process=process, output={'file': 'result.txt', 'files': ['a.txt', {'size': 5}], 'dirs': 10})
+        self.assertEqual(get_output_size(data), 5)
+
+
+class DeleteDataTest(TestCase):
+
+    def test_delete_data(self):
+        process = Process.objects.create(contributor=self.contributor)
+        data = [Data.objects.create(contributor=self.contributor, process=process) for _ in range(4)]
+        collection = Collection.objects.create(contributor=self.contributor)
+        collection.data.add(data[2], data[3])
+
+        data_dir = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data[0].pk))
+        os.makedirs(data_dir)
+
+        out = StringIO()
+        call_command('delete_data', data[0].pk, stdout=out)
+        self.assertIn('Deleted data objects: 1', out.getvalue())
+        self.assertEqual(Data.objects.count(), 3)
+        # Directories are removed synchronously.
+        self.assertFalse(os.path.exists(data_dir))
+
+        out = StringIO()
+        call_command('delete_data', collection=[collection.pk], stdout=out)
+        self.assertIn('Deleted data objects: 2', out.getvalue())
+        self.assertIn('Deleted collections: 1', out.getvalue())
+        self.assertEqual(list(Data.objects.values_list('pk', flat=True)), [data[1].pk])
+        self.assertFalse(Collection.objects.exists())
@@ -12,6 +12,9 @@ from mock import MagicMock, patch
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 from guardian.shortcuts import assign_perm, remove_perm
 from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
@@ -20,14 +23,11 @@ from resolwe.flow.expression_engines import EvaluationError
 from resolwe.flow.managers import manager
 from resolwe.flow.models import Data, DescriptorSchema, Entity, Process, Storage
 from resolwe.flow.models.data import hydrate_size, render_template
+from resolwe.flow.models.storage import LazyStorageJSON, get_storage_checksum
+from resolwe.flow.utils import get_query_checksum
 from resolwe.flow.views import DataViewSet
 from resolwe.test import TestCase
 
-try:
-    import builtins  # py3
-except ImportError:
-    import __builtin__ as builtins  # py2
-
 
 class DataModelTest(TestCase):
 
@@ -229,6 +229,43 @@ class DataModelTest(TestCase):
         self.assertIn(third, first.children.all())
         self.assertIn(third, second.children.all())
 
+    def test_lineage(self):
+        process = Process.objects.create(slug='test-lineage',
+                                         type='data:test:lineage:',
+                                         contributor=self.contributor,
+                                         input_schema=[{
+                                             'name': 'src',
+                                             'type': 'list:data:test:lineage:',
+                                             'required': False,
+                                         }])
+
+        first = Data.objects.create(name='First data', contributor=self.contributor, process=process)
+        second = Data.objects.create(name='Second data', contributor=self.contributor, process=process,
+                                     input={'src': [first.id]})
+        third = Data.objects.create(name='Third data', contributor=self.contributor, process=process,
+                                    input={'src': [first.id, second.id]})
+        fourth = Data.objects.create(name='Fourth data', contributor=self.contributor, process=process,
+                                     input={'src': [third.id]})
+
+        self.assertEqual(set(Data.objects.ancestors(fourth)), {first, second, third})
+        self.assertEqual(set(Data.objects.ancestors(fourth, max_depth=1)), {third})
+        self.assertEqual(set(Data.objects.ancestors(first)), set())
+        self.assertEqual(set(Data.objects.descendants(first)), {second, third, fourth})
+        self.assertEqual(set(Data.objects.descendants([second.pk, third.pk])), {third, fourth})
+        self.assertEqual(set(Data.objects.filter(name='Fourth data').descendants(first)), {fourth})
+
+        self.assertEqual(
+            Data.objects.lineage_depths(fourth, 'ancestors'),
+            {third.pk: 1, second.pk: 2, first.pk: 2}
+        )
+        self.assertEqual(
+            Data.objects.lineage_depths(first, 'descendants', max_depth=2),
+            {second.pk: 1, third.pk: 1, fourth.pk: 2}
+        )
+
+        with self.assertRaises(ValueError):
+            Data.objects.lineage_depths(first, 'siblings')
+
 
 class EntityModelTest(TestCase):
 
@@ -312,6 +349,29 @@ class GetOrCreateTestCase(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['id'], self.data.pk)
 
+    def test_get_latest_permitted(self):
+        permitted = Data.objects.create(
+            name='Permitted data',
+            contributor=self.user,
+            process=self.process,
+            input={'some_value': 42}
+        )
+        assign_perm('view_data', self.user, permitted)
+        for _ in range(3):
+            Data.objects.create(name='Other data', contributor=self.contributor, process=self.process,
+                                input={'some_value': 42})
+
+        request = self.factory.post(
+            '',
+            {'name': 'Data object', 'input': {'some_value': 42}, 'process': 'tmp-process'},
+            format='json'
+        )
+        force_authenticate(request, user=self.user)
+
+        response = self.get_or_create_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], permitted.pk)
+
     def test_use_defaults(self):
         request = self.factory.post(
             '',
@@ -492,20 +552,105 @@ class StorageModelTestCase(TestCase):
         data.output = {'json_field': 'json.txt'}
         data.status = Data.STATUS_DONE
 
-        # NOTE: io.StringIO expects a Python 3 (unicode) string
-        json_file = io.StringIO(six.u(json.dumps({'foo': 'bar'})))
+        dir_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+        os.makedirs(dir_path)
+        with io.open(os.path.join(dir_path, 'json.txt'), 'w', encoding='utf-8') as json_file:
+            json_file.write(six.text_type(json.dumps({'foo': 'bar'})))
 
-        isfile_mock = MagicMock(return_value=True)
-        open_mock = MagicMock(return_value=json_file)
-        with patch.object(os.path, 'isfile', isfile_mock):
-            with patch.object(builtins, 'open', open_mock):
-                data.save()
+        data.save()
 
         self.assertEqual(Storage.objects.count(), 1)
         storage = Storage.objects.first()
         self.assertEqual(data.output['json_field'], storage.pk)
         self.assertEqual(storage.json, {'foo': 'bar'})
 
+        # The same file is stored only once.
+        second = Data.objects.create(name='Second data', contributor=self.contributor, process=self.proc)
+        second_dir_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(second.pk))
+        os.makedirs(second_dir_path)
+        shutil.copy(os.path.join(dir_path, 'json.txt'), second_dir_path)
+
+        second.output = {'json_field': 'json.txt'}
+        second.status = Data.STATUS_DONE
+        second.save()
+
+        self.assertEqual(Storage.objects.count(), 1)
+        self.assertEqual(second.output['json_field'], storage.pk)
+
+    def test_save_storage_file_invalid(self):
+        data = Data.objects.create(name='Test data', contributor=self.contributor, process=self.proc)
+        data.output = {'json_field': 'json.txt'}
+        data.status = Data.STATUS_DONE
+
+        dir_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+        os.makedirs(dir_path)
+        with io.open(os.path.join(dir_path, 'json.txt'), 'w', encoding='utf-8') as json_file:
+            json_file.write(six.text_type('{"foo": '))
+
+        with six.assertRaisesRegex(self, ValidationError, 'is not a valid JSON'):
+            data.save()
+
+        self.assertEqual(Storage.objects.count(), 0)
+
+        with io.open(os.path.join(dir_path, 'json.txt'), 'w', encoding='utf-8') as json_file:
+            json_file.write(six.text_type(json.dumps({'foo': 'bar' * 10})))
+
+        with override_settings(FLOW_STORAGE_MAX_SIZE=10):
+            with six.assertRaisesRegex(self, ValidationError, 'exceeds the maximum size'):
+                data.save()
+
+        self.assertEqual(Storage.objects.count(), 0)
+
+    def test_save_storage_file_checksum(self):
+        """JSON saved from a file and from Python is stored once"""
+        value = {'foo': 'bar', 'baz': [1, 2.5, None], 'unicode': '\u010d'}
+        data = Data.objects.create(name='Test data', contributor=self.contributor, process=self.proc)
+        data.output = {'json_field': value}
+        data.status = Data.STATUS_DONE
+        data.save()
+        storage = Storage.objects.get(pk=data.output['json_field'])
+        self.assertEqual(storage.checksum, get_storage_checksum(value))
+
+        second = Data.objects.create(name='Second data', contributor=self.contributor, process=self.proc)
+        dir_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(second.pk))
+        os.makedirs(dir_path)
+        with io.open(os.path.join(dir_path, 'json.txt'), 'w', encoding='utf-8') as json_file:
+            json_file.write(six.text_type(json.dumps(value, indent=4, ensure_ascii=False)))
+
+        second.output = {'json_field': 'json.txt'}
+        second.status = Data.STATUS_DONE
+        second.save()
+
+        self.assertEqual(Storage.objects.count(), 1)
+        self.assertEqual(second.output['json_field'], storage.pk)
+
+    def test_save_storage_file_encoding(self):
+        data = Data.objects.create(name='Test data', contributor=self.contributor, process=self.proc)
+        data.output = {'json_field': 'json.txt'}
+        data.status = Data.STATUS_DONE
+
+        dir_path = os.path.join(settings.FLOW_EXECUTOR['DATA_DIR'], str(data.pk))
+        os.makedirs(dir_path)
+        with io.open(os.path.join(dir_path, 'json.txt'), 'wb') as json_file:
+            json_file.write('{"foo": "\u010d"}'.encode('latin2'))
+
+        with six.assertRaisesRegex(self, ValidationError, 'is not UTF-8 encoded'):
+            data.save()
+
+        with io.open(os.path.join(dir_path, 'json.txt'), 'wb') as json_file:
+            json_file.write(b'{"foo": "a\x00b"}')
+
+        with six.assertRaisesRegex(self, ValidationError, 'contains NUL characters'):
+            data.save()
+
+        with io.open(os.path.join(dir_path, 'json.txt'), 'wb') as json_file:
+            json_file.write(b'')
+
+        with six.assertRaisesRegex(self, ValidationError, 'is not a valid JSON'):
+            data.save()
+
+        self.assertEqual(Storage.objects.count(), 0)
+
     def test_delete_data(self):
         """`Storage` is deleted when `Data` object is deleted"""
         data = Data.objects.create(
@@ -523,6 +668,124 @@ class StorageModelTestCase(TestCase):
         data.delete()
         self.assertEqual(Storage.objects.count(), 0)
 
+    def test_deduplicate_storage(self):
+        """Identical JSON is stored only once"""
+        first = Data.objects.create(name='First data', contributor=self.contributor, process=self.proc)
+        second = Data.objects.create(name='Second data', contributor=self.contributor, process=self.proc)
+        third = Data.objects.create(name='Third data', contributor=self.contributor, process=self.proc)
+
+        for data in (first, second):
+            data.output = {'json_field': {'foo': 'bar', 'baz': [1, 2]}}
+            data.status = Data.STATUS_DONE
+            data.save()
+
+        third.output = {'json_field': {'foo': 'baz'}}
+        third.status = Data.STATUS_DONE
+        third.save()
+
+        self.assertEqual(Storage.objects.count(), 2)
+        self.assertEqual(first.output['json_field'], second.output['json_field'])
+        self.assertNotEqual(first.output['json_field'], third.output['json_field'])
+
+        storage = Storage.objects.get(pk=first.output['json_field'])
+        six.assertCountEqual(self, storage.data.all(), [first, second])
+
+        # Shared storage is kept until the last data object is deleted.
+        first.delete()
+        self.assertEqual(Storage.objects.count(), 2)
+        self.assertEqual(list(storage.data.all()), [second])
+
+        second.delete()
+        self.assertEqual(Storage.objects.count(), 1)
+
+    def test_storage_checksum_text(self):
+        """Checksum calculated in Python matches checksum of jsonb text"""
+        values = [
+            {'b': 1, 'aa': {'c': [], 'd': {}}, 'a': None, '\u010d': True, 'z': False},
+            [1, -2, 1.5, 100.0, -0.0, 1e-07, 1.5e-10, 1e16, 12345678901234567890, 0.1 + 0.2],
+            {'text': 'quote " backslash \\ tab \t newline \n control \x01 \x7f unicode \u010d \U0001f600'},
+            'string',
+            [],
+        ]
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+            checksums = [get_storage_checksum(value) for value in values]
+        self.assertEqual(len(captured_queries), 0)
+
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            for value, checksum in zip(values, checksums):
+                self.assertEqual(
+                    checksum, get_query_checksum(cursor, 'SELECT %s::jsonb::text', [json.dumps(value)]), value
+                )
+
+    def test_storage_checksum(self):
+        storage = Storage.objects.get_or_create_json({'foo': 'bar'}, contributor=self.contributor)
+        self.assertEqual(storage.checksum, get_storage_checksum({'foo': 'bar'}))
+        self.assertEqual(storage.name, 'Storage {}'.format(storage.checksum))
+        self.assertEqual(Storage.objects.get_or_create_json({'foo': 'bar'}, contributor=self.user), storage)
+
+        # Checksum is updated when JSON is changed.
+        storage.json = {'foo': 'baz'}
+        storage.save()
+        storage.refresh_from_db()
+        self.assertEqual(storage.checksum, get_storage_checksum({'foo': 'baz'}))
+
+        # Checksums are unique.
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Storage.objects.create(name='Duplicate', contributor=self.contributor, json={'foo': 'baz'})
+
+        # Storage changed to JSON of another storage is not deduplicated.
+        other = Storage.objects.get_or_create_json({'foo': 'qux'}, contributor=self.contributor)
+        other.json = {'foo': 'baz'}
+        other.save()
+        other.refresh_from_db()
+        self.assertIsNone(other.checksum)
+        self.assertEqual(Storage.objects.get_or_create_json({'foo': 'baz'}, contributor=self.contributor), storage)
+
+    def test_lazy_storage_json(self):
+        storage = Storage.objects.create(
+            name='Test storage',
+            contributor=self.contributor,
+            json={'meta': {'n_rows': 3, 'columns': ['a', 'b']}, 'rows': [[1, 2], [3, 4], [5, 6]], 'empty': None},
+        )
+
+        lazy_json = LazyStorageJSON(pk=storage.pk)
+        conn = connections[DEFAULT_DB_ALIAS]
+        with CaptureQueriesContext(conn) as captured_queries:
+            meta = lazy_json['meta']
+            self.assertIsInstance(meta, LazyStorageJSON)
+            self.assertEqual(meta['n_rows'], 3)
+            self.assertEqual(meta['columns'], ['a', 'b'])
+        # Nested object is not loaded as a whole.
+        self.assertEqual(len(captured_queries), 3)
+
+        self.assertEqual(meta, {'n_rows': 3, 'columns': ['a', 'b']})
+        self.assertEqual(meta.get('n_rows'), 3)
+        self.assertEqual(json.dumps(dict(meta), sort_keys=True), '{"columns": ["a", "b"], "n_rows": 3}')
+        self.assertIsNone(lazy_json['empty'])
+        with self.assertRaises(KeyError):
+            lazy_json['missing']  # pylint: disable=pointless-statement
+        with self.assertRaises(KeyError):
+            LazyStorageJSON(pk=storage.pk)['meta']['missing']  # pylint: disable=pointless-statement
+
+        # Values are cached per path.
+        with CaptureQueriesContext(conn) as captured_queries:
+            self.assertEqual(lazy_json['meta']['n_rows'], 3)
+        self.assertEqual(len(captured_queries), 0)
+
+        self.assertEqual(lazy_json.get('rows'), [[1, 2], [3, 4], [5, 6]])
+        self.assertIsNone(lazy_json.get('missing'))
+        self.assertIn('meta', lazy_json)
+        self.assertNotIn('missing', lazy_json)
+
+        self.assertEqual(sorted(lazy_json), ['empty', 'meta', 'rows'])
+        self.assertEqual(sorted(lazy_json.keys()), ['empty', 'meta', 'rows'])
+        self.assertEqual(len(lazy_json), 3)
+        self.assertEqual(lazy_json, storage.json)
+        self.assertEqual(LazyStorageJSON(pk=storage.pk), storage.json)
+        self.assertEqual(json.loads(json.dumps(dict(lazy_json.items()))), storage.json)
+        self.assertEqual(repr(lazy_json), repr(storage.json))
+
 
 class UtilsTestCase(TestCase):
 
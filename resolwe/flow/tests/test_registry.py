@@ -0,0 +1,72 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from resolwe.flow.models import Process
+from resolwe.flow.registry import ProcessRegistry
+from resolwe.test import TestCase
+
+
+class ProcessRegistryTest(TestCase):
+
+    def setUp(self):
+        super(ProcessRegistryTest, self).setUp()
+
+        self.registry = ProcessRegistry()
+        self.process = Process.objects.create(slug='test-registry', version='1.0.0', contributor=self.contributor)
+
+    def test_get_latest(self):
+        self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+
+        conn = connections[DEFAULT_DB_ALIAS]
+        with CaptureQueriesContext(conn) as captured_queries:
+            self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+        self.assertEqual(len(captured_queries), 0)
+
+        with self.assertRaises(Process.DoesNotExist):
+            self.registry.get_latest('missing')
+
+        self.assertEqual(self.registry.stats(), {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3, 'size': 1})
+
+    def test_get_version(self):
+        self.assertEqual(self.registry.get('test-registry', '1.0.0'), self.process)
+        self.assertEqual(self.registry.get('test-registry', '1.0.0'), self.process)
+        self.assertEqual(self.registry.stats()['hits'], 1)
+
+        with self.assertRaises(Process.DoesNotExist):
+            self.registry.get('test-registry', '2.0.0')
+
+    def test_shared(self):
+        process = self.registry.get('test-registry', '1.0.0')
+        self.assertIs(self.registry.get('test-registry', '1.0.0'), process)
+        self.assertIs(self.registry.get_latest('test-registry'), self.registry.get_latest('test-registry'))
+
+    @override_settings(FLOW_PROCESS_REGISTRY_TIMEOUT=0)
+    def test_invalidate(self):
+        self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+
+        # Registries of all processes see new processes.
+        process = Process.objects.create(slug='test-registry', version='2.0.0', contributor=self.contributor)
+        self.assertEqual(self.registry.get_latest('test-registry'), process)
+
+        # Updates without signals, e.g. in the register command.
+        Process.objects.filter(pk=process.pk).update(name='Updated', modified=now())
+        self.assertEqual(self.registry.get_latest('test-registry').name, 'Updated')
+
+        process.delete()
+        self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+
+    def test_timeout(self):
+        self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+        process = Process.objects.create(slug='test-registry', version='2.0.0', contributor=self.contributor)
+
+        # Generation is not checked again before the timeout expires.
+        with override_settings(FLOW_PROCESS_REGISTRY_TIMEOUT=3600):
+            self.assertEqual(self.registry.get_latest('test-registry'), self.process)
+
+        self.registry.invalidate()
+        self.assertEqual(self.registry.get_latest('test-registry'), process)
@@ -166,9 +166,9 @@ class ValidationTest(TestCase):
         storage = Storage.objects.create(
             name="storage",
             contributor=self.user,
-            data_id=d.pk,
             json={'value': 42}
         )
+        storage.data.add(d)
         d.output = {'big_result': storage.pk}
         d.save()
 
@@ -10,13 +10,28 @@ Flow Utilities
 .. automodule:: resolwe.flow.utils.exceptions
    :members:
 
+.. automodule:: resolwe.flow.utils.download
+   :members:
+
+.. automodule:: resolwe.flow.utils.archive
+   :members:
+
+.. automodule:: resolwe.flow.utils.delete
+   :members:
+
+.. automodule:: resolwe.flow.utils.membership
+   :members:
+
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import decimal
 import functools
 import hashlib
 import json
 
+import six
+
 from django.db import models
 
 from .iterators import iterate_fields, iterate_schema  # pylint: disable=unused-import
@@ -31,6 +46,92 @@ def get_data_checksum(proc_input, proc_slug, proc_version):
     return checksum.hexdigest()
 
 
+def _jsonb_key(item):
+    """Return sort key of object items in the order of Postgres ``jsonb``."""
+    key = item[0].encode('utf-8')
+    return len(key), key
+
+
+def get_jsonb_text(value):
+    """Serialize JSON value as its ``jsonb`` text representation in Postgres.
+
+    Object keys are ordered by length and then bytewise, separators are
+    followed by spaces and numbers are written in plain decimal notation,
+    as by ``value::jsonb::text``.
+
+    """
+    if isinstance(value, dict):
+        items = [
+            (key if isinstance(key, six.string_types) else json.dumps(key), item)
+            for key, item in value.items()
+        ]
+        return '{{{}}}'.format(', '.join(
+            '{}: {}'.format(get_jsonb_text(key), get_jsonb_text(item))
+            for key, item in sorted(items, key=_jsonb_key)
+        ))
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(get_jsonb_text(item) for item in value))
+    if isinstance(value, float):
+        text = '{:f}'.format(decimal.Decimal(repr(value)))
+        # Postgres numeric type has no negative zero.
+        return text.lstrip('-') if value == 0 else text
+
+    return six.text_type(json.dumps(value, ensure_ascii=False))
+
+
+def get_json_checksum(value):
+    """Compute checksum of JSON value.
+
+    Checksum is equal to the checksum of its ``jsonb`` text
+    representation computed in the database with
+    :func:`get_query_checksum` (escaped as in the text format of
+    ``COPY`` and terminated with a newline).
+
+    """
+    text = get_jsonb_text(value).replace('\\', '\\\\') + '\n'
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class _ChecksumWriter(object):
+    """File-like object, which calculates checksum of data written to it."""
+
+    def __init__(self):
+        """Initialize checksum."""
+        self.checksum = hashlib.sha256()
+
+    def write(self, data):
+        """Update checksum with ``data``."""
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        self.checksum.update(data)
+
+
+def get_query_checksum(cursor, sql, params=None):
+    """Compute checksum of the result of query ``sql``.
+
+    The result is streamed from the database with ``COPY ... TO
+    STDOUT``, so it is never loaded into memory as a whole.
+
+    """
+    query = cursor.mogrify(sql, params)
+    if isinstance(query, bytes):
+        query = query.decode('utf-8')
+
+    writer = _ChecksumWriter()
+    cursor.copy_expert('COPY ({}) TO STDOUT'.format(query), writer)
+    return writer.checksum.hexdigest()
+
+
+def parse_boolean(value):
+    """Return ``True`` if query parameter ``value`` represents true.
+
+    Values ``1``, ``true``, ``yes`` and ``on`` (case insensitive) are
+    true, all other values are false.
+
+    """
+    return six.text_type(value).lower() in ('1', 'true', 'yes', 'on')
+
+
 def dict_dot(d, k, val=None, default=None):
     """Get or set value using a dot-notation key in a multilevel dict."""
     if val is None and k == '':
@@ -0,0 +1,156 @@
+""".. Ignore pydocstyle D400.
+
+=================
+Archive Streaming
+=================
+
+Output files of data objects are streamed as a tar archive (optionally
+compressed with gzip) while it is being created, so neither the archive
+nor the files are held in memory or written to disk.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import tarfile
+import zlib
+
+from django.conf import settings
+
+from resolwe.utils import BraceMessage as __
+
+from .download import get_path_data_id
+
+__all__ = ('get_archive_entries', 'stream_tar')
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: size of chunks in which files are read
+CHUNK_SIZE = 64 * 1024
+
+#: size of tar blocks
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+def get_field_files(value):
+    """Return files and references of the output field ``value``.
+
+    Fields are selected the same way as in the ``archiver`` process:
+    ``basic:file:`` fields and lists of them are included together with
+    their references, other fields are skipped.
+
+    """
+    files = []
+    for obj in value if isinstance(value, list) else [value]:
+        if isinstance(obj, dict) and obj.get('file'):
+            files.append(obj['file'])
+            files.extend(obj.get('refs', []))
+
+    return files
+
+
+def get_archive_entries(data_objects, fields, junk_paths=False, is_allowed=None):
+    """Yield absolute paths and names in archive of output files.
+
+    Files are named by the id of their data object and their path in
+    the data directory, or only by their base name if ``junk_paths`` is
+    set. References to directories are included with all their files.
+    Files can be symbolic links to directories of other data objects,
+    which are only included if ``is_allowed`` returns ``True`` for the
+    id of the other data object. Files resolving outside of the data
+    root are skipped.
+
+    """
+    data_root = os.path.realpath(settings.FLOW_EXECUTOR['DATA_DIR'])
+    for data in data_objects:
+        data_dir = os.path.join(data_root, str(data.pk))
+        for field in fields:
+            if field not in data.output:
+                continue
+
+            for name in get_field_files(data.output[field]):
+                path = os.path.normpath(os.path.join(data_dir, name))
+                if not path.startswith(data_dir + os.sep) or not _is_allowed(path, data, data_root, is_allowed):
+                    continue
+
+                if os.path.isdir(path):
+                    for dirpath, _, filenames in os.walk(path):
+                        for filename in sorted(filenames):
+                            file_path = os.path.join(dirpath, filename)
+                            if _is_allowed(file_path, data, data_root, is_allowed):
+                                yield os.path.realpath(file_path), _get_arcname(file_path, data_root, junk_paths)
+                else:
+                    yield os.path.realpath(path), _get_arcname(path, data_root, junk_paths)
+
+
+def _is_allowed(path, data, data_root, is_allowed):
+    """Check if ``path`` resolves to a file of an allowed data object."""
+    data_id = get_path_data_id(os.path.realpath(path), data_root)
+    if data_id == data.pk or (data_id is not None and is_allowed is not None and is_allowed(data_id)):
+        return True
+
+    logger.warning(__("File '{}' resolves outside of allowed data directories and is not added to archive.", path))
+    return False
+
+
+def _get_arcname(path, data_root, junk_paths):
+    """Return name of the file in archive."""
+    if junk_paths:
+        return os.path.basename(path)
+    return os.path.relpath(path, data_root)
+
+
+def _iterate_tar(entries):
+    """Yield tar archive of ``entries`` in chunks."""
+    for path, arcname in entries:
+        try:
+            handle = open(path, 'rb')
+        except (IOError, OSError):
+            logger.warning(__("File '{}' cannot be added to archive.", path))
+            continue
+
+        with handle:
+            stat = os.fstat(handle.fileno())
+            info = tarfile.TarInfo(arcname)
+            info.size = stat.st_size
+            info.mtime = stat.st_mtime
+            info.mode = 0o644
+            yield info.tobuf(tarfile.GNU_FORMAT)
+
+            remaining = info.size
+            while remaining > 0:
+                chunk = handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    # File was truncated, size in header must be kept.
+                    chunk = b'\0' * min(CHUNK_SIZE, remaining)
+                remaining -= len(chunk)
+                yield chunk
+
+            padding = -info.size % BLOCK_SIZE
+            if padding:
+                yield b'\0' * padding
+
+    # End of archive.
+    yield b'\0' * BLOCK_SIZE * 2
+
+
+def stream_tar(entries, compress=False):
+    """Yield tar archive of ``entries`` in chunks.
+
+    ``entries`` are pairs of absolute paths of files and their names in
+    archive. Archive is compressed with gzip if ``compress`` is set.
+
+    """
+    if not compress:
+        for chunk in _iterate_tar(entries):
+            yield chunk
+        return
+
+    # Window bits of 31 produce gzip header and trailer.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in _iterate_tar(entries):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
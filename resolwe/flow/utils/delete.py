@@ -0,0 +1,157 @@
+""".. Ignore pydocstyle D400.
+
+=============
+Bulk Deletion
+=============
+
+Many data objects are deleted at once with :func:`delete_data`. Signal
+handlers that clean up after each deleted object check
+:func:`is_bulk_delete` and skip the per-object work, which is done for
+all objects together instead.
+
+.. data:: bulk_deleted
+
+    Sent after the transaction in which objects were deleted with
+    :func:`delete_data` is committed. ``sender`` is the model class and
+    ``instances`` is the list of deleted objects (with only a few
+    fields loaded).
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.dispatch import Signal
+
+from guardian.models import GroupObjectPermission, UserObjectPermission
+
+from resolwe.flow.models import Data, Entity, Storage
+from resolwe.permissions.acl import remove_acl
+from resolwe.permissions.utils import bump_permissions_generation
+
+__all__ = ('bulk_deleted', 'delete_data', 'is_bulk_delete')
+
+bulk_deleted = Signal(providing_args=['instances'])  # pylint: disable=invalid-name
+
+_state = threading.local()  # pylint: disable=invalid-name
+
+
+def is_bulk_delete():
+    """Return ``True`` if objects are being deleted with :func:`delete_data` in this thread."""
+    return getattr(_state, 'bulk_delete', False)
+
+
+@contextmanager
+def _bulk_delete():
+    """Mark objects deleted in the context as deleted in bulk."""
+    _state.bulk_delete = True
+    try:
+        yield
+    finally:
+        _state.bulk_delete = False
+
+
+def _remove_permissions(model, pks):
+    """Remove object permissions on deleted objects."""
+    ctype = ContentType.objects.get_for_model(model)
+    object_pks = [str(pk) for pk in pks]
+    for permission_model in (UserObjectPermission, GroupObjectPermission):
+        queryset = permission_model.objects.filter(content_type=ctype, object_pk__in=object_pks)
+        queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+    remove_acl(ctype, pks)
+
+
+def _get_dependent_relations(model):
+    """Return relations of other models (incl. many-to-many tables) with a foreign key to ``model``."""
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)  # pylint: disable=protected-access
+        if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+    ]
+
+
+def _delete_objects(model, pks):
+    """Delete objects of ``model`` with ``pks`` without loading them.
+
+    Rows referencing the objects are deleted (or set to ``NULL``) with
+    one query per relation and the objects are deleted with a single
+    query. Objects are only loaded (with primary keys) and deleted by
+    Django's collector if they are referenced through a relation that
+    cannot be handled this way (e.g. a protected foreign key).
+
+    """
+    queryset = model.objects.filter(pk__in=pks)
+    for relation in _get_dependent_relations(model):
+        related = relation.related_model._base_manager.filter(  # pylint: disable=protected-access
+            **{'{}__in'.format(relation.field.name): pks}
+        )
+        if relation.on_delete is models.CASCADE:
+            if _get_dependent_relations(relation.related_model):
+                related.delete()
+            else:
+                related._raw_delete(related.db)  # pylint: disable=protected-access
+        elif relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        elif relation.on_delete is not models.DO_NOTHING and related.exists():
+            queryset.only('pk').delete()
+            return
+
+    queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+
+def _without_others(queryset, data_ids):
+    """Filter ``queryset`` to objects that only reference data with ``data_ids``."""
+    return queryset.filter(data__in=data_ids).exclude(
+        data__in=Data.objects.exclude(pk__in=data_ids)
+    ).distinct()
+
+
+def delete_data(data_ids, descendants=False, remove_dirs=True):
+    """Delete data objects with given ids and return ids of deleted objects.
+
+    If ``descendants`` is set, all descendants of the data objects are
+    deleted as well. Entities and storages that are only referenced by
+    the deleted objects are deleted with them. Documents are removed
+    from search indexes and directories are removed by the manager
+    after the transaction is committed. If ``remove_dirs`` is not set,
+    directories must be removed by the caller.
+
+    """
+    from resolwe.flow.managers import manager
+
+    data_ids = set(data_ids)
+    if descendants and data_ids:
+        data_ids.update(Data.objects.descendants(data_ids).values_list('pk', flat=True))
+
+    with transaction.atomic():
+        # Name is used when data objects are initialized.
+        data = list(Data.objects.filter(pk__in=data_ids).only('pk', 'name'))
+        data_ids = [obj.pk for obj in data]
+        if not data_ids:
+            return []
+
+        entities = list(_without_others(Entity.objects.all(), data_ids).only('pk'))
+        storages = _without_others(Storage.objects.all(), data_ids)
+        _delete_objects(Storage, list(storages.values_list('pk', flat=True)))
+
+        with _bulk_delete():
+            _delete_objects(Entity, [entity.pk for entity in entities])
+            _delete_objects(Data, data_ids)
+
+        _remove_permissions(Entity, [entity.pk for entity in entities])
+        _remove_permissions(Data, data_ids)
+        bump_permissions_generation()
+
+        def on_commit():
+            """Clean up after deleted objects."""
+            for model, instances in ((Entity, entities), (Data, data)):
+                if instances:
+                    bulk_deleted.send(sender=model, instances=instances)
+            if remove_dirs:
+                manager.remove_data_dirs(data_ids)
+
+        transaction.on_commit(on_commit)
+
+    return data_ids
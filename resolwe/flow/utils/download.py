@@ -0,0 +1,192 @@
+""".. Ignore pydocstyle D400.
+
+==============
+File Downloads
+==============
+
+Files are served with support for conditional and range requests. The
+transfer can be offloaded to the web server with the ``OFFLOAD`` key of
+the ``FLOW_DOWNLOAD`` setting:
+
+* ``'x-accel-redirect'`` sets ``X-Accel-Redirect`` header (Nginx) to
+  the path of the file under the ``ACCEL_PREFIX`` location
+  (``/protected/data/`` by default), which must be configured as an
+  internal location aliased to the data directory,
+* ``'x-sendfile'`` sets ``X-Sendfile`` header (Apache, Lighttpd) to
+  the absolute path of the file.
+
+Without offloading, whole files are returned as
+:class:`~django.http.FileResponse`, so WSGI servers that provide
+``wsgi.file_wrapper`` send them with ``sendfile`` system call, and
+ranges are streamed in chunks.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mimetypes
+import os
+import re
+
+from six.moves.urllib.parse import quote  # pylint: disable=import-error
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+__all__ = ('get_path_data_id', 'serve_file')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+#: size of chunks in which ranges are streamed
+CHUNK_SIZE = 64 * 1024
+
+
+def get_path_data_id(path, data_root):
+    """Return id of the data object whose directory contains ``path``.
+
+    Both ``path`` and ``data_root`` must be real paths (with symbolic
+    links resolved). ``None`` is returned if ``path`` is not in the
+    directory of a data object.
+
+    """
+    if not path.startswith(data_root + os.sep):
+        return None
+
+    try:
+        return int(os.path.relpath(path, data_root).split(os.sep, 1)[0])
+    except ValueError:
+        return None
+
+
+class RangeNotSatisfiable(Exception):
+    """Requested range is outside of the file."""
+
+
+def parse_range(header, size):
+    """Return the first and the last byte of the range in ``header``.
+
+    ``None`` is returned if the header is missing, malformed or
+    requests multiple ranges, in which case the whole file is served.
+
+    :raises RangeNotSatisfiable: if the range is outside of the file
+
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range, i.e. the last bytes of the file.
+        length = int(end)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+
+    return start, end
+
+
+def iterate_range(path, start, end):
+    """Yield content of the file between ``start`` and ``end`` in chunks."""
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _is_not_modified(request, etag, mtime):
+    """Check conditional headers of the request."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in etags or etag in etags or 'W/{}'.format(etag) in etags
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _is_range_valid(request, etag, mtime):
+    """Check that the range can be served according to ``If-Range`` header."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+
+    if if_range.startswith('"'):
+        return if_range == etag
+
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _get_file_response(request, path, size, etag, mtime):
+    """Return response streaming the file or its requested range."""
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{}'.format(size)
+        return response
+
+    if byte_range is None or not _is_range_valid(request, etag, mtime):
+        response = FileResponse(open(path, 'rb'))
+        response['Content-Length'] = size
+        return response
+
+    start, end = byte_range
+    response = StreamingHttpResponse(iterate_range(path, start, end), status=206)
+    response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+    response['Content-Length'] = end - start + 1
+    return response
+
+
+def serve_file(request, path, relative_path):
+    """Return response with the file at ``path``.
+
+    ``relative_path`` is the path of the file relative to the data
+    directory and is used to offload the transfer to the web server.
+
+    """
+    stat = os.stat(path)
+    etag = '"{:x}-{:x}"'.format(int(stat.st_mtime * 1000000), stat.st_size)
+
+    if _is_not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        offload = getattr(settings, 'FLOW_DOWNLOAD', {}).get('OFFLOAD', None)
+        if offload == 'x-accel-redirect':
+            # Web server handles ranges and conditional requests itself.
+            prefix = getattr(settings, 'FLOW_DOWNLOAD', {}).get('ACCEL_PREFIX', '/protected/data/')
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = quote('{}/{}'.format(prefix.rstrip('/'), relative_path).encode('utf-8'))
+        elif offload == 'x-sendfile':
+            response = HttpResponse()
+            response['X-Sendfile'] = path
+        else:
+            response = _get_file_response(request, path, stat.st_size, etag, stat.st_mtime)
+
+        # Compressed files are downloaded as they are, so encoding is
+        # not set.
+        content_type, _ = mimetypes.guess_type(path)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Content-Disposition'] = "attachment; filename*=UTF-8''{}".format(
+            quote(os.path.basename(path).encode('utf-8'))
+        )
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,167 @@
+""".. Ignore pydocstyle D400.
+
+==================
+Membership Changes
+==================
+
+Objects are added to and removed from many-to-many relations (i.e.
+data objects of collections and entities) with a constant number of
+queries, regardless of the number of objects. Existing rows of the
+through table are read in a single query and only missing rows are
+inserted with a single bulk insert, while removed rows are deleted with
+a single query.
+
+``m2m_changed`` signals are sent the same way as by the related
+managers, once for each of the given instances, so the caller should
+pass instances on the side of the relation with fewer objects.
+Modification times of objects touched by signal handlers with
+:func:`touch_objects` are updated with a single query for each model
+after all signals are sent.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+from contextlib import contextmanager
+
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+from django.utils.timezone import now
+
+__all__ = ('add_members', 'remove_members', 'touch_objects')
+
+_state = threading.local()  # pylint: disable=invalid-name
+
+
+def touch_objects(model, pks):
+    """Update modification time of objects of ``model`` with ``pks``.
+
+    While members are added or removed, objects are only collected and
+    updated together when the change is complete.
+
+    """
+    touched = getattr(_state, 'touched', None)
+    if touched is not None:
+        touched.setdefault(model, set()).update(pks)
+        return
+
+    model.objects.filter(pk__in=pks).update(modified=now())
+
+
+@contextmanager
+def _touch_together():
+    """Update modification time of objects touched in the context at once."""
+    if getattr(_state, 'touched', None) is not None:
+        # Objects are updated by the outer context.
+        yield
+        return
+
+    _state.touched = {}
+    try:
+        yield
+        touched = _state.touched
+    finally:
+        _state.touched = None
+
+    for model, pks in touched.items():
+        touch_objects(model, pks)
+
+
+def _get_relation(descriptor):
+    """Return through model, source and target attributes and target model."""
+    field = descriptor.field
+    if descriptor.reverse:
+        source_name, target_name = field.m2m_reverse_field_name(), field.m2m_field_name()
+        target_model = field.model
+    else:
+        source_name, target_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+        target_model = field.related_model
+
+    through = descriptor.through
+    source = through._meta.get_field(source_name).attname  # pylint: disable=protected-access
+    target = through._meta.get_field(target_name).attname  # pylint: disable=protected-access
+    return through, source, target, target_model
+
+
+def _send_signal(descriptor, action, instance, target_model, pk_set):
+    """Send ``m2m_changed`` signal as the related manager would."""
+    through = descriptor.through
+    m2m_changed.send(
+        sender=through,
+        action=action,
+        instance=instance,
+        reverse=descriptor.reverse,
+        model=target_model,
+        pk_set=pk_set,
+        using=router.db_for_write(through, instance=instance),
+    )
+
+
+def add_members(descriptor, instances, pks):
+    """Add objects with ``pks`` to the relation of each of ``instances``.
+
+    ``descriptor`` is the many-to-many descriptor of the relation, i.e.
+    ``Collection.data`` or ``Data.collection_set``. Objects that are
+    already related are skipped.
+
+    """
+    through, source, target, target_model = _get_relation(descriptor)
+    instances = list(instances)
+    pks = set(pks)
+    if not instances or not pks:
+        return
+
+    with transaction.atomic(), _touch_together():
+        existing = set(through.objects.filter(**{
+            '{}__in'.format(source): [instance.pk for instance in instances],
+            '{}__in'.format(target): pks,
+        }).values_list(source, target))
+
+        added = {}
+        for instance in instances:
+            missing = {pk for pk in pks if (instance.pk, pk) not in existing}
+            if missing:
+                added[instance] = missing
+                _send_signal(descriptor, 'pre_add', instance, target_model, missing)
+
+        through.objects.bulk_create([
+            through(**{source: instance.pk, target: pk})
+            for instance, missing in added.items()
+            for pk in missing
+        ])
+
+        for instance, missing in added.items():
+            _send_signal(descriptor, 'post_add', instance, target_model, missing)
+
+
+def remove_members(descriptor, instances, pks):
+    """Remove objects with ``pks`` from the relation of each of ``instances``.
+
+    ``descriptor`` is the many-to-many descriptor of the relation as in
+    :func:`add_members`. Objects that are not related are ignored.
+
+    """
+    through, source, target, target_model = _get_relation(descriptor)
+    instances = list(instances)
+    pks = set(pks)
+    if not instances or not pks:
+        return
+
+    with transaction.atomic(), _touch_together():
+        queryset = through.objects.filter(**{
+            '{}__in'.format(source): [instance.pk for instance in instances],
+            '{}__in'.format(target): pks,
+        })
+
+        removed = {}
+        existing = set(queryset.values_list(source, target))
+        for instance in instances:
+            related = {pk for pk in pks if (instance.pk, pk) in existing}
+            if related:
+                removed[instance] = related
+                _send_signal(descriptor, 'pre_remove', instance, target_model, related)
+
+        queryset.delete()
+
+        for instance, related in removed.items():
+            _send_signal(descriptor, 'post_remove', instance, target_model, related)
@@ -152,3 +152,10 @@ def data_purge(data_ids=None, delete=False, verbosity=0):
                 os.remove(name)
             elif os.path.isdir(name):
                 shutil.rmtree(name)
+
+
+def remove_data_dirs(data_ids):
+    """Remove directories of (deleted) data objects with given ids."""
+    data_path = settings.FLOW_EXECUTOR['DATA_DIR']
+    for data_id in data_ids:
+        shutil.rmtree(os.path.join(data_path, str(data_id)), ignore_errors=True)
@@ -7,8 +7,13 @@ Flow Views
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import calendar
+import hashlib
+import json
 import os
 import pkgutil
+import time
+from collections import OrderedDict
 from importlib import import_module
 
 import six
@@ -18,26 +23,42 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
-from django.db import IntegrityError, transaction
-from django.db.models import Max
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Max, Sum
 from django.db.models.query import Prefetch
+from django.http import StreamingHttpResponse
 from django.utils._os import upath
+from django.utils.http import http_date, parse_http_date_safe
 
 from guardian import shortcuts
 from rest_framework import exceptions, mixins, permissions, status, viewsets
 from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
-
-from resolwe.flow.utils import dict_dot, get_data_checksum, iterate_schema
-from resolwe.permissions.shortcuts import get_object_perms, get_objects_for_user
-
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from resolwe.flow.utils import dict_dot, get_data_checksum, iterate_schema, parse_boolean
+from resolwe.flow.utils.archive import get_archive_entries, stream_tar
+from resolwe.flow.utils.delete import delete_data
+from resolwe.flow.utils.download import get_path_data_id, serve_file
+from resolwe.flow.utils.membership import add_members, remove_members
+from resolwe.permissions.mixins import ResolwePrincipalMixin
+from resolwe.permissions.principal import cache_principal, clear_principal, get_principal
+from resolwe.permissions.shortcuts import get_object_perms, get_objects_for_user, get_objects_perms
+from resolwe.permissions.signals import permissions_changed
+from resolwe.permissions.utils import bulk_assign_perm, bulk_remove_perm, get_permissions_generation
+from resolwe.rest.pagination import KeysetPagination
+from resolwe.rest.projection import apply_queryset_projection, get_request_projection
+from resolwe.rest.renderers import EventStreamRenderer
+
+from .changes import get_broker
 from .filters import CollectionFilter, DataFilter, EntityFilter, ProcessFilter
-from .managers import manager
 from .models import Collection, Data, DescriptorSchema, Entity, Process, Relation, Storage
 from .models.entity import PositionInRelation, RelationType
+from .registry import process_registry
 from .serializers import (
     CollectionSerializer, DataSerializer, DescriptorSchemaSerializer, EntitySerializer, PositionInRelationSerializer,
-    ProcessSerializer, RelationSerializer, StorageSerializer,
+    ProcessSchemaSerializer, ProcessSerializer, RelationSerializer, StorageSerializer,
 )
 
 
@@ -99,6 +120,24 @@ def load_permissions(permissions_name):
 
 permissions_cls = load_permissions(settings.FLOW_API['PERMISSIONS'])  # pylint: disable=invalid-name
 
+#: default time to wait for changes (in seconds)
+CHANGES_TIMEOUT = 30
+
+#: interval of keepalive comments in streams of changes (in seconds)
+CHANGES_KEEPALIVE = 15
+
+#: reconnection time of clients of streams of changes (in milliseconds)
+CHANGES_RETRY = 1000
+
+#: facets of data objects and fields by which they are grouped (tags
+#: are grouped by each tag separately)
+DATA_FACETS = OrderedDict([
+    ('status', 'status'),
+    ('process_type', 'process__type'),
+    ('contributor', 'contributor'),
+    ('tags', None),
+])
+
 
 class ResolweCreateModelMixin(mixins.CreateModelMixin):
     """Mixin to support creating new `Resolwe` models.
@@ -206,10 +245,8 @@ class ResolweCreateDataModelMixin(ResolweCreateModelMixin):
 
         # translate processe's slug to id
         process_slug = request.data.get('process', None)
-        process_query = Process.objects.filter(slug=process_slug)
-        process_query = get_objects_for_user(request.user, 'view_process', process_query)
         try:
-            process = process_query.latest()
+            process = self._get_process(process_slug)
         except Process.DoesNotExist:
             return Response({'process': ['Invalid process slug "{}" - object does not exist.'.format(process_slug)]},
                             status=status.HTTP_400_BAD_REQUEST)
@@ -230,19 +267,164 @@ class ResolweCreateDataModelMixin(ResolweCreateModelMixin):
                 checksum=checksum,
                 process__persistence__in=[Process.PERSISTENCE_CACHED, Process.PERSISTENCE_TEMP],
             )
-            data_qs = get_objects_for_user(request.user, 'view_data', data_qs)
-            if data_qs.exists():
-                data = data_qs.order_by('created').last()
+            # Objects are found through the checksum index and their
+            # permissions are checked in the same query.
+            data = get_objects_for_user(request.user, 'view_data', data_qs).order_by('-created').first()
+            if data is not None:
                 serializer = self.get_serializer(data)
                 return Response(serializer.data)
 
-        # create the objects
-        resp = super(ResolweCreateDataModelMixin, self).create(request, *args, **kwargs)
+        # Manager is triggered by the post save signal of the object.
+        return super(ResolweCreateDataModelMixin, self).create(request, *args, **kwargs)
 
-        # run manager
-        manager.communicate()
+    def _get_process(self, process_slug):
+        """Return the latest process with given slug the user can view.
 
-        return resp
+        :raises ~resolwe.flow.models.Process.DoesNotExist: if there is
+            no such process
+
+        """
+        if get_principal(self.request.user).has_global_perm('flow.view_process'):
+            return process_registry.get_latest(process_slug)
+
+        # Version of the latest process the user can view is found in a
+        # single query and the process is loaded from the registry.
+        process_query = get_objects_for_user(
+            self.request.user, 'view_process', Process.objects.filter(slug=process_slug)
+        )
+        version = process_query.order_by('-version').values_list('version', flat=True).first()
+        if version is None:
+            raise Process.DoesNotExist
+
+        return process_registry.get(process_slug, version)
+
+    def _validate_bulk_item(self, item, cache):
+        """Validate a single item of the bulk create request.
+
+        Translate slugs to ids in ``item`` and return a tuple of the
+        serializer and errors. Lookups are cached in ``cache``, so they
+        are done only once for all items.
+
+        """
+        if not isinstance(item, dict):
+            return None, {'non_field_errors': ['Invalid data. Expected a dictionary.']}
+
+        user = self.request.user
+        errors = {}
+
+        collection_ids = item.get('collections', [])
+        if not isinstance(collection_ids, list):
+            errors['collections'] = ['Expected a list of items but got type "{}".'.format(
+                type(collection_ids).__name__)]
+            collection_ids = []
+
+        for collection_id in collection_ids:
+            if isinstance(collection_id, (dict, list)):
+                errors.setdefault('collections', []).append(
+                    'Incorrect type. Expected pk value, received {}.'.format(type(collection_id).__name__))
+                continue
+
+            if collection_id not in cache['collections']:
+                try:
+                    collection = Collection.objects.get(pk=collection_id)
+                    if user.has_perm('add_collection', obj=collection):
+                        cache['collections'][collection_id] = collection
+                    else:
+                        cache['collections'][collection_id] = 'You do not have permission to add data to ' \
+                                                              'collection "{}".'.format(collection_id)
+                except (Collection.DoesNotExist, ValueError):
+                    cache['collections'][collection_id] = 'Invalid pk "{}" - object does not exist.'.format(
+                        collection_id)
+
+            if not isinstance(cache['collections'][collection_id], Collection):
+                errors.setdefault('collections', []).append(cache['collections'][collection_id])
+
+        process_slug = item.get('process', None)
+        if isinstance(process_slug, (dict, list)):
+            errors['process'] = ['Incorrect type. Expected slug value, received {}.'.format(
+                type(process_slug).__name__)]
+        else:
+            if process_slug not in cache['processes']:
+                try:
+                    cache['processes'][process_slug] = self._get_process(process_slug)
+                except Process.DoesNotExist:
+                    cache['processes'][process_slug] = None
+            if cache['processes'][process_slug] is None:
+                errors['process'] = ['Invalid process slug "{}" - object does not exist.'.format(process_slug)]
+            else:
+                item['process'] = cache['processes'][process_slug].pk
+
+        ds_slug = item.get('descriptor_schema', None)
+        if isinstance(ds_slug, (dict, list)):
+            errors['descriptor_schema'] = ['Incorrect type. Expected slug value, received {}.'.format(
+                type(ds_slug).__name__)]
+        elif ds_slug:
+            if ds_slug not in cache['descriptor_schemas']:
+                ds_query = DescriptorSchema.objects.filter(slug=ds_slug)
+                ds_query = get_objects_for_user(user, 'view_descriptorschema', ds_query)
+                try:
+                    cache['descriptor_schemas'][ds_slug] = ds_query.latest()
+                except DescriptorSchema.DoesNotExist:
+                    cache['descriptor_schemas'][ds_slug] = None
+            if cache['descriptor_schemas'][ds_slug] is None:
+                errors['descriptor_schema'] = [
+                    'Invalid descriptor_schema slug "{}" - object does not exist.'.format(ds_slug)]
+            else:
+                item['descriptor_schema'] = cache['descriptor_schemas'][ds_slug].pk
+
+        if errors:
+            return None, errors
+
+        item['contributor'] = user.pk
+        serializer = self.get_serializer(data=item)
+        if not serializer.is_valid():
+            return None, serializer.errors
+
+        return serializer, {}
+
+    @list_route(methods=[u'post'])
+    def bulk(self, request, *args, **kwargs):
+        """Create multiple ``Data`` objects in a single transaction.
+
+        Request must contain a list of objects in the same format as
+        for creating a single object. If any of them is invalid, no
+        object is created and a list of errors for each of the objects
+        is returned in the same order.
+
+        """
+        if not request.user.is_authenticated():
+            raise exceptions.NotFound
+
+        if not isinstance(request.data, list):
+            return Response({'error': 'List of objects is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache = {'collections': {}, 'processes': {}, 'descriptor_schemas': {}}
+        results = [self._validate_bulk_item(item, cache) for item in request.data]
+        errors = [item_errors for _, item_errors in results]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializers = [serializer for serializer, _ in results]
+
+        try:
+            with transaction.atomic():
+                instances = [serializer.save() for serializer in serializers]
+
+                # Assign all permissions to the objects contributor.
+                permissions = list(zip(*Data._meta.permissions))[0]  # pylint: disable=protected-access
+                bulk_assign_perm(permissions, request.user, instances)
+
+                # Assign data objects to all specified collections.
+                collections = {}
+                for item, instance in zip(request.data, instances):
+                    for collection_id in item.get('collections', []):
+                        collections.setdefault(cache['collections'][collection_id], []).append(instance)
+                for collection, collection_instances in six.iteritems(collections):
+                    collection.data.add(*collection_instances)
+        except IntegrityError as ex:
+            return Response({u'error': str(ex)}, status=status.HTTP_409_CONFLICT)
+
+        serializer = self.get_serializer(instances, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @list_route(methods=[u'post'])
     def get_or_create(self, request, *args, **kwargs):
@@ -337,13 +519,29 @@ class ResolwePermissionsMixin(object):
 
             def to_representation(serializer_self, instance):  # pylint: disable=no-self-argument
                 """Object serializer."""
-                # TODO: These permissions queries may be expensive. Should we limit or optimize this?
                 data = super(SerializerWithPermissions, serializer_self).to_representation(instance)
-                data['permissions'] = get_object_perms(instance, self.request.user)
+
+                # Use permissions prefetched for all serialized objects.
+                objects_perms = serializer_self.context.get('objects_perms', {})
+                if instance.pk in objects_perms:
+                    data['permissions'] = objects_perms[instance.pk]
+                else:
+                    data['permissions'] = get_object_perms(instance, self.request.user)
                 return data
 
         return SerializerWithPermissions
 
+    def get_serializer(self, *args, **kwargs):
+        """Prefetch permissions of all objects serialized at once."""
+        if kwargs.get('many', False) and args:
+            instances = list(args[0])
+            args = (instances,) + args[1:]
+
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['objects_perms'] = get_objects_perms(instances, self.request.user)
+
+        return super(ResolwePermissionsMixin, self).get_serializer(*args, **kwargs)
+
     def _filter_owner_permission(self, data):
         """Raise ``PermissionDenied``if ``owner`` found in ``data``."""
         for entity_type in ['users', 'groups']:
@@ -392,11 +590,95 @@ class ResolwePermissionsMixin(object):
 
         return Response(get_object_perms(obj))
 
+    def _update_permissions_bulk(self, objects, data):
+        """Update permissions of all ``objects`` at once.
+
+        ``data`` has the same format as in :meth:`_update_permission`.
+        Permissions are changed with bulk queries and no signals are
+        sent for individual permissions.
+
+        """
+        model = type(objects[0])
+        full_permissions = list(zip(*model._meta.permissions))[0]  # pylint: disable=protected-access
+
+        def get_codenames(perms):
+            """Return codenames of given permissions."""
+            if perms == u'ALL':
+                perms = full_permissions
+            model_name = model._meta.model_name  # pylint: disable=protected-access
+            return ['{}_{}'.format(perm.lower(), model_name) for perm in perms]
+
+        for perm_type in ['add', 'remove']:
+            perm_func = bulk_assign_perm if perm_type == 'add' else bulk_remove_perm
+
+            for entity_type, fetch in [('users', self._fetch_user), ('groups', self._fetch_group)]:
+                for entity_id, perms in six.iteritems(data.get(entity_type, {}).get(perm_type, {})):
+                    perm_func(get_codenames(perms), fetch(entity_id), objects, send_signal=False)
+
+            perms = data.get('public', {}).get(perm_type, [])
+            if perms:
+                perm_func(get_codenames(perms), AnonymousUser(), objects, send_signal=False)
+
+    def _get_bulk_objects(self, ids):
+        """Return objects with given ids visible to the user."""
+        if not isinstance(ids, list):
+            raise exceptions.ParseError("`ids` must be a list of object ids.")
+
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            raise exceptions.ParseError("`ids` must be a list of object ids.")
+
+        objects = list(self.filter_queryset(self.get_queryset()).filter(pk__in=ids))
+        missing = ids - {obj.pk for obj in objects}
+        if missing:
+            raise exceptions.NotFound("Objects with ids {} do not exist.".format(sorted(missing)))
+
+        return objects
+
     @list_route(methods=['get', 'post'], url_path='permissions')
     def list_permissions(self, request):
-        """Batch get or set permissions API endpoint."""
-        # TODO: Implement batch get/set permissions
-        return Response(status=status.HTTP_501_NOT_IMPLEMENTED)
+        """Batch get or set permissions API endpoint.
+
+        Object ids are given in the ``ids`` query parameter (as a comma
+        separated list) for ``GET`` and in the ``ids`` key of the body
+        for ``POST`` requests. Permissions are changed in the same
+        format as in the detail endpoint. ``share`` permission is
+        required on all of the objects.
+
+        """
+        if request.method == 'POST':
+            objects = self._get_bulk_objects(request.data.get('ids', None))
+        else:
+            ids = request.query_params.get('ids', '')
+            objects = self._get_bulk_objects([pk for pk in ids.split(',') if pk])
+
+        if objects and request.method == 'POST':
+            model_name = type(objects[0])._meta.model_name  # pylint: disable=protected-access
+
+            if not request.user.is_superuser:
+                share_perm = 'share_{}'.format(model_name)
+                shared = get_objects_for_user(request.user, share_perm, self.get_queryset().filter(
+                    pk__in=[obj.pk for obj in objects]))
+                if shared.count() != len(objects):
+                    raise exceptions.PermissionDenied()
+
+                owner_perm = 'owner_{}'.format(model_name)
+                owned = get_objects_for_user(request.user, owner_perm, shared)
+                if owned.count() != len(objects):
+                    self._filter_owner_permission(request.data)
+
+            self._filter_public_permissions(request.data)
+            self._filter_user_permissions(request.data, request.user.pk)
+
+            with transaction.atomic():
+                self._update_permissions_bulk(objects, request.data)
+
+            # Notify listeners (i.e. search index) once for all objects.
+            permissions_changed.send(sender=type(objects[0]), instances=objects)
+
+        objects_perms = get_objects_perms(objects)
+        return Response([{'id': obj.pk, 'permissions': objects_perms[obj.pk]} for obj in objects])
 
 
 class ResolweProcessPermissionsMixin(ResolwePermissionsMixin):
@@ -420,6 +702,19 @@ class ResolweProcessPermissionsMixin(ResolwePermissionsMixin):
                     except Collection.DoesNotExist:
                         pass
 
+    def _update_permissions_bulk(self, objects, data):
+        """Update collection permissions of all ``objects``."""
+        super(ResolweProcessPermissionsMixin, self)._update_permissions_bulk(objects, data)
+
+        if 'collections' in data:
+            collections = Collection.objects.filter(pk__in=data['collections'].get('add', []))
+            for collection in collections:
+                collection.public_processes.add(*objects)
+
+            collections = Collection.objects.filter(pk__in=data['collections'].get('remove', []))
+            for collection in collections:
+                collection.public_processes.remove(*objects)
+
 
 class ResolweCheckSlugMixin(object):
     """Slug validation."""
@@ -444,27 +739,236 @@ class ResolweCheckSlugMixin(object):
         return Response(queryset.filter(slug__iexact=slug_name).exists())
 
 
-class CollectionViewSet(ResolweCreateModelMixin,
+class ResolweProjectionMixin(object):
+    """Load only fields of objects needed for the requested projection."""
+
+    #: actions that serialize objects with the requested projection
+    projection_actions = ('list', 'retrieve', 'export')
+
+    def get_queryset(self):
+        """Apply field projection to the queryset of serializing actions."""
+        queryset = super(ResolweProjectionMixin, self).get_queryset()
+        if getattr(self, 'action', None) not in self.projection_actions:
+            return queryset
+
+        projection = get_request_projection(self.request)
+        if not projection:
+            return queryset
+
+        return apply_queryset_projection(queryset, self.get_serializer(), projection)
+
+
+class ResolweExportMixin(object):
+    """Streaming export of objects."""
+
+    #: number of objects serialized at once
+    export_chunk_size = 500
+
+    def _export_chunks(self, queryset, paginator, fields, descending):
+        """Yield lists of objects in ``queryset`` in chunks.
+
+        Objects are ordered by ``fields`` as by keyset pagination and
+        each chunk of ids is selected after the last object of the
+        previous one, so ids are never all fetched at once. Objects are
+        then fetched with all prefetched relations chunk by chunk.
+
+        """
+        position = None
+        while True:
+            rows = list(paginator.order_queryset(queryset, fields, descending, position).values_list(
+                *[field.name for field in fields]
+            )[:self.export_chunk_size])
+            if not rows:
+                return
+
+            # Primary key is always the last field.
+            yield self._get_export_objects([row[-1] for row in rows])
+
+            if len(rows) < self.export_chunk_size:
+                return
+            position = list(rows[-1])
+
+    def _get_export_objects(self, ids):
+        """Return objects with given ids in the same order."""
+        objects = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        return [objects[pk] for pk in ids if pk in objects]
+
+    @list_route(methods=[u'get'])
+    def export(self, request):
+        """Stream all objects as newline delimited JSON.
+
+        The same filters and field projection as in the list endpoint
+        are supported, and the same orderings as with keyset pagination.
+        Objects are serialized in chunks and the response is streamed as
+        they are serialized.
+
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        # Ordering is checked before the response is started.
+        paginator = KeysetPagination()
+        fields, descending = paginator.get_fields(request, queryset, self)
+        encoder = JSONEncoder()
+
+        # Principal is removed from the user when the response is
+        # finalized, but it is needed to serialize permissions while
+        # the response is streamed.
+        principal = get_principal(request.user)
+
+        def stream():
+            """Serialize objects chunk by chunk."""
+            cache_principal(request.user, principal)
+            try:
+                for objects in self._export_chunks(queryset, paginator, fields, descending):
+                    for item in self.get_serializer(objects, many=True).data:
+                        yield encoder.encode(item) + '\n'
+            finally:
+                clear_principal(request.user)
+
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
+class ResolweConditionalMixin(object):
+    """Conditional GET requests of list and detail endpoints.
+
+    Responses carry ``ETag`` and ``Last-Modified`` headers. The ETag is
+    computed from the number of objects and the latest modification
+    time of the filtered queryset, the requesting user, the permissions
+    generation and the request URL, so it can be checked without
+    serializing objects. If it matches ``If-None-Match`` header (or the
+    object wasn't modified since ``If-Modified-Since`` on detail
+    endpoint), ``304 Not Modified`` is returned.
+
+    """
+
+    #: many-to-many relations whose objects are included in responses
+    conditional_related = ()
+
+    def _get_modification_stats(self, queryset):
+        """Return latest modification time and number of objects in ``queryset``."""
+        stats = queryset.aggregate(modified=Max('modified'), count=Count('pk', distinct=True))
+        return stats['modified'], stats['count']
+
+    def get_validators(self, queryset):
+        """Return ETag and last modification time of objects in ``queryset``."""
+        model = queryset.model
+        # Aggregate over plain queryset, as the filtered one can include
+        # annotations, extra selects and ordering.
+        pks = queryset.order_by().values('pk')
+        last_modified, count = self._get_modification_stats(model.objects.filter(pk__in=pks))
+        parts = [count, last_modified]
+
+        for name in self.conditional_related:
+            field = model._meta.get_field(name)  # pylint: disable=protected-access
+            related = field.related_model.objects.filter(**{'{}__in'.format(field.related_query_name()): pks})
+            related_modified, related_count = self._get_modification_stats(related)
+            parts.extend([related_count, related_modified])
+            if related_modified is not None and (last_modified is None or related_modified > last_modified):
+                last_modified = related_modified
+
+        parts.extend([
+            model._meta.label,  # pylint: disable=protected-access
+            self.request.user.pk,
+            get_permissions_generation(),
+            self.request.get_full_path(),
+            self.request.META.get('HTTP_ACCEPT', ''),
+        ])
+        etag = hashlib.md5(':'.join(six.text_type(part) for part in parts).encode('utf-8')).hexdigest()
+
+        return '"{}"'.format(etag), last_modified
+
+    def _is_not_modified(self, etag, last_modified, detail):
+        """Check conditional headers of the request."""
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in etags or etag in etags or 'W/{}'.format(etag) in etags
+
+        # Deleted objects don't change the latest modification time, so
+        # it is only reliable for a single object.
+        if_modified_since = parse_http_date_safe(self.request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if detail and if_modified_since is not None and last_modified is not None:
+            return calendar.timegm(last_modified.utctimetuple()) <= if_modified_since
+
+        return False
+
+    def get_conditional_response(self, queryset, get_response, detail=False):
+        """Return ``304 Not Modified`` or the response of ``get_response``."""
+        etag, last_modified = self.get_validators(queryset)
+        if self._is_not_modified(etag, last_modified, detail):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = get_response()
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(calendar.timegm(last_modified.utctimetuple()))
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List objects unless they are not modified."""
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_conditional_response(
+            queryset, lambda: super(ResolweConditionalMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve object unless it is not modified."""
+        instance = self.get_object()
+        return self.get_conditional_response(
+            self.get_queryset().filter(pk=instance.pk),
+            lambda: Response(self.get_serializer(instance).data),
+            detail=True
+        )
+
+
+class CollectionViewSet(ResolwePrincipalMixin,
+                        ResolweConditionalMixin,
+                        ResolweCreateModelMixin,
                         mixins.RetrieveModelMixin,
                         ResolweUpdateModelMixin,
                         mixins.DestroyModelMixin,
                         mixins.ListModelMixin,
                         ResolwePermissionsMixin,
                         ResolweCheckSlugMixin,
+                        ResolweExportMixin,
+                        ResolweProjectionMixin,
                         viewsets.GenericViewSet):
     """API view for :class:`Collection` objects."""
 
     queryset = Collection.objects.all().prefetch_related(
         'descriptor_schema',
         'contributor',
-        Prefetch('data', queryset=Data.objects.all().order_by('id'))
     )
     serializer_class = CollectionSerializer
     permission_classes = (permissions_cls,)
     filter_class = CollectionFilter
+    pagination_class = KeysetPagination
+    conditional_related = ('data',)
     ordering_fields = ('id', 'created', 'modified', 'name')
     ordering = ('id',)
 
+    def get_queryset(self):
+        """Prefetch data objects, including their relations if they are hydrated."""
+        data_queryset = Data.objects.all().order_by('id')
+        if self.request.query_params.get('hydrate_data', False):
+            data_queryset = data_queryset.prefetch_related('process', 'descriptor_schema', 'contributor')
+
+        return super(CollectionViewSet, self).get_queryset().prefetch_related(
+            Prefetch('data', queryset=data_queryset)
+        )
+
+    def _get_ids(self, ids):
+        """Return set of object ids given in a request."""
+        if not isinstance(ids, list):
+            raise exceptions.ParseError("`ids` must be a list of object ids.")
+
+        try:
+            return {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            raise exceptions.ParseError("`ids` must be a list of object ids.")
+
     @detail_route(methods=[u'post'])
     def add_data(self, request, pk=None):
         """Add data to collection."""
@@ -473,18 +977,16 @@ class CollectionViewSet(ResolweCreateModelMixin,
         if 'ids' not in request.data:
             return Response({"error": "`ids`parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        missing = []
-        for data_id in request.data['ids']:
-            if not Data.objects.filter(pk=data_id).exists():
-                missing.append(data_id)
-
+        data_ids = self._get_ids(request.data['ids'])
+        missing = data_ids - set(Data.objects.filter(pk__in=data_ids).values_list('pk', flat=True))
         if missing:
             return Response(
-                {"error": "Data objects with following ids are missing: {}".format(', '.join(missing))},
+                {"error": "Data objects with following ids are missing: {}".format(
+                    ', '.join(str(data_id) for data_id in sorted(missing))
+                )},
                 status=status.HTTP_400_BAD_REQUEST)
 
-        for data_id in request.data['ids']:
-            collection.data.add(data_id)
+        add_members(type(collection).data, [collection], data_ids)
 
         return Response()
 
@@ -496,8 +998,7 @@ class CollectionViewSet(ResolweCreateModelMixin,
         if 'ids' not in request.data:
             return Response({"error": "`ids`parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for data_id in request.data['ids']:
-            collection.data.remove(data_id)
+        remove_members(type(collection).data, [collection], self._get_ids(request.data['ids']))
 
         return Response()
 
@@ -509,26 +1010,27 @@ class EntityViewSet(CollectionViewSet):
     serializer_class = EntitySerializer
 
     queryset = Entity.objects.prefetch_related(
-        Prefetch('data', queryset=Data.objects.all().order_by('id')),
         'descriptor_schema',
         'contributor'
     ).annotate(
         latest_date=Max('data__modified')
     ).order_by('-latest_date')
 
-    def _check_collection_permissions(self, collection_id, user):
-        """Check that collection exists and user has `add` permission."""
-        collection_query = Collection.objects.filter(pk=collection_id)
-        if not collection_query.exists():
+    def _get_collections(self, collection_ids, user):
+        """Check that collections exist and user has `add` permission on them."""
+        collection_ids = self._get_ids(collection_ids)
+        queryset = Collection.objects.filter(pk__in=collection_ids)
+        if queryset.count() != len(collection_ids):
             raise exceptions.ValidationError('Collection id does not exist')
 
-        collection = collection_query.first()
-        if not user.has_perm('add_collection', obj=collection):
+        if get_objects_for_user(user, 'flow.add_collection', queryset).count() != len(collection_ids):
             if user.is_authenticated():
                 raise exceptions.PermissionDenied()
             else:
                 raise exceptions.NotFound()
 
+        return collection_ids
+
     @detail_route(methods=[u'post'])
     def add_to_collection(self, request, pk=None):
         """Add Entity to a collection."""
@@ -537,15 +1039,13 @@ class EntityViewSet(CollectionViewSet):
         if 'ids' not in request.data:
             return Response({"error": "`ids` parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for collection_id in request.data['ids']:
-            self._check_collection_permissions(collection_id, request.user)
+        collection_ids = self._get_collections(request.data['ids'], request.user)
 
-        for collection_id in request.data['ids']:
-            entity.collections.add(collection_id)
-
-            collection = Collection.objects.get(pk=collection_id)
-            for data in entity.data.all():
-                collection.data.add(data)
+        # Signals are sent for each data object of the entity instead
+        # of each collection, as there are only a few of them.
+        with transaction.atomic():
+            add_members(Entity.collections, [entity], collection_ids)
+            add_members(Data.collection_set, entity.data.all(), collection_ids)
 
         return Response()
 
@@ -557,28 +1057,26 @@ class EntityViewSet(CollectionViewSet):
         if 'ids' not in request.data:
             return Response({"error": "`ids` parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        for collection_id in request.data['ids']:
-            self._check_collection_permissions(collection_id, request.user)
-
-        for collection_id in request.data['ids']:
-            entity.collections.remove(collection_id)
+        collection_ids = self._get_collections(request.data['ids'], request.user)
 
-            collection = Collection.objects.get(pk=collection_id)
-            for data in entity.data.all():
-                collection.data.remove(data)
+        with transaction.atomic():
+            remove_members(Entity.collections, [entity], collection_ids)
+            remove_members(Data.collection_set, entity.data.all(), collection_ids)
 
         return Response()
 
     @detail_route(methods=[u'post'])
     def add_data(self, request, pk=None):
         """Add data to Entity and it's collection."""
-        # add data to entity
-        resp = super(EntityViewSet, self).add_data(request, pk)
+        with transaction.atomic():
+            # add data to entity
+            resp = super(EntityViewSet, self).add_data(request, pk)
+            if resp.status_code != status.HTTP_200_OK:
+                return resp
 
-        # add data to collections in which entity is
-        entity = self.get_object()
-        for collection in entity.collections.all():
-            collection.data.add(*request.data['ids'])
+            # add data to collections in which entity is
+            entity = self.get_object()
+            add_members(Collection.data, entity.collections.all(), self._get_ids(request.data['ids']))
 
         return resp
 
@@ -588,13 +1086,14 @@ class EntityViewSet(CollectionViewSet):
         resp = super(EntityViewSet, self).remove_data(request, pk)
 
         entity = self.get_object()
-        if entity.data.count() == 0:
+        if not entity.data.exists():
             entity.delete()
 
         return resp
 
 
-class RelationViewSet(mixins.CreateModelMixin,
+class RelationViewSet(ResolwePrincipalMixin,
+                      mixins.CreateModelMixin,
                       mixins.ListModelMixin,
                       mixins.RetrieveModelMixin,
                       mixins.UpdateModelMixin,
@@ -724,11 +1223,13 @@ class RelationViewSet(mixins.CreateModelMixin,
         return Response()
 
 
-class ProcessViewSet(ResolweCreateModelMixin,
+class ProcessViewSet(ResolwePrincipalMixin,
+                     ResolweCreateModelMixin,
                      mixins.RetrieveModelMixin,
                      mixins.ListModelMixin,
                      ResolweProcessPermissionsMixin,
                      ResolweCheckSlugMixin,
+                     ResolweProjectionMixin,
                      viewsets.GenericViewSet):
     """API view for :class:`Process` objects."""
 
@@ -740,13 +1241,17 @@ class ProcessViewSet(ResolweCreateModelMixin,
     ordering = ('id',)
 
 
-class DataViewSet(ResolweCreateDataModelMixin,
+class DataViewSet(ResolwePrincipalMixin,
+                  ResolweConditionalMixin,
+                  ResolweCreateDataModelMixin,
                   mixins.RetrieveModelMixin,
                   ResolweUpdateModelMixin,
                   mixins.DestroyModelMixin,
                   mixins.ListModelMixin,
                   ResolwePermissionsMixin,
                   ResolweCheckSlugMixin,
+                  ResolweExportMixin,
+                  ResolweProjectionMixin,
                   viewsets.GenericViewSet):
     """API view for :class:`Data` objects."""
 
@@ -754,13 +1259,356 @@ class DataViewSet(ResolweCreateDataModelMixin,
     serializer_class = DataSerializer
     permission_classes = (permissions_cls,)
     filter_class = DataFilter
+    pagination_class = KeysetPagination
     ordering_fields = ('id', 'created', 'modified', 'started', 'finished', 'name')
     ordering = ('id',)
 
+    def list(self, request, *args, **kwargs):
+        """List data objects.
+
+        If ``sideload_processes`` query parameter is true (``1``,
+        ``true``, ``yes`` or ``on``), input and output schemas of
+        processes are not included in each object, but listed once for
+        each process in ``processes``. Paginated responses get the
+        additional ``processes`` key. Without pagination, the response
+        is an object with ``results`` and ``processes`` keys instead of
+        a list of objects.
+
+        """
+        if not parse_boolean(request.query_params.get('sideload_processes', False)):
+            return super(DataViewSet, self).list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_conditional_response(queryset, lambda: self._list_sideloaded(queryset))
+
+    def _list_sideloaded(self, queryset):
+        """List data objects with sideloaded process schemas."""
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+
+        processes = Process.objects.filter(pk__in={obj.process_id for obj in objects}).order_by('id')
+        processes_data = ProcessSchemaSerializer(processes.only('id', 'input_schema', 'output_schema'), many=True).data
+
+        data = self.get_serializer(objects, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(data)
+            response.data['processes'] = processes_data
+            return response
+
+        return Response(OrderedDict([
+            ('results', data),
+            ('processes', processes_data),
+        ]))
+
+    def _lineage(self, request, direction):
+        """Return ancestors or descendants of the object with their depth.
+
+        Only objects visible to the user are returned. Traversal can be
+        limited with the ``depth`` query parameter.
+
+        """
+        data = self.get_object()
 
-class DescriptorSchemaViewSet(mixins.RetrieveModelMixin,
+        max_depth = request.query_params.get('depth', None)
+        if max_depth is not None:
+            try:
+                max_depth = int(max_depth)
+            except ValueError:
+                raise exceptions.ParseError("`depth` query parameter must be an integer.")
+            if max_depth < 1:
+                raise exceptions.ParseError("`depth` query parameter must be a positive integer.")
+
+        queryset = getattr(self.get_queryset(), direction)(data, max_depth=max_depth)
+        queryset = self.filter_queryset(queryset)
+        depths = Data.objects.lineage_depths(data, direction, max_depth=max_depth)
+
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else queryset
+        serializer = self.get_serializer(objects, many=True)
+
+        items = serializer.data
+        for item, obj in zip(items, objects):
+            item['depth'] = depths.get(obj.pk)
+
+        if page is not None:
+            return self.get_paginated_response(items)
+        return Response(items)
+
+    @detail_route(methods=[u'get'])
+    def ancestors(self, request, pk=None):
+        """Return all ancestors of the data object."""
+        return self._lineage(request, 'ancestors')
+
+    @detail_route(methods=[u'get'])
+    def descendants(self, request, pk=None):
+        """Return all descendants of the data object."""
+        return self._lineage(request, 'descendants')
+
+    def _get_facet(self, queryset, field):
+        """Return number and total size of objects for each value of ``field``."""
+        rows = queryset.annotate(
+            value=F(field)
+        ).values('value').annotate(
+            count=Count('pk'),
+            total_size=Sum('size'),
+        ).order_by('-count', 'value')
+
+        return [
+            OrderedDict([('value', row['value']), ('count', row['count']), ('size', int(row['total_size'] or 0))])
+            for row in rows
+        ]
+
+    def _get_tags_facet(self, queryset):
+        """Return number and total size of objects for each tag."""
+        pks_sql, params = queryset.values('pk').query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT tag, COUNT(*), COALESCE(SUM(size), 0) FROM {table}, unnest({table}.tags) AS tag '
+                'WHERE {table}.id IN ({pks}) GROUP BY tag ORDER BY COUNT(*) DESC, tag'.format(
+                    table=Data._meta.db_table,  # pylint: disable=protected-access
+                    pks=pks_sql,
+                ),
+                params
+            )
+
+            return [
+                OrderedDict([('value', tag), ('count', count), ('size', int(size))])
+                for tag, count, size in cursor.fetchall()
+            ]
+
+    def _get_facets(self, queryset, facets):
+        """Return total number and size of objects and their ``facets``."""
+        totals = queryset.aggregate(count=Count('pk'), total_size=Sum('size'))
+        result = OrderedDict([
+            ('count', totals['count']),
+            ('size', int(totals['total_size'] or 0)),
+            ('facets', OrderedDict()),
+        ])
+
+        for name in facets:
+            if DATA_FACETS[name] is None:
+                result['facets'][name] = self._get_tags_facet(queryset)
+            else:
+                result['facets'][name] = self._get_facet(queryset, DATA_FACETS[name])
+
+        return Response(result)
+
+    @list_route(methods=[u'get'])
+    def facets(self, request):
+        """Return numbers and total sizes of data objects grouped by facets.
+
+        Data objects are filtered the same way as in the list endpoint.
+        Facets are given as a comma separated list in the ``facets``
+        query parameter (``status``, ``process_type``, ``contributor``
+        and ``tags`` by default). Counts and sizes are computed by the
+        database.
+
+        """
+        facets = request.query_params.get('facets', None)
+        facets = facets.split(',') if facets else list(DATA_FACETS.keys())
+        unknown = [name for name in facets if name not in DATA_FACETS]
+        if unknown:
+            raise exceptions.ParseError("Unknown facets: {}.".format(', '.join(unknown)))
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Aggregate over plain queryset, as the filtered one can include
+        # joins that duplicate objects.
+        plain_queryset = Data.objects.filter(pk__in=queryset.order_by().values('pk'))
+
+        return self.get_conditional_response(queryset, lambda: self._get_facets(plain_queryset, facets))
+
+    @list_route(methods=[u'post'])
+    def bulk_delete(self, request):
+        """Delete multiple data objects in a single transaction.
+
+        Ids of data objects are given in the ``ids`` key of the body.
+        If ``descendants`` is set, all their descendants are deleted as
+        well. ``edit`` permission is required on all deleted objects.
+
+        """
+        objects = self._get_bulk_objects(request.data.get('ids', None))
+        data_ids = {obj.pk for obj in objects}
+        if request.data.get('descendants', False) and data_ids:
+            data_ids.update(Data.objects.descendants(data_ids).values_list('pk', flat=True))
+
+        editable = get_objects_for_user(request.user, 'flow.edit_data', Data.objects.filter(pk__in=data_ids))
+        if editable.count() != len(data_ids):
+            raise exceptions.PermissionDenied()
+
+        deleted = delete_data(data_ids)
+        return Response({'deleted': sorted(deleted)})
+
+    @detail_route(methods=[u'get'])
+    def download(self, request, pk=None):
+        """Download the file given with ``path`` query parameter.
+
+        The path is relative to the directory of the data object and
+        ``download`` permission on the data object is required. Files
+        can be symbolic links to directories of other data objects, in
+        which case ``download`` permission is required on them as well.
+        Range and conditional requests are supported.
+
+        """
+        data = self.get_object()
+        if not request.user.has_perm('flow.download_data', data):
+            raise exceptions.PermissionDenied()
+
+        if 'path' not in request.query_params:
+            raise exceptions.ParseError("`path` query parameter must be given.")
+
+        data_root = os.path.realpath(settings.FLOW_EXECUTOR['DATA_DIR'])
+        data_dir = os.path.join(data_root, str(data.pk))
+        path = os.path.normpath(os.path.join(data_dir, request.query_params['path']))
+        # Files can be symbolic links to other data directories, but
+        # not outside of them.
+        real_path = os.path.realpath(path)
+        owner_id = get_path_data_id(real_path, data_root)
+        if not path.startswith(data_dir + os.sep) or owner_id is None or not os.path.isfile(real_path):
+            raise exceptions.NotFound()
+
+        if owner_id != data.pk and not self._can_download(request.user, owner_id):
+            raise exceptions.PermissionDenied()
+
+        return serve_file(request, real_path, os.path.relpath(real_path, data_root))
+
+    @staticmethod
+    def _can_download(user, data_id):
+        """Check if ``user`` has ``download`` permission on data object with ``data_id``."""
+        return get_objects_for_user(user, 'flow.download_data', Data.objects.filter(pk=data_id)).exists()
+
+    @list_route(methods=[u'get'])
+    def archive(self, request):
+        """Stream tar archive of output files of multiple data objects.
+
+        Data objects are given with the ``ids`` and output fields with
+        the ``outputs`` query parameter (as comma separated lists).
+        Files are stored without their paths if ``junk`` query
+        parameter is given and the archive is compressed with gzip if
+        ``compress`` query parameter is given. ``download`` permission
+        is required on all of the data objects. Files linked from
+        directories of other data objects are only included if the user
+        has ``download`` permission on them.
+
+        """
+        ids = request.query_params.get('ids', '')
+        objects = self._get_bulk_objects([pk for pk in ids.split(',') if pk])
+        fields = [field for field in request.query_params.get('outputs', '').split(',') if field]
+        if not objects or not fields:
+            raise exceptions.ParseError("`ids` and `outputs` query parameters must be given.")
+
+        compress = bool(request.query_params.get('compress', False))
+
+        downloadable = get_objects_for_user(
+            request.user, 'flow.download_data', Data.objects.filter(pk__in=[obj.pk for obj in objects])
+        )
+        if downloadable.count() != len(objects):
+            raise exceptions.PermissionDenied()
+
+        allowed = {}
+
+        def is_allowed(data_id):
+            """Check download permission on data objects with linked files."""
+            if data_id not in allowed:
+                allowed[data_id] = self._can_download(request.user, data_id)
+            return allowed[data_id]
+
+        entries = get_archive_entries(
+            objects, fields, junk_paths=bool(request.query_params.get('junk', False)), is_allowed=is_allowed
+        )
+        response = StreamingHttpResponse(
+            stream_tar(entries, compress=compress),
+            content_type='application/gzip' if compress else 'application/x-tar'
+        )
+        response['Content-Disposition'] = 'attachment; filename="results.{}"'.format(
+            'tar.gz' if compress else 'tar'
+        )
+        return response
+
+    def _filter_changes(self, changes):
+        """Return changes of data objects visible to the user."""
+        if not changes:
+            return []
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk__in={change['id'] for change in changes})
+        visible = set(queryset.values_list('pk', flat=True))
+        return [change for change in changes if change['id'] in visible]
+
+    def _stream_changes(self, broker, cursor, timeout):
+        """Yield server-sent events with changes until ``timeout`` expires."""
+        deadline = time.time() + timeout
+        yield 'retry: {}\n\n'.format(CHANGES_RETRY)
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+
+            cursor, changes = broker.wait(cursor, min(remaining, CHANGES_KEEPALIVE))
+            if changes is None:
+                yield 'id: {}\nevent: resync\ndata: {{}}\n\n'.format(cursor)
+                continue
+
+            changes = self._filter_changes(changes)
+            if not changes:
+                # Keep the connection open.
+                yield ': keepalive\n\n'
+
+            for change in changes:
+                yield 'id: {}\nevent: change\ndata: {}\n\n'.format(cursor, json.dumps(change))
+
+    @list_route(methods=[u'get'], renderer_classes=list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer])
+    def changes(self, request):
+        """Return changes of status, progress and outputs of data objects.
+
+        Changes after the one given with the ``cursor`` query parameter
+        are returned together with the cursor of the last change. If
+        there are none, the request waits for them for ``timeout``
+        seconds. Without ``cursor``, only the current cursor is returned.
+
+        If ``text/event-stream`` content is requested, changes are
+        streamed as server-sent events until ``timeout`` expires and
+        the cursor is taken from ``Last-Event-ID`` header on reconnect.
+
+        Only changes of objects visible to the user and matching the
+        filters of the list endpoint are returned.
+
+        If changes after ``cursor`` are not known to the server (i.e.
+        the client fell behind by too many changes), ``resync`` is set
+        in the response (or a ``resync`` event is sent). The client must
+        then reload the objects it tracks and continue with the returned
+        cursor.
+
+        """
+        broker = get_broker()
+        timeout = request.query_params.get('timeout', CHANGES_TIMEOUT)
+        try:
+            timeout = min(float(timeout), broker.max_timeout)
+        except ValueError:
+            raise exceptions.ParseError("`timeout` query parameter must be a number.")
+
+        cursor = request.query_params.get('cursor', request.META.get('HTTP_LAST_EVENT_ID', None))
+
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            response = StreamingHttpResponse(
+                self._stream_changes(broker, cursor, timeout),
+                content_type=EventStreamRenderer.media_type
+            )
+            response['Cache-Control'] = 'no-cache'
+            return response
+
+        cursor, data_changes = broker.wait(cursor, timeout)
+        return Response(OrderedDict([
+            ('cursor', cursor),
+            ('resync', data_changes is None),
+            ('changes', self._filter_changes(data_changes)),
+        ]))
+
+
+class DescriptorSchemaViewSet(ResolwePrincipalMixin,
+                              mixins.RetrieveModelMixin,
                               mixins.ListModelMixin,
                               ResolwePermissionsMixin,
+                              ResolweProjectionMixin,
                               viewsets.GenericViewSet):
     """API view for :class:`DescriptorSchema` objects."""
 
@@ -772,11 +1620,12 @@ class DescriptorSchemaViewSet(mixins.RetrieveModelMixin,
     ordering = ('id',)
 
 
-class StorageViewSet(mixins.RetrieveModelMixin,
+class StorageViewSet(ResolwePrincipalMixin,
+                     mixins.RetrieveModelMixin,
                      mixins.ListModelMixin,
                      viewsets.GenericViewSet):
     """API view for :class:`Storage` objects."""
 
-    queryset = Storage.objects.all().prefetch_related('contributor')
+    queryset = Storage.objects.all().prefetch_related('contributor', 'data')
     serializer_class = StorageSerializer
     filter_fields = ('contributor', 'name', 'created', 'modified', 'slug')
@@ -1 +1,5 @@
 """Resolwe permissions."""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+
+default_app_config = 'resolwe.permissions.apps.PermissionsConfig'  # pylint: disable=invalid-name
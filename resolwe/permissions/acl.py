@@ -0,0 +1,223 @@
+""".. Ignore pydocstyle D400.
+
+====================
+Access Control Lists
+====================
+
+Object permissions of ``django-guardian`` are copied to
+:class:`~resolwe.permissions.models.AccessControl` rows, which are used
+to filter objects by permissions. Rows of the given objects are
+recomputed from guardian's tables with a fixed number of queries
+whenever their permissions change in bulk (bulk permission utils call
+:func:`update_acl`), while a single permission is added to or removed
+from the row of its object with :func:`add_acl_permission` and
+:func:`remove_acl_permission` (called by signal handlers). All rows can
+be recomputed with :func:`rebuild_acl` (``rebuild_acl`` management
+command).
+
+Changes of rows of the same objects are serialized with transaction
+level advisory locks, so concurrent changes do not conflict.
+
+Only objects with integer primary keys and permissions whose action is
+listed in :data:`~resolwe.permissions.models.PERMISSION_BITS` are
+included.
+
+.. autofunction:: get_permission_mask
+.. autofunction:: update_acl
+.. autofunction:: add_acl_permission
+.. autofunction:: remove_acl_permission
+.. autofunction:: remove_acl
+.. autofunction:: rebuild_acl
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.contrib.auth.models import Permission
+from django.db import connection, transaction
+from django.db.models import F
+
+from guardian.models import GroupObjectPermission, UserObjectPermission
+
+from .models import PERMISSION_BITS, AccessControl
+
+__all__ = (
+    'get_permission_mask', 'update_acl', 'add_acl_permission', 'remove_acl_permission', 'remove_acl', 'rebuild_acl',
+)
+
+# Permissions of each principal on each object are combined to a
+# bitmask by the action in their codename.
+INSERT_SQL = """
+    INSERT INTO {acl} (content_type_id, object_id, {principal}, permissions)
+    SELECT * FROM (
+        SELECT
+            perm.content_type_id,
+            CAST(perm.object_pk AS bigint) AS object_id,
+            perm.{principal},
+            BIT_OR(CASE split_part(auth_perm.codename, '_', 1) {cases} ELSE 0 END) AS permissions
+        FROM {perms} AS perm
+        JOIN {auth_perms} AS auth_perm ON auth_perm.id = perm.permission_id
+        WHERE perm.object_pk ~ '^[0-9]{{1,18}}$' {where}
+        GROUP BY perm.content_type_id, CAST(perm.object_pk AS bigint), perm.{principal}
+    ) AS acl
+    WHERE acl.permissions <> 0
+"""
+
+# Objects are locked in a fixed order to avoid deadlocks. Keys of locks
+# are content type ids and object ids truncated to integers.
+LOCK_SQL = """
+    SELECT pg_advisory_xact_lock(%s, lock_id)
+    FROM (
+        SELECT DISTINCT CAST(object_id %% 2147483648 AS integer) AS lock_id
+        FROM unnest(%s::bigint[]) AS object_id
+        ORDER BY lock_id
+    ) AS locks
+"""
+
+
+def get_permission_mask(codenames):
+    """Return bitmask of permissions with ``codenames``.
+
+    ``None`` is returned if any of the permissions is not included in
+    access control lists.
+
+    """
+    mask = 0
+    for codename in codenames:
+        bit = PERMISSION_BITS.get(codename.split('_', 1)[0], None)
+        if bit is None:
+            return None
+        mask |= bit
+
+    return mask
+
+
+def _get_object_ids(object_pks):
+    """Return integer primary keys of objects."""
+    return [int(pk) for pk in (str(pk) for pk in object_pks) if pk.isdigit()]
+
+
+def _lock_objects(content_type, object_ids):
+    """Lock access control rows of objects until the end of transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(LOCK_SQL, [content_type.pk, object_ids])
+
+
+def _insert_acl(perms_model, principal, where='', params=None):
+    """Insert access control rows computed from ``perms_model`` permissions."""
+    cases = ' '.join('WHEN %s THEN %s' for _ in PERMISSION_BITS)
+    case_params = [value for item in PERMISSION_BITS.items() for value in item]
+
+    sql = INSERT_SQL.format(
+        acl=AccessControl._meta.db_table,  # pylint: disable=protected-access
+        perms=perms_model._meta.db_table,  # pylint: disable=protected-access
+        auth_perms=Permission._meta.db_table,  # pylint: disable=protected-access
+        principal=principal,
+        cases=cases,
+        where=where,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, case_params + list(params or []))
+
+
+def update_acl(content_type, object_pks, user_id=None, group_id=None):
+    """Recompute access control rows of objects with ``object_pks``.
+
+    Only rows of the user or the group with ``user_id`` or ``group_id``
+    are recomputed if one of them is given, otherwise rows of all users
+    and groups.
+
+    """
+    object_ids = _get_object_ids(object_pks)
+    if not object_ids:
+        return
+
+    principals = []
+    if group_id is None:
+        principals.append((UserObjectPermission, 'user_id', user_id))
+    if user_id is None:
+        principals.append((GroupObjectPermission, 'group_id', group_id))
+
+    with transaction.atomic():
+        _lock_objects(content_type, object_ids)
+
+        for perms_model, principal, principal_id in principals:
+            queryset = AccessControl.objects.filter(
+                content_type=content_type,
+                object_id__in=object_ids,
+                **{'{}__isnull'.format(principal): False}
+            )
+            where = 'AND perm.content_type_id = %s AND perm.object_pk = ANY(%s)'
+            params = [content_type.pk, [str(object_id) for object_id in object_ids]]
+            if principal_id is not None:
+                queryset = queryset.filter(**{principal: principal_id})
+                where += ' AND perm.{} = %s'.format(principal)
+                params.append(principal_id)
+
+            queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+            _insert_acl(perms_model, principal, where, params)
+
+
+def _get_permission_bit(codename, object_pk):
+    """Return bit of permission ``codename`` and integer primary key of the object.
+
+    ``None`` is returned instead of the bit if the permission or the
+    object is not included in access control lists.
+
+    """
+    object_ids = _get_object_ids([object_pk])
+    if not object_ids:
+        return None, None
+
+    return PERMISSION_BITS.get(codename.split('_', 1)[0], None), object_ids[0]
+
+
+def add_acl_permission(content_type, object_pk, codename, user_id=None, group_id=None):
+    """Add permission ``codename`` of the user or the group to the row of the object."""
+    bit, object_id = _get_permission_bit(codename, object_pk)
+    if bit is None:
+        return
+
+    principal = {'user_id': user_id, 'group_id': group_id}
+    with transaction.atomic():
+        _lock_objects(content_type, [object_id])
+
+        queryset = AccessControl.objects.filter(content_type=content_type, object_id=object_id, **principal)
+        if not queryset.update(permissions=F('permissions').bitor(bit)):
+            AccessControl.objects.create(content_type=content_type, object_id=object_id, permissions=bit, **principal)
+
+
+def remove_acl_permission(content_type, object_pk, codename, user_id=None, group_id=None):
+    """Remove permission ``codename`` of the user or the group from the row of the object."""
+    bit, object_id = _get_permission_bit(codename, object_pk)
+    if bit is None:
+        return
+
+    principal = {'user_id': user_id, 'group_id': group_id}
+    with transaction.atomic():
+        _lock_objects(content_type, [object_id])
+
+        queryset = AccessControl.objects.filter(content_type=content_type, object_id=object_id, **principal)
+        queryset.update(permissions=F('permissions').bitand(~bit))
+        empty = queryset.filter(permissions=0)
+        empty._raw_delete(empty.db)  # pylint: disable=protected-access
+
+
+def remove_acl(content_type, object_pks):
+    """Remove access control rows of objects with ``object_pks``."""
+    queryset = AccessControl.objects.filter(content_type=content_type, object_id__in=_get_object_ids(object_pks))
+    queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+
+def rebuild_acl():
+    """Recompute all access control rows."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE {} IN EXCLUSIVE MODE'.format(
+                AccessControl._meta.db_table  # pylint: disable=protected-access
+            ))
+
+        queryset = AccessControl.objects.all()
+        queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+        _insert_acl(UserObjectPermission, 'user_id')
+        _insert_acl(GroupObjectPermission, 'group_id')
@@ -0,0 +1,23 @@
+""".. Ignore pydocstyle D400.
+
+=========================
+Permissions Configuration
+=========================
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.apps import AppConfig
+from django.utils.translation import ugettext_lazy as _
+
+
+class PermissionsConfig(AppConfig):
+    """Permissions AppConfig."""
+
+    name = 'resolwe.permissions'
+    verbose_name = _("Resolwe Permissions")
+
+    def ready(self):
+        """Application initialization."""
+        # Register signals handlers
+        from . import handlers  # pylint: disable=unused-variable
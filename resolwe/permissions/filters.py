@@ -22,11 +22,17 @@ class ResolwePermissionsFilter(BaseFilterBackend):
         app_label = queryset.model._meta.app_label  # pylint: disable=protected-access
         model_name = queryset.model._meta.model_name  # pylint: disable=protected-access
 
-        kwargs = {}
         if model_name == 'storage':
-            model_name = 'data'
-            kwargs['perms_filter'] = 'data__pk__in'
+            # Storage can be shared between multiple data objects, so it
+            # is filtered with a subquery of storages of visible data
+            # objects (a join would return duplicates).
+            data_field = queryset.model._meta.get_field('data')  # pylint: disable=protected-access
+            visible_data = get_objects_for_user(
+                user, '{}.view_data'.format(app_label), data_field.related_model.objects.all()
+            )
+            through = data_field.remote_field.through
+            return queryset.filter(pk__in=through.objects.filter(data__in=visible_data).values('storage'))
 
         permission = '{}.view_{}'.format(app_label, model_name)
 
-        return get_objects_for_user(user, permission, queryset, **kwargs)
+        return get_objects_for_user(user, permission, queryset)
@@ -0,0 +1,123 @@
+""".. Ignore pydocstyle D400.
+
+===========================
+Permissions Signal Handlers
+===========================
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+import weakref
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from guardian.models import GroupObjectPermission, UserObjectPermission
+
+from .acl import add_acl_permission, remove_acl_permission, update_acl
+from .signals import permissions_changed
+from .utils import bump_permissions_generation
+
+#: state of permission changes in the current thread
+_state = threading.local()  # pylint: disable=invalid-name
+
+
+class _PermissionsChangedCallback(object):
+    """Send ``permissions_changed`` signal for objects collected in a transaction."""
+
+    def __init__(self):
+        """Initialize empty collection of changed objects."""
+        #: primary keys of changed objects by content type ids
+        self.object_pks = {}
+
+    def __call__(self):
+        """Load changed objects and send the signal once per model."""
+        _state.pending = None
+
+        for content_type_id, object_pks in self.object_pks.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            instances = list(model.objects.filter(pk__in=object_pks).order_by('pk'))
+            if len(instances) < len(object_pks):
+                # Some of the objects were already deleted.
+                bump_permissions_generation()
+            if instances:
+                permissions_changed.send(sender=model, instances=instances)
+
+
+def _permission_changed(instance):
+    """Notify receivers that permissions of the object of permission ``instance`` changed.
+
+    Objects are collected and the signal is sent once per model when the
+    transaction is committed, so objects are loaded and processed once,
+    even if many of their permissions are changed. Weak reference to the
+    queued callback is kept, which is cleared when the callback is run
+    or discarded on rollback. Access control list is already updated
+    when the signal is sent. Permissions generation is changed
+    immediately, so permissions cached in this transaction are not used.
+
+    """
+    bump_permissions_generation()
+
+    pending = getattr(_state, 'pending', None)
+    callback = pending() if pending is not None else None
+    queued = callback is not None
+    if not queued:
+        callback = _PermissionsChangedCallback()
+
+    callback.object_pks.setdefault(instance.content_type_id, set()).add(instance.object_pk)
+    if not queued:
+        # Callback is run immediately outside of transactions.
+        _state.pending = weakref.ref(callback)
+        transaction.on_commit(callback)
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_save, sender=GroupObjectPermission)
+def add_permission(sender, instance, created, **kwargs):
+    """Update access control list when a permission is added."""
+    content_type = ContentType.objects.get_for_id(instance.content_type_id)
+    principal = {'user_id': instance.user_id} if sender is UserObjectPermission else {'group_id': instance.group_id}
+    if created:
+        add_acl_permission(content_type, instance.object_pk, instance.permission.codename, **principal)
+    else:
+        update_acl(content_type, [instance.object_pk], **principal)
+
+    _permission_changed(instance)
+
+
+@receiver(post_delete, sender=UserObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def remove_permission(sender, instance, **kwargs):
+    """Update access control list when a permission is removed."""
+    content_type = ContentType.objects.get_for_id(instance.content_type_id)
+    principal = {'user_id': instance.user_id} if sender is UserObjectPermission else {'group_id': instance.group_id}
+    remove_acl_permission(content_type, instance.object_pk, instance.permission.codename, **principal)
+
+    _permission_changed(instance)
+
+
+def _bump_committed_generation():
+    """Change permissions generation after commit, unless it was already changed on this commit."""
+    if getattr(_state, 'bumped', False):
+        return
+
+    _state.bumped = True
+    bump_permissions_generation()
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(permissions_changed)
+def invalidate_permissions_generation(sender, **kwargs):
+    """Change permissions generation when permissions are changed."""
+    bump_permissions_generation()
+    if transaction.get_connection().in_atomic_block:
+        # Change it again after commit, as other processes could use
+        # the new generation with the old permissions before the
+        # transaction ends. Callbacks of the same commit are run one
+        # after another, so it is changed only once per commit.
+        _state.bumped = False
+        transaction.on_commit(_bump_committed_generation)
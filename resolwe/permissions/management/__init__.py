@@ -0,0 +1,10 @@
+""".. Ignore pydocstyle D400.
+
+======================
+Permissions Management
+======================
+
+.. automodule:: resolwe.permissions.management.commands.rebuild_acl
+    :members:
+
+"""
@@ -0,0 +1,24 @@
+""".. Ignore pydocstyle D400.
+
+===========================
+Rebuild Access Control List
+===========================
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+
+from resolwe.permissions.acl import rebuild_acl
+from resolwe.permissions.models import AccessControl
+
+
+class Command(BaseCommand):
+    """Rebuild access control list from object permissions."""
+
+    help = "Rebuild access control list from object permissions, i.e. after they were changed directly in database."
+
+    def handle(self, *args, **options):
+        """Call :func:`~resolwe.permissions.acl.rebuild_acl`."""
+        rebuild_acl()
+        self.stdout.write("Access control entries: {}".format(AccessControl.objects.count()))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Bits of permissions as defined when the migration was created.
+PERMISSION_BITS = [
+    ('view', 1),
+    ('edit', 2),
+    ('share', 4),
+    ('download', 8),
+    ('add', 16),
+    ('owner', 32),
+    ('change', 64),
+    ('delete', 128),
+]
+
+INSERT_SQL = """
+    INSERT INTO {acl} (content_type_id, object_id, {principal}, permissions)
+    SELECT * FROM (
+        SELECT
+            perm.content_type_id,
+            CAST(perm.object_pk AS bigint) AS object_id,
+            perm.{principal},
+            BIT_OR(CASE split_part(auth_perm.codename, '_', 1) {cases} ELSE 0 END) AS permissions
+        FROM {perms} AS perm
+        JOIN {auth_perms} AS auth_perm ON auth_perm.id = perm.permission_id
+        WHERE perm.object_pk ~ '^[0-9]{{1,18}}$'
+        GROUP BY perm.content_type_id, CAST(perm.object_pk AS bigint), perm.{principal}
+    ) AS acl
+    WHERE acl.permissions <> 0
+"""
+
+
+def build_acl(apps, schema_editor):
+    """Compute access control rows from existing object permissions."""
+    cases = ' '.join('WHEN %s THEN %s' for _ in PERMISSION_BITS)
+    case_params = [value for item in PERMISSION_BITS for value in item]
+
+    for perms_model, principal in (('UserObjectPermission', 'user_id'), ('GroupObjectPermission', 'group_id')):
+        sql = INSERT_SQL.format(
+            acl=apps.get_model('permissions', 'AccessControl')._meta.db_table,
+            perms=apps.get_model('guardian', perms_model)._meta.db_table,
+            auth_perms=apps.get_model('auth', 'Permission')._meta.db_table,
+            principal=principal,
+            cases=cases,
+        )
+        schema_editor.execute(sql, case_params)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0007_alter_validators_add_error_messages'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('guardian', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessControl',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.BigIntegerField()),
+                ('permissions', models.IntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='auth.Group')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='accesscontrol',
+            unique_together=set([('content_type', 'object_id', 'group'), ('content_type', 'object_id', 'user')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='accesscontrol',
+            index_together=set([('content_type', 'group', 'object_id'), ('content_type', 'user', 'object_id')]),
+        ),
+        migrations.RunPython(build_acl, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+""".. Ignore pydocstyle D400.
+
+==================
+Permissions Mixins
+==================
+
+.. autoclass:: resolwe.permissions.mixins.ResolwePrincipalMixin
+    :members:
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from .principal import cache_principal, clear_principal
+
+__all__ = ('ResolwePrincipalMixin',)
+
+
+class ResolwePrincipalMixin(object):
+    """Cache principal of the user while a request is processed.
+
+    Permission checks of the request reuse the same
+    :class:`~resolwe.permissions.principal.Principal`, which is removed
+    when the response is finalized.
+
+    """
+
+    def initial(self, request, *args, **kwargs):
+        """Cache principal of the authenticated user."""
+        super(ResolwePrincipalMixin, self).initial(request, *args, **kwargs)
+
+        self._principal_user = request.user  # pylint: disable=attribute-defined-outside-init
+        cache_principal(self._principal_user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Remove cached principal."""
+        user = getattr(self, '_principal_user', None)
+        if user is not None:
+            clear_principal(user)
+            self._principal_user = None  # pylint: disable=attribute-defined-outside-init
+
+        return super(ResolwePrincipalMixin, self).finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,76 @@
+""".. Ignore pydocstyle D400.
+
+==================
+Permissions Models
+==================
+
+.. autoclass:: resolwe.permissions.models.AccessControl
+    :members:
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+#: bits of permissions in access control lists by action in permission
+#: codename (i.e. ``view`` in ``view_data``)
+PERMISSION_BITS = OrderedDict([
+    ('view', 1),
+    ('edit', 2),
+    ('share', 4),
+    ('download', 8),
+    ('add', 16),
+    ('owner', 32),
+    ('change', 64),
+    ('delete', 128),
+])
+
+
+class AccessControl(models.Model):
+    """Permissions of a user or a group on an object.
+
+    Object permissions of ``django-guardian`` are denormalized to a
+    single row for each object and user or group, with primary key of
+    the object stored as integer and permissions stored as a bitmask
+    (see :data:`PERMISSION_BITS`), so objects can be filtered by
+    permissions with indexed lookups. Rows are maintained by
+    :mod:`resolwe.permissions.acl` and can be rebuilt with the
+    ``rebuild_acl`` management command.
+
+    """
+
+    class Meta:
+        """AccessControl Meta options."""
+
+        unique_together = (
+            ('content_type', 'object_id', 'user'),
+            ('content_type', 'object_id', 'group'),
+        )
+        index_together = (
+            ('content_type', 'user', 'object_id'),
+            ('content_type', 'group', 'object_id'),
+        )
+
+    #: content type of the object
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+
+    #: primary key of the object
+    object_id = models.BigIntegerField()
+
+    #: user with permissions (``None`` for group permissions)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.CASCADE)
+
+    #: group with permissions (``None`` for user permissions)
+    group = models.ForeignKey(Group, blank=True, null=True, on_delete=models.CASCADE)
+
+    #: bitmask of permissions
+    permissions = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Format model name."""
+        return '{}: {} {}'.format(self.content_type, self.object_id, self.user or self.group)
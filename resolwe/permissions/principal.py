@@ -0,0 +1,146 @@
+""".. Ignore pydocstyle D400.
+
+==========
+Principals
+==========
+
+Permission checks resolve the same facts about the user (ids of their
+groups, id of the anonymous user, global permissions) and about
+permissions (ids of permissions by codename) many times while a single
+request is processed. :class:`Principal` resolves each of them only
+once.
+
+While a request is processed by a viewset with
+:class:`~resolwe.permissions.mixins.ResolwePrincipalMixin`, the same
+principal is returned by :func:`get_principal` for the user of the
+request. Outside of requests a new principal is returned on each call,
+so changes of groups and permissions are always taken into account.
+
+.. autoclass:: Principal
+    :members:
+
+.. autofunction:: get_principal
+.. autofunction:: cache_principal
+.. autofunction:: clear_principal
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.utils.functional import cached_property
+
+from guardian.conf import settings as guardian_settings
+from guardian.utils import get_anonymous_user
+
+__all__ = ('Principal', 'get_principal', 'cache_principal', 'clear_principal')
+
+#: name of the user's attribute with the cached principal
+PRINCIPAL_ATTRIBUTE = '_resolwe_principal'
+
+
+class Principal(object):
+    """Facts about a user, which are needed by permission checks.
+
+    Anonymous users are represented by the anonymous user of
+    ``django-guardian``. Groups, global permissions and permissions by
+    codename are resolved when they are first needed.
+
+    """
+
+    def __init__(self, user):
+        """Initialize attributes."""
+        if user.is_anonymous():
+            user = get_anonymous_user()
+            self.anonymous_id = user.pk
+
+        #: user, whose permissions are checked
+        self.user = user
+
+        #: primary key of the user
+        self.user_id = user.pk
+
+        #: ``True`` if the user is a superuser
+        self.is_superuser = user.is_superuser
+
+        self._content_types = {}
+        self._permission_ids = {}
+
+    @cached_property
+    def anonymous_id(self):
+        """Primary key of the anonymous user."""
+        user_model = get_user_model()
+        return user_model.objects.values_list('pk', flat=True).get(**{
+            user_model.USERNAME_FIELD: guardian_settings.ANONYMOUS_USER_NAME,
+        })
+
+    @cached_property
+    def group_ids(self):
+        """Primary keys of groups of the user."""
+        return frozenset(self.user.groups.values_list('pk', flat=True))
+
+    @cached_property
+    def global_permissions(self):
+        """Full codenames (``<app_label>.<codename>``) of global permissions of the user."""
+        return frozenset(self.user.get_all_permissions())
+
+    def has_global_perm(self, perm):
+        """Check if the user has global permission ``perm``.
+
+        The result is the same as of ``user.has_perm(perm)``.
+
+        """
+        if self.user.is_active and self.is_superuser:
+            return True
+
+        return perm in self.global_permissions
+
+    def get_content_type(self, app_label, codename):
+        """Return content type of permission ``codename`` in app ``app_label``."""
+        key = (app_label, codename)
+        if key not in self._content_types:
+            self._content_types[key] = ContentType.objects.get(app_label=app_label, permission__codename=codename)
+
+        return self._content_types[key]
+
+    def get_permission_ids(self, content_type):
+        """Return dict mapping codenames of permissions of ``content_type`` to their ids."""
+        if content_type.pk not in self._permission_ids:
+            self._permission_ids[content_type.pk] = dict(
+                Permission.objects.filter(content_type=content_type).values_list('codename', 'pk')
+            )
+
+        return self._permission_ids[content_type.pk]
+
+
+def get_principal(user):
+    """Return principal of ``user``.
+
+    Principal cached with :func:`cache_principal` is returned if there
+    is one, otherwise a new principal is created.
+
+    """
+    principal = getattr(user, PRINCIPAL_ATTRIBUTE, None)
+    if principal is None:
+        principal = Principal(user)
+
+    return principal
+
+
+def cache_principal(user, principal=None):
+    """Cache principal of ``user`` until :func:`clear_principal` is called.
+
+    If ``principal`` is given, it is cached instead of a new one.
+
+    """
+    if principal is not None:
+        setattr(user, PRINCIPAL_ATTRIBUTE, principal)
+    elif getattr(user, PRINCIPAL_ATTRIBUTE, None) is None:
+        setattr(user, PRINCIPAL_ATTRIBUTE, Principal(user))
+
+
+def clear_principal(user):
+    """Remove cached principal of ``user``."""
+    if getattr(user, PRINCIPAL_ATTRIBUTE, None) is not None:
+        delattr(user, PRINCIPAL_ATTRIBUTE)
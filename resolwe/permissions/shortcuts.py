@@ -6,24 +6,31 @@ Permissions shortcuts
 
 .. autofunction:: _group_groups
 .. autofunction:: get_object_perms
+.. autofunction:: get_objects_perms
 
 """
 from __future__ import unicode_literals
 
+from collections import OrderedDict
 from itertools import chain, groupby
 
 import six
 
 from django.conf import settings
-from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Q
+from django.db import models
+from django.db.models import Count, F, Q
+from django.db.models.functions import Cast
 from django.shortcuts import _get_queryset
 
 from guardian.compat import get_user_model
 from guardian.exceptions import MixedContentTypeError, WrongAppError
-from guardian.shortcuts import get_groups_with_perms, get_perms, get_users_with_perms
-from guardian.utils import get_anonymous_user, get_group_obj_perms_model, get_identity, get_user_obj_perms_model
+from guardian.utils import get_group_obj_perms_model, get_identity, get_user_obj_perms_model
+
+from .acl import get_permission_mask
+from .models import PERMISSION_BITS, AccessControl
+from .principal import get_principal
 
 
 def _group_groups(perm_list):
@@ -137,70 +144,116 @@ def get_object_perms(obj, user=None):
     :rtype: list
 
     """
+    return get_objects_perms([obj], user)[obj.pk]
+
+
+def get_objects_perms(objects, user=None):
+    """Return permissions for all given objects in Resolwe specific format.
+
+    Permissions of each object are in the same format as returned by
+    :func:`get_object_perms`, but they are fetched with a fixed number
+    of queries regardless of the number of objects.
+
+    :param list objects: instances of the same Resolwe's DB model
+    :param user: Django user
+    :type user: :class:`~django.contrib.auth.models.User` or :data:`None`
+    :return: dict mapping objects' primary keys to lists of
+        permissions
+    :rtype: dict
+
+    """
+    objects = list(objects)
+    if not objects:
+        return {}
+
+    ctype = ContentType.objects.get_for_model(objects[0])
+    user_model = get_user_obj_perms_model(objects[0])
+    group_model = get_group_obj_perms_model(objects[0])
+    filters = {
+        'content_type': ctype,
+        'object_pk__in': [str(obj.pk) for obj in objects],
+    }
+
     def format_permissions(perms):
         """Remove model name from permission."""
-        ctype = ContentType.objects.get_for_model(obj)
         return [perm.replace('_{}'.format(ctype.name), '') for perm in perms]
 
-    perms_list = []
+    # Permissions are collected by object's primary key (as stored in
+    # permission tables) and by the type and id of the entity.
+    user_perms = {str(obj.pk): OrderedDict() for obj in objects}
+    group_perms = {str(obj.pk): OrderedDict() for obj in objects}
+    public_perms = {str(obj.pk): set() for obj in objects}
 
     if user:
-        if user.is_authenticated():
-            user_perms, group_perms = get_user_group_perms(user, obj)
-        else:
-            user_perms, group_perms = [], []
-
-        if user_perms != []:
-            perms_list.append({
-                'type': 'user',
-                'id': user.pk,
-                'name': user.get_full_name() or user.username,
-                'permissions': format_permissions(user_perms),
-            })
+        principal = get_principal(user)
+        public_filters = {'user_id': principal.anonymous_id}
+        public_group_filters = {'group__user': principal.anonymous_id}
+
+        if user.is_authenticated() and user.is_active:
+            name = user.get_full_name() or user.username
+            if principal.is_superuser:
+                codenames = sorted(principal.get_permission_ids(ctype))
+                for object_pk in user_perms:
+                    user_perms[object_pk][user.pk] = (name, codenames)
+            else:
+                rows = user_model.objects.filter(user_id=principal.user_id, **filters).order_by('permission__codename')
+                for object_pk, codename in rows.values_list('object_pk', 'permission__codename'):
+                    user_perms[object_pk].setdefault(user.pk, (name, []))[1].append(codename)
 
-        if group_perms != []:
-            for group_id, group_name, perms in group_perms:
+            groups = group_model.objects.filter(group_id__in=list(principal.group_ids), **filters)
+        else:
+            groups = group_model.objects.none()
+    else:
+        public_filters = {'user__username': settings.ANONYMOUS_USER_NAME}
+        public_group_filters = {'group__user__username': settings.ANONYMOUS_USER_NAME}
+
+        rows = user_model.objects.filter(**filters).exclude(user__username=settings.ANONYMOUS_USER_NAME)
+        rows = rows.select_related('user', 'permission').order_by('user_id', 'permission__codename')
+        for row in rows:
+            name = row.user.get_full_name() or row.user.username
+            user_perms[row.object_pk].setdefault(row.user_id, (name, []))[1].append(row.permission.codename)
+
+        groups = group_model.objects.filter(**filters)
+
+    groups = groups.order_by('group_id', 'permission__codename')
+    for object_pk, group_id, group_name, codename in groups.values_list(
+            'object_pk', 'group_id', 'group__name', 'permission__codename'):
+        group_perms[object_pk].setdefault(group_id, (group_name, []))[1].append(codename)
+
+    # Public permissions are permissions of the anonymous user and of
+    # the groups he belongs to.
+    rows = user_model.objects.filter(**filters).filter(**public_filters)
+    group_rows = group_model.objects.filter(**filters).filter(**public_group_filters)
+    public_perms_rows = chain(
+        rows.values_list('object_pk', 'permission__codename'),
+        group_rows.values_list('object_pk', 'permission__codename'),
+    )
+    for object_pk, codename in public_perms_rows:
+        public_perms[object_pk].add(codename)
+
+    result = {}
+    for obj in objects:
+        object_pk = str(obj.pk)
+        perms_list = []
+
+        for entity_type, entity_perms in [('user', user_perms), ('group', group_perms)]:
+            for entity_id, (name, perms) in six.iteritems(entity_perms[object_pk]):
                 perms_list.append({
-                    'type': 'group',
-                    'id': group_id,
-                    'name': group_name,
+                    'type': entity_type,
+                    'id': entity_id,
+                    'name': name,
                     'permissions': format_permissions(perms),
                 })
-    else:
-        user_options = {
-            'attach_perms': True,
-            'with_group_users': False
-        }
-        for user, perms in six.iteritems(get_users_with_perms(obj, **user_options)):
-            if user.username == settings.ANONYMOUS_USER_NAME:
-                # public user is treated separately
-                continue
-            perms_list.append({
-                'type': 'user',
-                'id': user.pk,
-                'name': user.get_full_name() or user.username,
-                'permissions': format_permissions(perms),
-            })
 
-        group_options = {
-            'attach_perms': True,
-        }
-        for group, perms in six.iteritems(get_groups_with_perms(obj, **group_options)):
+        if public_perms[object_pk]:
             perms_list.append({
-                'type': 'group',
-                'id': group.pk,
-                'name': group.name,
-                'permissions': format_permissions(perms),
+                'type': 'public',
+                'permissions': format_permissions(sorted(public_perms[object_pk])),
             })
 
-    public_perms = get_perms(AnonymousUser(), obj)
-    if public_perms != []:
-        perms_list.append({
-            'type': 'public',
-            'permissions': format_permissions(public_perms),
-        })
+        result[obj.pk] = perms_list
 
-    return perms_list
+    return result
 
 
 # based on guardian.shortcuts.get_objects_for_user
@@ -210,6 +263,10 @@ def get_objects_for_user(user, perms, klass=None, use_groups=True, any_perm=Fals
     if isinstance(perms, six.string_types):
         perms = [perms]
 
+    # Anonymous user is replaced with the anonymous user of
+    # django-guardian by the principal.
+    principal = get_principal(user)
+
     ctype = None
     app_label = None
     codenames = set()
@@ -229,8 +286,7 @@ def get_objects_for_user(user, perms, klass=None, use_groups=True, any_perm=Fals
         codenames.add(codename)
 
         if app_label is not None:
-            new_ctype = ContentType.objects.get(app_label=app_label,
-                                                permission__codename=codename)
+            new_ctype = principal.get_content_type(app_label, codename)
             if ctype is not None and ctype != new_ctype:
                 raise MixedContentTypeError(
                     "ContentType was once computed to be {} and another "
@@ -257,21 +313,15 @@ def get_objects_for_user(user, perms, klass=None, use_groups=True, any_perm=Fals
     # we should also have `codenames` list
 
     # First check if user is superuser and if so, return queryset immediately
-    if with_superuser and user.is_superuser:
+    if with_superuser and principal.is_superuser:
         return queryset
 
-    # Check if the user is anonymous. The
-    # django.contrib.auth.models.AnonymousUser object doesn't work for queries
-    # and it's nice to be able to pass in request.user blindly.
-    if user.is_anonymous():
-        user = get_anonymous_user()
-
     global_perms = set()
     has_global_perms = False
     # a superuser has by default assigned global perms for any
     if accept_global_perms and with_superuser:
         for code in codenames:
-            if user.has_perm(ctype.app_label + '.' + code):
+            if principal.has_global_perm(ctype.app_label + '.' + code):
                 global_perms.add(code)
         for code in global_perms:
             codenames.remove(code)
@@ -297,66 +347,129 @@ def get_objects_for_user(user, perms, klass=None, use_groups=True, any_perm=Fals
         elif len(global_perms) > 0 and (len(codenames) > 0):
             has_global_perms = True
 
-    # Now we should extract list of pk values for which we would filter
-    # queryset
+    model = ctype.model_class()
     user_model = get_user_obj_perms_model(queryset.model)
-    user_obj_perms_queryset = (user_model.objects
-                               .filter(user=user)
-                               .filter(permission__content_type=ctype))
-
+    group_model = get_group_obj_perms_model(queryset.model)
+
+    mask = get_permission_mask(codenames)
+    if (mask and isinstance(model._meta.pk, models.AutoField) and  # pylint: disable=protected-access
+            user_model.objects.is_generic() and group_model.objects.is_generic()):
+        return queryset.filter(_get_acl_query(
+            ctype, principal, mask, perms_filter, use_groups=use_groups,
+            all_perms=not any_perm and len(codenames) > 1,
+            combine_groups=not any_perm and not has_global_perms,
+        ))
+
+    # Objects are filtered with subqueries of primary keys in permission
+    # tables, so primary keys are never fetched from the database.
+    # Permissions are matched by their ids, so permission table is not
+    # joined.
+    permission_ids = principal.get_permission_ids(ctype)
     if len(codenames):
-        user_obj_perms_queryset = user_obj_perms_queryset.filter(
-            permission__codename__in=codenames)
-    direct_fields = ['content_object__pk', 'permission__codename']
-    generic_fields = ['object_pk', 'permission__codename']
-    if user_model.objects.is_generic():
-        user_fields = generic_fields
-    else:
-        user_fields = direct_fields
+        permission_ids = {codename: permission_ids.get(codename) for codename in codenames}
+
+    user_obj_perms_queryset = _annotate_object_pk(
+        user_model.objects.filter(user_id=principal.user_id, permission_id__in=list(permission_ids.values())),
+        user_model, model
+    )
 
     if use_groups:
-        group_model = get_group_obj_perms_model(queryset.model)
-        group_filters = {
-            'permission__content_type': ctype,
-            'group__{}'.format(get_user_model().groups.field.related_query_name()): user,  # pylint: disable=no-member
-        }
-        if len(codenames):
-            group_filters.update({
-                'permission__codename__in': codenames,
-            })
-        groups_obj_perms_queryset = group_model.objects.filter(**group_filters)
-        if group_model.objects.is_generic():
-            group_fields = generic_fields
-        else:
-            group_fields = direct_fields
+        groups_obj_perms_queryset = _annotate_object_pk(
+            group_model.objects.filter(
+                group_id__in=list(principal.group_ids), permission_id__in=list(permission_ids.values())
+            ),
+            group_model, model
+        )
         if not any_perm and len(codenames) and not has_global_perms:
-            user_obj_perms = user_obj_perms_queryset.values_list(*user_fields)
-            groups_obj_perms = groups_obj_perms_queryset.values_list(*group_fields)
-            data = list(user_obj_perms) + list(groups_obj_perms)
-            # sorting/grouping by pk (first in result tuple)
-            data = sorted(data, key=lambda t: t[0])
-            pk_list = []
-            for pk, group in groupby(data, lambda t: t[0]):
-                obj_codenames = set((e[1] for e in group))
-                if codenames.issubset(obj_codenames):
-                    pk_list.append(pk)
-            objects = queryset.filter(**{perms_filter: pk_list})
-            return objects
+            # Each permission can be given to the user or to any of
+            # their groups.
+            query = Q()
+            for permission_id in permission_ids.values():
+                query &= (
+                    Q(**{perms_filter: _object_pks(user_obj_perms_queryset.filter(permission_id=permission_id))}) |
+                    Q(**{perms_filter: _object_pks(groups_obj_perms_queryset.filter(permission_id=permission_id))})
+                )
+            return queryset.filter(query)
 
     if not any_perm and len(codenames) > 1:
-        counts = user_obj_perms_queryset.values(
-            user_fields[0]).annotate(object_pk_count=Count(user_fields[0]))
-        user_obj_perms_queryset = counts.filter(
-            object_pk_count__gte=len(codenames))
-
-    values = user_obj_perms_queryset.values_list(user_fields[0], flat=True)
-    if user_model.objects.is_generic():
-        values = list(values)
-    query = Q(**{perms_filter: values})
+        user_obj_perms_queryset = user_obj_perms_queryset.values('object_pk_value').annotate(
+            object_pk_count=Count('object_pk_value')
+        ).filter(object_pk_count__gte=len(codenames))
+
+    query = Q(**{perms_filter: _object_pks(user_obj_perms_queryset)})
     if use_groups:
-        values = groups_obj_perms_queryset.values_list(group_fields[0], flat=True)
-        if group_model.objects.is_generic():
-            values = list(values)
-        query |= Q(**{perms_filter: values})
+        query |= Q(**{perms_filter: _object_pks(groups_obj_perms_queryset)})
 
     return queryset.filter(query)
+
+
+def _get_acl_object_ids(acl_queryset, mask, all_perms):
+    """Return subquery of ids of objects with any or all permissions in ``mask``."""
+    acl_queryset = acl_queryset.annotate(masked_permissions=F('permissions').bitand(mask))
+    if all_perms:
+        acl_queryset = acl_queryset.filter(masked_permissions=mask)
+    else:
+        acl_queryset = acl_queryset.filter(masked_permissions__gt=0)
+
+    return acl_queryset.values('object_id')
+
+
+def _get_acl_query(ctype, principal, mask, perms_filter, use_groups, all_perms, combine_groups):
+    """Return filter of objects with permissions in ``mask`` in access control list.
+
+    If ``all_perms`` is set, the user must have all permissions, and if
+    ``combine_groups`` is set as well, each of them can be given to the
+    user or any of their groups. Otherwise any of the permissions is
+    sufficient.
+
+    """
+    user_acl = AccessControl.objects.filter(content_type=ctype, user_id=principal.user_id)
+    if not use_groups:
+        return Q(**{perms_filter: _get_acl_object_ids(user_acl, mask, all_perms)})
+
+    group_ids = list(principal.group_ids)
+    group_acl = AccessControl.objects.filter(content_type=ctype, group_id__in=group_ids)
+    if all_perms and combine_groups:
+        principal_acl = AccessControl.objects.filter(
+            Q(user_id=principal.user_id) | Q(group_id__in=group_ids), content_type=ctype
+        )
+        query = Q()
+        for bit in PERMISSION_BITS.values():
+            if mask & bit:
+                query &= Q(**{perms_filter: _get_acl_object_ids(principal_acl, bit, True)})
+        return query
+
+    return (
+        Q(**{perms_filter: _get_acl_object_ids(user_acl, mask, all_perms)}) |
+        Q(**{perms_filter: _get_acl_object_ids(group_acl, mask, False)})
+    )
+
+
+def _get_pk_cast_field(model):
+    """Return field to which ``object_pk`` is cast to match primary key of ``model``."""
+    pk_field = model._meta.pk  # pylint: disable=protected-access
+    if isinstance(pk_field, models.BigAutoField):
+        return models.BigIntegerField()
+    if isinstance(pk_field, models.AutoField):
+        return models.IntegerField()
+    return pk_field
+
+
+def _annotate_object_pk(obj_perms_queryset, obj_perms_model, model):
+    """Annotate ``obj_perms_queryset`` with primary keys of objects.
+
+    Generic object permissions store primary keys as text, so they are
+    cast to the type of primary key of ``model`` in the database.
+
+    """
+    if obj_perms_model.objects.is_generic():
+        value = Cast('object_pk', _get_pk_cast_field(model))
+    else:
+        value = F('content_object')
+
+    return obj_perms_queryset.annotate(object_pk_value=value)
+
+
+def _object_pks(obj_perms_queryset):
+    """Return subquery of primary keys of objects in ``obj_perms_queryset``."""
+    return obj_perms_queryset.values('object_pk_value')
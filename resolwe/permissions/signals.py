@@ -0,0 +1,22 @@
+""".. Ignore pydocstyle D400.
+
+===================
+Permissions Signals
+===================
+
+.. data:: permissions_changed
+
+    Sent after permissions of objects were changed and their access
+    control lists were updated, both for single permissions and for
+    bulk operations that don't send signals for individual object
+    permissions. Changes of single permissions are collected and the
+    signal is sent once per model when the transaction is committed.
+    ``sender`` is the model class and ``instances`` is the list of
+    objects whose permissions were changed.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.dispatch import Signal
+
+permissions_changed = Signal(providing_args=['instances'])  # pylint: disable=invalid-name
@@ -0,0 +1,168 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import transaction
+from django.utils.six import StringIO
+
+from guardian.shortcuts import assign_perm, remove_perm
+
+from resolwe.flow.models import Process
+from resolwe.permissions.acl import get_permission_mask, rebuild_acl
+from resolwe.permissions.models import PERMISSION_BITS, AccessControl
+from resolwe.permissions.shortcuts import get_objects_for_user
+from resolwe.permissions.signals import permissions_changed
+from resolwe.permissions.utils import bulk_assign_perm, bulk_remove_perm
+from resolwe.test import TestCase, TransactionTestCase
+
+
+class AccessControlTestCase(TestCase):
+    def setUp(self):
+        super(AccessControlTestCase, self).setUp()
+
+        self.ctype = ContentType.objects.get_for_model(Process)
+        self.processes = [
+            Process.objects.create(name='Process {}'.format(index), contributor=self.contributor)
+            for index in range(3)
+        ]
+
+    def get_acl(self):
+        return {
+            (acl.object_id, acl.user_id, acl.group_id): acl.permissions
+            for acl in AccessControl.objects.filter(content_type=self.ctype)
+        }
+
+    def test_permission_mask(self):
+        mask = get_permission_mask(['view_data', 'edit_data'])
+        self.assertEqual(mask, PERMISSION_BITS['view'] | PERMISSION_BITS['edit'])
+        self.assertEqual(get_permission_mask([]), 0)
+        self.assertIsNone(get_permission_mask(['view_data', 'unknown_data']))
+
+    def test_assign_remove(self):
+        process = self.processes[0]
+        assign_perm('view_process', self.user, process)
+        assign_perm('share_process', self.user, process)
+        assign_perm('view_process', self.group, process)
+        self.assertEqual(self.get_acl(), {
+            (process.pk, self.user.pk, None): PERMISSION_BITS['view'] | PERMISSION_BITS['share'],
+            (process.pk, None, self.group.pk): PERMISSION_BITS['view'],
+        })
+
+        remove_perm('view_process', self.user, process)
+        remove_perm('view_process', self.group, process)
+        self.assertEqual(self.get_acl(), {(process.pk, self.user.pk, None): PERMISSION_BITS['share']})
+
+    def test_bulk_perms(self):
+        bulk_assign_perm(['view_process', 'edit_process'], self.user, self.processes[:2])
+        self.assertEqual(self.get_acl(), {
+            (process.pk, self.user.pk, None): PERMISSION_BITS['view'] | PERMISSION_BITS['edit']
+            for process in self.processes[:2]
+        })
+
+        bulk_remove_perm(['edit_process'], self.user, self.processes)
+        self.assertEqual(self.get_acl(), {
+            (process.pk, self.user.pk, None): PERMISSION_BITS['view']
+            for process in self.processes[:2]
+        })
+
+    def test_rebuild(self):
+        assign_perm('view_process', self.user, self.processes[0])
+        assign_perm('edit_process', self.group, self.processes[1])
+        acl = self.get_acl()
+
+        AccessControl.objects.all().delete()
+        rebuild_acl()
+        self.assertEqual(self.get_acl(), acl)
+
+        AccessControl.objects.all().delete()
+        output = StringIO()
+        call_command('rebuild_acl', stdout=output)
+        self.assertEqual(self.get_acl(), acl)
+        self.assertIn('Access control entries: ', output.getvalue())
+
+    def test_get_objects_for_user(self):
+        self.user.groups.add(self.group)
+        assign_perm('view_process', self.user, self.processes[0])
+        assign_perm('edit_process', self.user, self.processes[0])
+        assign_perm('view_process', self.user, self.processes[1])
+        assign_perm('edit_process', self.group, self.processes[1])
+        assign_perm('edit_process', self.group, self.processes[2])
+
+        objects = get_objects_for_user(self.user, ['view_process', 'edit_process'], Process)
+        self.assertIn(AccessControl._meta.db_table, str(objects.query))  # pylint: disable=protected-access
+        self.assertEqual(set(objects), set(self.processes[:2]))
+
+        objects = get_objects_for_user(self.user, ['view_process', 'edit_process'], Process, use_groups=False)
+        self.assertEqual(set(objects), {self.processes[0]})
+
+        objects = get_objects_for_user(self.user, ['view_process', 'edit_process'], Process, any_perm=True)
+        self.assertEqual(set(objects), set(self.processes))
+
+        objects = get_objects_for_user(self.user, 'edit_process', Process)
+        self.assertEqual(set(objects), set(self.processes))
+
+
+class PermissionsChangedTestCase(TransactionTestCase):
+    def setUp(self):
+        super(PermissionsChangedTestCase, self).setUp()
+
+        self.ctype = ContentType.objects.get_for_model(Process)
+        self.processes = [
+            Process.objects.create(name='Process {}'.format(index), contributor=self.contributor)
+            for index in range(2)
+        ]
+
+        self.acl_in_signal = []
+        permissions_changed.connect(self.receiver)
+        self.addCleanup(permissions_changed.disconnect, self.receiver)
+
+    def receiver(self, sender, instances, **kwargs):
+        acl = {
+            (acl.object_id, acl.user_id, acl.group_id): acl.permissions
+            for acl in AccessControl.objects.filter(content_type=self.ctype)
+        }
+        self.acl_in_signal.append((sender, instances, acl))
+
+    def test_permissions_changed(self):
+        process = self.processes[0]
+
+        # Signal is sent after access control list is updated.
+        assign_perm('view_process', self.user, process)
+        self.assertEqual(self.acl_in_signal, [
+            (Process, [process], {(process.pk, self.user.pk, None): PERMISSION_BITS['view']}),
+        ])
+
+        remove_perm('view_process', self.user, process)
+        self.assertEqual(self.acl_in_signal[1], (Process, [process], {}))
+
+    def test_once_per_transaction(self):
+        registered = []
+
+        def on_commit(func):
+            # Callbacks must not be referenced after they are discarded.
+            registered.append(type(func).__name__)
+            transaction.on_commit(func)
+
+        with mock.patch('resolwe.permissions.handlers.transaction', mock.Mock(
+                on_commit=on_commit, get_connection=transaction.get_connection)), \
+                transaction.atomic():
+            for process in self.processes:
+                for codename in ['view_process', 'edit_process', 'share_process']:
+                    assign_perm(codename, self.user, process)
+            # Signal is sent on commit.
+            self.assertEqual(self.acl_in_signal, [])
+
+        self.assertEqual(len(registered), 1)
+        self.assertEqual(len(self.acl_in_signal), 1)
+        self.assertEqual(self.acl_in_signal[0][:2], (Process, self.processes))
+
+        # Signal discarded on rollback doesn't prevent later ones.
+        with self.assertRaises(ValueError), transaction.atomic():
+            remove_perm('view_process', self.user, self.processes[0])
+            raise ValueError
+        remove_perm('edit_process', self.user, self.processes[0])
+        self.assertEqual(len(self.acl_in_signal), 2)
+        self.assertEqual(self.acl_in_signal[1][:2], (Process, [self.processes[0]]))
@@ -0,0 +1,93 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import time
+import unittest
+
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from guardian.models import UserObjectPermission
+
+from resolwe.permissions.acl import rebuild_acl
+from resolwe.permissions.shortcuts import get_objects_for_user
+from resolwe.test import TestCase
+
+#: number of objects created in a single query
+BATCH_SIZE = 10000
+
+#: number of objects in a page of list responses
+PAGE_SIZE = 100
+
+
+def get_objects_materialized(user, permission, queryset):
+    """Filter objects with a list of primary keys fetched from the database."""
+    pks = UserObjectPermission.objects.filter(user=user, permission=permission).values_list('object_pk', flat=True)
+    return queryset.filter(pk__in=list(pks))
+
+
+@unittest.skipUnless(os.environ.get('RESOLWE_BENCHMARK', False), "Set RESOLWE_BENCHMARK to run benchmarks.")
+class GetObjectsForUserBenchmark(TestCase):
+
+    def setUp(self):
+        super(GetObjectsForUserBenchmark, self).setUp()
+
+        self.ctype = ContentType.objects.get_for_model(Group)
+        self.permission = Permission.objects.get(content_type=self.ctype, codename='change_group')
+
+    def create_permissions(self, count):
+        # Only every other object is visible to the user.
+        for start in range(0, 2 * count, BATCH_SIZE):
+            groups = Group.objects.bulk_create([
+                Group(name='benchmark-{}'.format(index)) for index in range(start, min(start + BATCH_SIZE, 2 * count))
+            ])
+            # Primary keys are not set by bulk create in Django 1.10.
+            pks = Group.objects.filter(
+                name__in=[group.name for group in groups]
+            ).order_by('pk').values_list('pk', flat=True)
+
+            UserObjectPermission.objects.bulk_create([
+                UserObjectPermission(user=self.user, permission=self.permission, content_type=self.ctype,
+                                     object_pk=str(pk))
+                for pk in pks[::2]
+            ])
+
+        # Permissions were created without signals.
+        rebuild_acl()
+
+    def measure(self, get_objects):
+        start = time.time()
+        count = get_objects(self.user, self.permission, Group.objects.all()).count()
+        count_time = time.time() - start
+
+        start = time.time()
+        list(get_objects(self.user, self.permission, Group.objects.order_by('pk'))[:PAGE_SIZE])
+        page_time = time.time() - start
+
+        return count, count_time, page_time
+
+    def run_benchmark(self, count):
+        self.create_permissions(count)
+
+        results = [
+            ('access control list', self.measure(
+                lambda user, permission, queryset: get_objects_for_user(user, 'auth.change_group', queryset)
+            )),
+            ('primary key lists', self.measure(get_objects_materialized)),
+        ]
+
+        print()
+        print("Objects visible with {} permissions:".format(count))
+        for name, (objects, count_time, page_time) in results:
+            self.assertEqual(objects, count)
+            print("    {:<20} count: {:.4f} s, first page: {:.4f} s".format(name, count_time, page_time))
+
+    def test_10k_permissions(self):
+        self.run_benchmark(10 ** 4)
+
+    def test_100k_permissions(self):
+        self.run_benchmark(10 ** 5)
+
+    def test_1m_permissions(self):
+        self.run_benchmark(10 ** 6)
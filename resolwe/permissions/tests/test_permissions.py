@@ -9,6 +9,7 @@ from django.contrib.auth.models import Group
 from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.shortcuts import assign_perm
 from rest_framework import exceptions, status
+from rest_framework.test import force_authenticate
 
 from resolwe.flow.models import Collection
 from resolwe.flow.views import CollectionViewSet, ResolwePermissionsMixin
@@ -140,6 +141,68 @@ class CollectionPermissionsTestCase(ResolweAPITestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
         self.assertEqual(UserObjectPermission.objects.filter(user=self.user2).count(), 0)
 
+    def test_list_permissions(self):
+        collection2 = Collection.objects.create(contributor=self.user1, name="Test collection 2")
+        collection3 = Collection.objects.create(contributor=self.user1, name="Test collection 3")
+        for collection in [self.collection, collection2]:
+            assign_perm("view_collection", self.user1, collection)
+            assign_perm("share_collection", self.user1, collection)
+        assign_perm("view_collection", self.user1, collection3)
+
+        list_permissions = CollectionViewSet.as_view({'get': 'list_permissions', 'post': 'list_permissions'})
+
+        def post(data):
+            request = self.factory.post('/', data=data, format='json')
+            force_authenticate(request, self.user1)
+            return list_permissions(request)
+
+        data = {
+            'ids': [self.collection.pk, collection2.pk],
+            'users': {'add': {self.user2.pk: ['view', 'edit']}},
+            'groups': {'add': {self.group.pk: ['view']}},
+            'public': {'add': ['view']},
+        }
+        resp = post(data)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in resp.data], [self.collection.pk, collection2.pk])
+        self.assertEqual(UserObjectPermission.objects.filter(user=self.user2).count(), 4)
+        self.assertEqual(GroupObjectPermission.objects.count(), 2)
+        self.assertEqual(UserObjectPermission.objects.filter(user=self.public).count(), 2)
+
+        data = {
+            'ids': [self.collection.pk, collection2.pk],
+            'users': {'remove': {self.user2.pk: ['edit']}},
+            'groups': {'remove': {self.group.pk: ['view']}},
+        }
+        resp = post(data)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(UserObjectPermission.objects.filter(user=self.user2).count(), 2)
+        self.assertEqual(GroupObjectPermission.objects.count(), 0)
+
+        request = self.factory.get('/', {'ids': '{},{}'.format(self.collection.pk, collection2.pk)}, format='json')
+        force_authenticate(request, self.user1)
+        resp = list_permissions(request)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.data), 2)
+        user2_perms = [perm for perm in resp.data[0]['permissions'] if perm.get('id') == self.user2.pk]
+        self.assertEqual(user2_perms[0]['permissions'], ['view'])
+
+        # Share permission is required on all objects.
+        resp = post({'ids': [self.collection.pk, collection3.pk], 'users': {'add': {self.user2.pk: ['edit']}}})
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(UserObjectPermission.objects.filter(user=self.user2).count(), 2)
+
+        # Only owners can grant owner permission.
+        resp = post({'ids': [self.collection.pk], 'users': {'add': {self.user2.pk: ['owner']}}})
+        self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
+
+        # All objects must exist.
+        resp = post({'ids': [self.collection.pk, 0], 'users': {'add': {self.user2.pk: ['edit']}}})
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+        resp = post({'ids': 'invalid'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class PermissionsMixinTestCase(TestCase):
     def setUp(self):
@@ -0,0 +1,93 @@
+# pylint: disable=missing-docstring
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.contrib.contenttypes.models import ContentType
+
+from guardian.shortcuts import assign_perm
+from guardian.utils import get_anonymous_user
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from resolwe.flow.models import Process
+from resolwe.flow.views import ProcessViewSet
+from resolwe.permissions.principal import PRINCIPAL_ATTRIBUTE, cache_principal, clear_principal, get_principal
+from resolwe.permissions.shortcuts import get_objects_for_user
+from resolwe.test import TestCase
+
+factory = APIRequestFactory()  # pylint: disable=invalid-name
+
+
+class PrincipalTestCase(TestCase):
+    def setUp(self):
+        super(PrincipalTestCase, self).setUp()
+
+        self.ctype = ContentType.objects.get_for_model(Process)
+        self.process = Process.objects.create(name='Test process', contributor=self.contributor)
+
+    def test_principal(self):
+        principal = get_principal(self.user)
+        self.assertEqual(principal.user_id, self.user.pk)
+        self.assertEqual(principal.group_ids, {self.group.pk})
+        self.assertEqual(principal.anonymous_id, get_anonymous_user().pk)
+        self.assertFalse(principal.is_superuser)
+        self.assertTrue(get_principal(self.admin).is_superuser)
+
+        principal = get_principal(AnonymousUser())
+        self.assertEqual(principal.user_id, get_anonymous_user().pk)
+        self.assertEqual(principal.anonymous_id, principal.user_id)
+
+    def test_permissions(self):
+        principal = get_principal(self.user)
+        permission_ids = principal.get_permission_ids(self.ctype)
+        self.assertEqual(
+            permission_ids['view_process'],
+            Permission.objects.get(content_type=self.ctype, codename='view_process').pk
+        )
+        self.assertEqual(principal.get_content_type('flow', 'view_process'), self.ctype)
+
+        self.assertFalse(principal.has_global_perm('flow.view_process'))
+        self.assertTrue(get_principal(self.admin).has_global_perm('flow.view_process'))
+
+        with self.assertNumQueries(0):
+            principal.get_permission_ids(self.ctype)
+            principal.get_content_type('flow', 'view_process')
+            principal.has_global_perm('flow.view_process')
+
+    def test_cache(self):
+        self.assertIsNot(get_principal(self.user), get_principal(self.user))
+
+        cache_principal(self.user)
+        principal = get_principal(self.user)
+        self.assertIs(get_principal(self.user), principal)
+
+        clear_principal(self.user)
+        self.assertFalse(hasattr(self.user, PRINCIPAL_ATTRIBUTE))
+        self.assertIsNot(get_principal(self.user), principal)
+
+    def test_get_objects_for_user_queries(self):
+        assign_perm('view_process', self.group, self.process)
+
+        cache_principal(self.user)
+        self.assertEqual(list(get_objects_for_user(self.user, 'flow.view_process', Process)), [self.process])
+
+        # Groups and permissions of the user are not fetched again.
+        with self.assertNumQueries(1):
+            self.assertEqual(list(get_objects_for_user(self.user, 'flow.view_process', Process)), [self.process])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(get_objects_for_user(self.user, ['view_process'], Process, use_groups=False)), [])
+
+        clear_principal(self.user)
+
+    def test_viewset(self):
+        assign_perm('view_process', self.user, self.process)
+
+        request = factory.get('/', format='json')
+        force_authenticate(request, self.user)
+        response = ProcessViewSet.as_view(actions={'get': 'list'})(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([process['id'] for process in response.data], [self.process.pk])
+
+        # Principal is only cached while the request is processed.
+        self.assertFalse(hasattr(self.user, PRINCIPAL_ATTRIBUTE))
@@ -16,7 +16,9 @@ from rest_framework.test import APIRequestFactory, force_authenticate
 
 from resolwe.flow.models import Collection, Data, Process, Storage
 from resolwe.flow.views import StorageViewSet
-from resolwe.permissions.shortcuts import get_object_perms, get_objects_for_user, get_user_group_perms
+from resolwe.permissions.shortcuts import (
+    get_object_perms, get_objects_for_user, get_objects_perms, get_user_group_perms,
+)
 from resolwe.test import TestCase
 
 factory = APIRequestFactory()  # pylint: disable=invalid-name
@@ -181,6 +183,35 @@ class ObjectPermsTestCase(TestCase):
         perms = get_object_perms(self.collection, self.user1)
         six.assertCountEqual(self, self._sort_perms(expected_perms), self._sort_perms(perms))
 
+    def test_objects_permissions(self):
+        collection2 = Collection.objects.create(contributor=self.user1, name="Test collection 2")
+        collections = [self.collection, collection2]
+
+        self.group1.user_set.add(self.user1)
+        assign_perm("view_collection", self.user1, self.collection)
+        assign_perm("edit_collection", self.user2, collection2)
+        assign_perm("view_collection", self.group1, collection2)
+        assign_perm("view_collection", self.anonymous, self.collection)
+
+        superuser = get_user_model().objects.create(username="superuser", is_superuser=True)
+
+        # Content type is cached after the first use.
+        ContentType.objects.get_for_model(Collection)
+        for user in [None, self.user1, self.user2, superuser]:
+            # One additional query is needed for all permissions of
+            # superuser.
+            with self.assertNumQueries(5 if user and user.is_superuser else 4):
+                perms = get_objects_perms(collections, user)
+
+            for collection in collections:
+                six.assertCountEqual(
+                    self,
+                    self._sort_perms(perms[collection.pk]),
+                    self._sort_perms(get_object_perms(collection, user)),
+                )
+
+        self.assertEqual(get_objects_perms([]), {})
+
 
 class StoragePermsTestCase(TestCase):
 
@@ -193,24 +224,24 @@ class StoragePermsTestCase(TestCase):
 
         self.storage1 = Storage.objects.create(
             name='Test storage',
-            json={},
-            data=self.data,
+            json={'id': 1},
             contributor=self.contributor,
         )
+        self.storage1.data.add(self.data)
 
         self.storage2 = Storage.objects.create(
             name='Test storage 2',
-            json={},
-            data=self.data,
+            json={'id': 2},
             contributor=self.contributor,
         )
+        self.storage2.data.add(self.data)
 
-        Storage.objects.create(
+        dummy_storage = Storage.objects.create(
             name='Dummy storage',
-            json={},
-            data=dummy_data,
+            json={'id': 3},
             contributor=self.contributor,
         )
+        dummy_storage.data.add(dummy_data)
 
         self.user = get_user_model().objects.create(username="test_user")
         self.group = Group.objects.create(name="test_group")
@@ -239,6 +270,18 @@ class StoragePermsTestCase(TestCase):
         resp = self.storage_list_viewset(request)
         self.assertEqual(len(resp.data), 0)
 
+    def test_shared_storage(self):
+        data = Data.objects.create(name='Test data 2', contributor=self.contributor, process=self.data.process)
+        self.storage1.data.add(data)
+        assign_perm("view_data", self.user, self.data)
+        assign_perm("view_data", self.user, data)
+
+        request = factory.get('/', content_type='application/json')
+        force_authenticate(request, self.user)
+        resp = self.storage_list_viewset(request)
+        six.assertCountEqual(self, [storage['id'] for storage in resp.data],
+                             [self.storage1.pk, self.storage2.pk])
+
     def test_detail_permissons(self):
         request = factory.get('/', content_type='application/json')
         force_authenticate(request, self.user)
@@ -462,6 +505,30 @@ class GetObjectsForUser(TestCase):
             set(objects.values_list('id', flat=True)),
             set(ctypes[i].id for i in [0, 1, 3, 4]))
 
+    def test_permissions_subqueries(self):
+        groups = [Group.objects.create(name='group{}'.format(index)) for index in range(3)]
+        self.contributor.groups.add(self.group)
+        assign_perm('auth.change_group', self.contributor, groups[0])
+        assign_perm('auth.change_group', self.contributor, groups[1])
+        assign_perm('auth.delete_group', self.contributor, groups[1])
+        assign_perm('auth.delete_group', self.group, groups[0])
+        assign_perm('auth.delete_group', self.group, groups[2])
+
+        objects = get_objects_for_user(self.contributor, ['change_group', 'delete_group'], Group)
+        any_objects = get_objects_for_user(self.contributor, ['change_group', 'delete_group'], Group, any_perm=True)
+        user_objects = get_objects_for_user(self.contributor, ['change_group', 'delete_group'], Group,
+                                            use_groups=False)
+
+        # Objects are filtered with subqueries of access control list
+        # instead of lists of primary keys.
+        for queryset in (objects, any_objects, user_objects):
+            self.assertIn('permissions_accesscontrol', str(queryset.query))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(set(objects), {groups[0], groups[1]})
+        self.assertEqual(set(any_objects), set(groups))
+        self.assertEqual(set(user_objects), {groups[1]})
+
     def test_has_global_permission_only(self):
         group_names = ['group1', 'group2', 'group3']
         for name in group_names:
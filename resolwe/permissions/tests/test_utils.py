@@ -1,11 +1,14 @@
 # pylint: disable=missing-docstring
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import mock
+
 from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.shortcuts import assign_perm
 
 from resolwe.flow.models import Collection, Process
-from resolwe.permissions.utils import copy_permissions
+from resolwe.permissions.signals import permissions_changed
+from resolwe.permissions.utils import bulk_assign_perm, bulk_remove_perm, copy_permissions
 from resolwe.test import TestCase
 
 
@@ -34,3 +37,31 @@ class UtilsTestCase(TestCase):
     def test_copy_perms_wrong_ctype(self):
         with self.assertRaises(AssertionError):
             copy_permissions(self.src_process, self.collection)
+
+    def test_bulk_perms(self):
+        processes = [self.src_process, self.dst_process]
+        assign_perm('view_process', self.user, self.src_process)
+
+        handler = mock.MagicMock()
+        permissions_changed.connect(handler)
+        self.addCleanup(permissions_changed.disconnect, handler)
+
+        bulk_assign_perm(['view_process', 'flow.share_process', 'missing_process'], self.user, processes)
+        self.assertEqual(UserObjectPermission.objects.count(), 4)
+        for process in processes:
+            self.assertTrue(self.user.has_perm('flow.view_process', process))
+            self.assertTrue(self.user.has_perm('flow.share_process', process))
+        self.assertEqual(handler.call_count, 1)
+        self.assertEqual(handler.call_args[1]['instances'], processes)
+
+        bulk_assign_perm(['view_process'], self.group, processes, send_signal=False)
+        self.assertEqual(GroupObjectPermission.objects.count(), 2)
+        self.assertEqual(handler.call_count, 1)
+
+        bulk_remove_perm(['share_process'], self.user, processes)
+        self.assertEqual(UserObjectPermission.objects.filter(permission__codename='view_process').count(), 2)
+        self.assertEqual(UserObjectPermission.objects.count(), 2)
+        self.assertEqual(handler.call_count, 2)
+
+        bulk_remove_perm(['view_process'], self.group, [self.src_process])
+        self.assertEqual(GroupObjectPermission.objects.count(), 1)
@@ -5,14 +5,29 @@ Permissions utils
 =================
 
 .. autofunction:: copy_permissions
+.. autofunction:: bulk_assign_perm
+.. autofunction:: bulk_remove_perm
+.. autofunction:: get_permissions_generation
+.. autofunction:: bump_permissions_generation
 
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import time
+
+from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 
 from guardian.models import GroupObjectPermission, UserObjectPermission
 from guardian.shortcuts import assign_perm
+from guardian.utils import get_identity
+
+from .acl import update_acl
+from .signals import permissions_changed
+
+#: key of the permissions generation counter in Django's cache
+PERMISSIONS_GENERATION_KEY = 'resolwe.permissions.generation'
 
 
 def copy_permissions(src_obj, dest_obj):
@@ -27,3 +42,106 @@ def copy_permissions(src_obj, dest_obj):
         assign_perm(perm.permission.codename, perm.user, dest_obj)
     for perm in GroupObjectPermission.objects.filter(object_pk=src_obj.pk, content_type=src_obj_ctype):
         assign_perm(perm.permission.codename, perm.group, dest_obj)
+
+
+def _get_bulk_perm_filters(perms, user_or_group, objects):
+    """Return permission model and filters for bulk operations."""
+    ctype = ContentType.objects.get_for_model(objects[0])
+    codenames = [perm.split('.', 1)[-1] for perm in perms]
+
+    user, group = get_identity(user_or_group)
+    if user:
+        model, filters = UserObjectPermission, {'user': user}
+    else:
+        model, filters = GroupObjectPermission, {'group': group}
+
+    # Filters must not contain joins, so they can be used in deletes.
+    filters.update({
+        'content_type': ctype,
+        'object_pk__in': [str(obj.pk) for obj in objects],
+        'permission__in': Permission.objects.filter(content_type=ctype, codename__in=codenames),
+    })
+    return model, filters
+
+
+def _update_bulk_acl(filters):
+    """Update access control list after bulk permission changes."""
+    principal = {'{}_id'.format(key): filters[key].pk for key in ('user', 'group') if key in filters}
+    update_acl(filters['content_type'], filters['object_pk__in'], **principal)
+
+
+def bulk_assign_perm(perms, user_or_group, objects, send_signal=True):
+    """Assign permissions ``perms`` to ``user_or_group`` on all ``objects``.
+
+    Permissions are inserted with a fixed number of queries regardless
+    of the number of objects. Permissions that don't exist are ignored.
+    Instead of a signal for each created permission, a single
+    :data:`~resolwe.permissions.signals.permissions_changed` signal is
+    sent, unless ``send_signal`` is ``False``.
+
+    All ``objects`` must be instances of the same model.
+
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    model, filters = _get_bulk_perm_filters(perms, user_or_group, objects)
+    existing = set(model.objects.filter(**filters).values_list('object_pk', 'permission_id'))
+    principal = {key: filters[key] for key in ('user', 'group') if key in filters}
+
+    model.objects.bulk_create([
+        model(content_type=filters['content_type'], object_pk=str(obj.pk), permission=permission, **principal)
+        for obj in objects
+        for permission in filters['permission__in']
+        if (str(obj.pk), permission.pk) not in existing
+    ])
+    _update_bulk_acl(filters)
+
+    if send_signal:
+        permissions_changed.send(sender=type(objects[0]), instances=objects)
+
+
+def bulk_remove_perm(perms, user_or_group, objects, send_signal=True):
+    """Remove permissions ``perms`` of ``user_or_group`` on all ``objects``.
+
+    Counterpart of :func:`bulk_assign_perm`.
+
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    model, filters = _get_bulk_perm_filters(perms, user_or_group, objects)
+    model.objects.filter(**filters).delete()
+    _update_bulk_acl(filters)
+
+    if send_signal:
+        permissions_changed.send(sender=type(objects[0]), instances=objects)
+
+
+def get_permissions_generation():
+    """Return current permissions generation.
+
+    The generation is changed whenever any object permission or group
+    membership changes, so it can be used to validate anything derived
+    from permissions, i.e. responses filtered by permissions.
+
+    """
+    generation = cache.get(PERMISSIONS_GENERATION_KEY)
+    if generation is None:
+        # Initial value must differ from values previously stored
+        # in case the cache was cleared.
+        cache.add(PERMISSIONS_GENERATION_KEY, int(time.time() * 1000000), None)
+        generation = cache.get(PERMISSIONS_GENERATION_KEY)
+
+    return generation
+
+
+def bump_permissions_generation():
+    """Change permissions generation."""
+    try:
+        cache.incr(PERMISSIONS_GENERATION_KEY)
+    except ValueError:
+        # Generation counter is not set yet.
+        get_permissions_generation()
@@ -3,12 +3,21 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from rest_framework.fields import JSONField
 
-from .projection import apply_subfield_projection
+from .projection import PROJECTED_ATTRIBUTE, apply_subfield_projection
 
 
 class ProjectableJSONField(JSONField):
     """JSON field which supports projection."""
 
+    def get_attribute(self, instance):
+        """Return value projected in the database if it was selected."""
+        if len(self.source_attrs) == 1:
+            projected = PROJECTED_ATTRIBUTE.format(self.source_attrs[0])
+            if hasattr(instance, projected):
+                return getattr(instance, projected)
+
+        return super(ProjectableJSONField, self).get_attribute(instance)
+
     def to_representation(self, value):
         """Project outgoing native value."""
         value = apply_subfield_projection(self, value, deep=True)
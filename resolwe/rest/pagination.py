@@ -0,0 +1,190 @@
+""".. Ignore pydocstyle D400.
+
+===============
+REST Pagination
+===============
+
+.. autoclass:: resolwe.rest.pagination.KeysetPagination
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+
+from rest_framework import settings as rest_settings
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset (cursor) paginator.
+
+    Pagination is only applied if ``cursor`` query parameter is given,
+    otherwise objects are paginated by ``DEFAULT_PAGINATION_CLASS`` of
+    the REST framework settings (i.e. with limit and offset), or all of
+    them are returned if it is not set. Empty ``cursor`` returns the
+    first page and the ``next`` link of each page points to the
+    following one.
+
+    Objects are ordered by the first field of the requested ordering
+    and by ``id`` to break ties. Each page is selected with a keyset
+    predicate on these two fields instead of an offset, so the time to
+    get a page doesn't depend on its position and objects created in
+    the meantime don't shift the pages. Ordering by fields that may be
+    null is not supported.
+
+    """
+
+    #: name of the cursor query parameter
+    cursor_query_param = 'cursor'
+
+    #: name of the page size query parameter
+    page_size_query_param = 'limit'
+
+    #: default page size
+    page_size = 100
+
+    #: maximal page size
+    max_page_size = 1000
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        """Initialize attributes."""
+        self.request = None
+        self.fields = []
+        self.next_position = None
+        self.fallback = None
+
+    def get_fallback(self):
+        """Return paginator used when cursor is not given or ``None``."""
+        pagination_class = rest_settings.api_settings.DEFAULT_PAGINATION_CLASS
+        if pagination_class is None or issubclass(pagination_class, KeysetPagination):
+            return None
+        return pagination_class()
+
+    def get_page_size(self, request):
+        """Return page size."""
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_fields(self, request, queryset, view):
+        """Return fields used for ordering and whether it is descending."""
+        ordering = OrderingFilter().get_ordering(request, queryset, view) if view else None
+        term = ordering[0] if ordering else 'id'
+        descending = term.startswith('-')
+        name = term.lstrip('-')
+
+        opts = queryset.model._meta  # pylint: disable=protected-access
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+
+        # Rows with null values cannot be compared.
+        if field is None or not field.concrete or field.is_relation or field.null:
+            raise ParseError("Cursor pagination is not supported when ordering by `{}`.".format(name))
+
+        if field == opts.pk:
+            return [field], descending
+        return [field, opts.pk], descending
+
+    def order_queryset(self, queryset, fields, descending, position=None):
+        """Order ``queryset`` by ``fields`` and select objects after ``position``.
+
+        ``fields`` are returned by :meth:`get_fields` and ``position``
+        is the list of their values of the last object of the previous
+        page (``None`` for the first page).
+
+        """
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(*[prefix + field.name for field in fields])
+
+        if position is not None:
+            # Compare rows, so that composite indexes can be used.
+            quote_name = connections[queryset.db].ops.quote_name
+            table = queryset.model._meta.db_table  # pylint: disable=protected-access
+            where = '({}) {} ({})'.format(
+                ', '.join('{}.{}'.format(quote_name(table), quote_name(field.column)) for field in fields),
+                '<' if descending else '>',
+                ', '.join(['%s'] * len(fields)),
+            )
+            queryset = queryset.extra(where=[where], params=position)
+
+        return queryset
+
+    def encode_cursor(self, position):
+        """Encode position into cursor."""
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """Decode position from cursor in request.
+
+        Return ``None`` if cursor is empty, i.e. first page is requested.
+
+        """
+        cursor = request.query_params[self.cursor_query_param]
+        if not cursor:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            if not isinstance(position, list) or len(position) != len(self.fields):
+                raise ValueError()
+            return [field.to_python(value) for field, value in zip(self.fields, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a page of objects or ``None`` if pagination is not requested."""
+        if self.cursor_query_param not in request.query_params:
+            self.fallback = self.get_fallback()
+            if self.fallback is None:
+                return None
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.fields, descending = self.get_fields(request, queryset, view)
+        position = self.decode_cursor(request)
+
+        queryset = self.order_queryset(queryset, self.fields, descending, position)
+        results = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            self.next_position = [field.value_to_string(results[-1]) for field in self.fields]
+
+        return results
+
+    def get_next_link(self):
+        """Return link to the next page."""
+        if self.next_position is None:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        """Return paginated response."""
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -1,12 +1,37 @@
 """Implementation of field projection."""
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from collections import Mapping, Sequence
+import six
+
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models.query import Prefetch
+
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import SerializerMethodField
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # Python 2
+    from collections import Mapping, Sequence
 
 FIELD_SEPARATOR = ','
 FIELD_DEREFERENCE = '__'
 
 
+def get_request_projection(request):
+    """Return projection given in request as a list of field paths.
+
+    Each path is a list of field names, i.e. ``fields=id,output__foo``
+    is returned as ``[['id'], ['output', 'foo']]``.
+
+    """
+    filtered = set(request.query_params.get('fields', '').split(FIELD_SEPARATOR))
+    filtered.discard('')
+    return [item.split(FIELD_DEREFERENCE) for item in filtered]
+
+
 def apply_subfield_projection(field, value, deep=False):
     """Apply projection from request context.
 
@@ -37,8 +62,7 @@ def apply_subfield_projection(field, value, deep=False):
     if request is None:
         return value
 
-    filtered = set(request.query_params.get('fields', '').split(FIELD_SEPARATOR))
-    filtered.discard('')
+    filtered = get_request_projection(request)
     if not filtered:
         # If there are no fields specified in the filter, return all fields.
         return value
@@ -47,7 +71,6 @@ def apply_subfield_projection(field, value, deep=False):
     current_level = len(prefix)
     current_projection = []
     for item in filtered:
-        item = item.split(FIELD_DEREFERENCE)
         if len(item) <= current_level:
             continue
 
@@ -96,3 +119,120 @@ def apply_projection(projection, value):
             )
 
     return value
+
+
+#: model fields, which are only loaded from the database if projected
+DEFERRABLE_FIELDS = (JSONField, ArrayField, models.TextField)
+
+#: name of the attribute with the projected value of a JSON field (it
+#: must not shadow the model field)
+PROJECTED_ATTRIBUTE = '_projected_{}'
+
+#: select of the projected top-level keys of a JSON field
+JSON_PROJECTION_SQL = (
+    "CASE WHEN jsonb_typeof({column}) = 'object' THEN ("
+    "SELECT COALESCE(jsonb_object_agg(key, value), '{{}}'::jsonb) FROM jsonb_each({column}) WHERE key = ANY(%s)"
+    ") ELSE {column} END"
+)
+
+
+def _get_deferrable(model, needed):
+    """Return names of fields of ``model`` that need not be loaded."""
+    return [
+        field.name for field in model._meta.concrete_fields  # pylint: disable=protected-access
+        if isinstance(field, DEFERRABLE_FIELDS) and field.name not in needed
+    ]
+
+
+def apply_queryset_projection(queryset, serializer, projection):
+    """Don't load fields of objects that are not projected.
+
+    Large fields (JSON, arrays and texts) of objects in ``queryset`` and
+    of their prefetched related objects that are not used by fields of
+    ``serializer`` (already limited to the ``projection``) are deferred.
+    If only some top-level keys of a JSON field serialized with
+    :class:`~resolwe.rest.fields.ProjectableJSONField` are projected,
+    only these keys are selected from the database into a separate
+    attribute (see :data:`PROJECTED_ATTRIBUTE`), so the model field
+    itself is never replaced with the partial value.
+
+    Serializer method fields are expected to load what they need on
+    their own.
+
+    """
+    from .fields import ProjectableJSONField  # Avoid circular import.
+
+    if not projection:
+        return queryset
+
+    model = queryset.model
+    sources = {}
+    # Sources of fields that need related objects (and not only their
+    # primary keys).
+    related_sources = []
+    for name, field in six.iteritems(serializer.fields):
+        if isinstance(field, SerializerMethodField):
+            continue
+        if field.source == '*':
+            # Field may need any of the object's attributes.
+            return queryset
+        sources[name] = field.source_attrs
+        if not isinstance(field, PrimaryKeyRelatedField):
+            related_sources.append(field.source_attrs)
+
+    needed = {attrs[0] for attrs in sources.values()}
+    deferred = _get_deferrable(model, needed)
+
+    # Push projection of top-level keys of JSON fields to the database.
+    quote_name = connections[queryset.db].ops.quote_name
+    table = quote_name(model._meta.db_table)  # pylint: disable=protected-access
+    json_selects = []
+    for field in model._meta.concrete_fields:  # pylint: disable=protected-access
+        if not isinstance(field, JSONField):
+            continue
+
+        names = [name for name, attrs in six.iteritems(sources) if attrs[0] == field.name]
+        if len(names) != 1 or sources[names[0]] != [field.name]:
+            continue
+        if not isinstance(serializer.fields[names[0]], ProjectableJSONField):
+            continue
+
+        paths = [item[1:] for item in projection if item[0] == names[0]]
+        if not paths or not all(paths):
+            # Whole field is projected.
+            continue
+
+        column = '{}.{}'.format(table, quote_name(field.column))
+        json_selects.append((field.name, JSON_PROJECTION_SQL.format(column=column), sorted({p[0] for p in paths})))
+        deferred.append(field.name)
+
+    if deferred:
+        queryset = queryset.defer(*deferred)
+    for name, sql, keys in json_selects:
+        queryset = queryset.extra(select={PROJECTED_ATTRIBUTE.format(name): sql}, select_params=[keys])
+
+    # Defer large fields of prefetched related objects.
+    lookups = []
+    changed = False
+    for lookup in queryset._prefetch_related_lookups:  # pylint: disable=protected-access
+        if isinstance(lookup, six.string_types):
+            try:
+                field = model._meta.get_field(lookup)  # pylint: disable=protected-access
+            except FieldDoesNotExist:
+                field = None
+
+            if field is not None and field.many_to_one:
+                attrs_list = [attrs[1:] for attrs in related_sources if attrs[0] == lookup]
+                # Empty attributes mean that whole related object is used.
+                if all(attrs_list):
+                    related_deferred = _get_deferrable(field.related_model, {attrs[0] for attrs in attrs_list})
+                    if related_deferred:
+                        lookup = Prefetch(lookup, queryset=field.related_model.objects.defer(*related_deferred))
+                        changed = True
+
+        lookups.append(lookup)
+
+    if changed:
+        queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+
+    return queryset
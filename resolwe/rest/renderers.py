@@ -0,0 +1,34 @@
+""".. Ignore pydocstyle D400.
+
+==============
+REST Renderers
+==============
+
+.. autoclass:: resolwe.rest.renderers.EventStreamRenderer
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Renderer of server-sent events.
+
+    Views stream events themselves, so this renderer is only used to
+    negotiate ``text/event-stream`` content and to render responses
+    that are not streamed (i.e. errors) as a single ``error`` event.
+
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render ``data`` as an ``error`` event."""
+        if data is None:
+            return b''
+
+        return 'event: error\ndata: {}\n\n'.format(JSONEncoder().encode(data)).encode(self.charset)
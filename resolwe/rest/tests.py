@@ -5,10 +5,17 @@ import itertools
 
 import six
 
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from resolwe.flow.models import Data, Entity, Process
-from resolwe.flow.views import EntityViewSet
+from resolwe.flow.views import DataViewSet, EntityViewSet
 from resolwe.test import TestCase
 
 factory = APIRequestFactory()  # pylint: disable=invalid-name
@@ -84,3 +91,124 @@ class ProjectionTest(TestCase):
             six.assertCountEqual(self, item['output'].keys(), ['foo'])
             six.assertCountEqual(self, item['output']['foo'].keys(), ['bar'])
             self.assertEqual(item['output']['foo']['bar'], 42)
+
+    def test_queryset_projection(self):
+        data_viewset = DataViewSet.as_view(actions={'get': 'list'})
+
+        def get_data(fields):
+            request = factory.get('/', {'fields': ','.join(fields)}, format='json')
+            force_authenticate(request, self.admin)
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as captured_queries:
+                data = data_viewset(request).data
+            return data, '\n'.join(query['sql'] for query in captured_queries.captured_queries)
+
+        data, sql = get_data(['id', 'process_name'])
+        self.assertEqual(len(data), 2)
+        for item in data:
+            six.assertCountEqual(self, item.keys(), ['id', 'process_name', 'permissions'])
+            self.assertEqual(item['process_name'], 'Test process')
+        for column in ['"flow_data"."input"', '"flow_data"."output"', '"flow_process"."input_schema"']:
+            self.assertNotIn(column, sql)
+
+        # Only projected keys of JSON fields are selected.
+        output = dict(self.data_output, large='x' * 1000)
+        Data.objects.filter(pk=self.data.pk).update(output=output)
+        data, sql = get_data(['id', 'output__foo__bar', 'output__another', 'output__missing'])
+        for item in data:
+            self.assertEqual(item['output'], {'foo': {'bar': 42}, 'another': 3})
+        self.assertIn('jsonb_each', sql)
+
+        data, _ = get_data(['output'])
+        self.assertEqual(data[0]['output'], output)
+
+    def test_queryset_projection_actions(self):
+        request = Request(factory.get('/', {'fields': 'id,output__another'}))
+        request.user = self.admin
+
+        # Model field is not replaced by the projected value.
+        viewset = DataViewSet(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+        data = viewset.get_queryset().get(pk=self.data.pk)
+        self.assertEqual(data._projected_output, {'another': 3})  # pylint: disable=protected-access
+        self.assertEqual(data.output, self.data_output)
+
+        # Projection is only applied in actions serializing objects.
+        viewset.action = 'ancestors'
+        data = viewset.get_queryset().get(pk=self.data.pk)
+        self.assertFalse(hasattr(data, '_projected_output'))
+        self.assertEqual(data.output, self.data_output)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        super(KeysetPaginationTest, self).setUp()
+
+        self.process = Process.objects.create(name='Test process', contributor=self.contributor)
+        for index in range(5):
+            # Some of the objects have the same name to test tie breaking.
+            Data.objects.create(name='Data {}'.format(index // 2), contributor=self.contributor,
+                                process=self.process)
+
+        self.data_viewset = DataViewSet.as_view(actions={'get': 'list'})
+
+    def get_pages(self, params, create=False):
+        pages = []
+        params = dict(params, cursor='', limit=2)
+        while True:
+            request = factory.get('/', params, format='json')
+            force_authenticate(request, self.admin)
+            response = self.data_viewset(request)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data['results']])
+
+            if response.data['next'] is None:
+                return pages
+
+            if create:
+                Data.objects.create(name='New data', contributor=self.contributor, process=self.process)
+
+            params['cursor'] = response.data['next'].split('cursor=')[1].split('&')[0]
+
+    def test_pagination(self):
+        ids = list(Data.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.get_pages({}), [ids[:2], ids[2:4], ids[4:]])
+
+        ids = list(Data.objects.order_by('name', 'id').values_list('id', flat=True))
+        pages = self.get_pages({'ordering': 'name'})
+        self.assertEqual(list(itertools.chain(*pages)), ids)
+
+        # Objects created during pagination come before the current
+        # position, so they don't shift the following pages.
+        ids = list(Data.objects.order_by('-created', '-id').values_list('id', flat=True))
+        pages = self.get_pages({'ordering': '-created'}, create=True)
+        self.assertEqual(list(itertools.chain(*pages)), ids)
+
+    def test_no_pagination(self):
+        request = factory.get('/', format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(len(response.data), 5)
+
+    def test_default_pagination(self):
+        rest_settings = dict(settings.REST_FRAMEWORK, PAGE_SIZE=2,
+                             DEFAULT_PAGINATION_CLASS='rest_framework.pagination.LimitOffsetPagination')
+        with override_settings(REST_FRAMEWORK=rest_settings):
+            ids = list(Data.objects.order_by('id').values_list('id', flat=True))
+            request = factory.get('/', {'limit': 2, 'offset': 2, 'ordering': 'id'}, format='json')
+            force_authenticate(request, self.admin)
+            response = self.data_viewset(request)
+            self.assertEqual(response.data['count'], 5)
+            self.assertEqual([item['id'] for item in response.data['results']], ids[2:4])
+
+            # Keyset pagination is used if cursor is given.
+            self.assertEqual(self.get_pages({}), [ids[:2], ids[2:4], ids[4:]])
+
+    def test_invalid(self):
+        request = factory.get('/', {'cursor': 'invalid'}, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        request = factory.get('/', {'cursor': '', 'ordering': 'started'}, format='json')
+        force_authenticate(request, self.admin)
+        response = self.data_viewset(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
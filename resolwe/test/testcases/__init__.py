@@ -35,6 +35,8 @@ from django.test import TransactionTestCase as DjangoTransactionTestCase
 from django.test import override_settings
 from django.utils.crypto import get_random_string
 
+from resolwe.flow.registry import process_registry
+
 from .setting_overrides import FLOW_EXECUTOR_SETTINGS
 
 
@@ -116,6 +118,9 @@ class TransactionTestCase(DjangoTransactionTestCase):
 
         self._keep_data = False
 
+        # Processes cached in previous tests may not exist anymore.
+        process_registry.clear()
+
         user_model = get_user_model()
         self.admin = user_model.objects.create_superuser(username='admin', email='admin@test.com', password='admin')
         self.contributor = user_model.objects.create_user(username='contributor')
@@ -41,6 +41,7 @@ SCHEMAS_FIXTURE_CACHE = None
 @override_settings(FLOW_EXECUTOR=FLOW_EXECUTOR_SETTINGS)
 @override_settings(FLOW_DOCKER_MAPPINGS=FLOW_DOCKER_MAPPINGS)
 @override_settings(CELERY_ALWAYS_EAGER=True)
+@override_settings(FLOW_MANAGER_SYNC_TRIGGER=True)
 class TransactionProcessTestCase(TransactionTestCase):
     """Base class for writing process tests not enclosed in a transaction.
 